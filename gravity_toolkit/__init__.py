@@ -22,6 +22,7 @@ from gravity_toolkit.convert_calendar_decimal import convert_calendar_decimal
 from gravity_toolkit.convert_julian import convert_julian
 from gravity_toolkit.degree_amplitude import degree_amplitude
 from gravity_toolkit.destripe_harmonics import destripe_harmonics
+from gravity_toolkit.filters import filters
 from gravity_toolkit.gauss_weights import gauss_weights
 from gravity_toolkit.gen_disc_load import gen_disc_load
 from gravity_toolkit.gen_harmonics import gen_harmonics
@@ -31,21 +32,32 @@ from gravity_toolkit.gen_stokes import gen_stokes
 from gravity_toolkit.geocenter import geocenter
 from gravity_toolkit.grace_date import grace_date
 from gravity_toolkit.grace_find_months import grace_find_months
-from gravity_toolkit.grace_input_months import grace_input_months, read_ecmwf_corrections
+from gravity_toolkit.grace_harmonics_cube import grace_harmonics_cube, \
+    read_harmonics_cube
+from gravity_toolkit.grace_input_months import grace_input_months, \
+    read_ecmwf_corrections, read_harmonics_files
+from gravity_toolkit.grace_metadata_index import grace_metadata_index, \
+    grace_file_dates
 from gravity_toolkit.grace_months_index import grace_months_index
 from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.harmonic_summation import harmonic_summation
+from gravity_toolkit.harmonic_variance_summation import \
+    harmonic_variance_summation, harmonic_signal_error_summation
 from gravity_toolkit.hdf5_read import hdf5_read
 from gravity_toolkit.hdf5_read_stokes import hdf5_read_stokes
 from gravity_toolkit.hdf5_stokes import hdf5_stokes
 from gravity_toolkit.hdf5_write import hdf5_write
+from gravity_toolkit.lazy_stokes import lazy_stokes
 from gravity_toolkit.legendre_polynomials import legendre_polynomials
 from gravity_toolkit.legendre import legendre
+from gravity_toolkit.low_degree_cache import low_degree_cache, month_index
 from gravity_toolkit.ncdf_read import ncdf_read
 from gravity_toolkit.ncdf_read_stokes import ncdf_read_stokes
 from gravity_toolkit.ncdf_stokes import ncdf_stokes
 from gravity_toolkit.ncdf_write import ncdf_write
 from gravity_toolkit.ocean_stokes import ocean_stokes
+from gravity_toolkit.pack_data import pack_data, unpack_data, \
+    quantize_data
 from gravity_toolkit.plm_colombo import plm_colombo
 from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.plm_mohlenkamp import plm_mohlenkamp
@@ -61,5 +73,8 @@ from gravity_toolkit.read_tellus_geocenter import read_tellus_geocenter
 from gravity_toolkit.spatial import spatial
 from gravity_toolkit.tsamplitude import tsamplitude
 from gravity_toolkit.tsregress import tsregress
+from gravity_toolkit.tsregress_batch import tsregress_batch
 from gravity_toolkit.tssmooth import tssmooth
+from gravity_toolkit.tssmooth_batch import tssmooth_batch
 from gravity_toolkit.units import units
+from gravity_toolkit.write_cache_file import write_cache_file
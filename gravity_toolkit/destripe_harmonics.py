@@ -3,7 +3,7 @@ u"""
 destripe_harmonics.py
 Original Fortran program remove_errors.f written by Isabella Velicogna
 Adapted by Chia-Wei Hsu (05/2018)
-Updated by Tyler Sutterley (07/2020)
+Updated by Tyler Sutterley (08/2020)
 
 Filters spherical harmonic coefficients for correlated "striping" errors
 
@@ -14,20 +14,28 @@ ALGORITHM:
         by fitting a quadratic function to every 7 points
     Remove those smoothed values
 
+    The sliding-window polynomial fits only depend on the order (m) and the
+        window size and are precomputed as linear filter operators for each
+        order (cached for each set of parameters)
+    Filters can be applied to a single field or to a stack of fields
+
 CALLING SEQUENCE:
     Ylms = destripe_harmonics(clm,slm,LMAX=60)
     Wclm = WYlms['clm']
     Wslm = WYlms['slm']
 
+    F = destripe_filter(LMIN=2,LMAX=60,MMAX=60)
+
 INPUTS:
-    clm1: cosine spherical harmonic coefficients (matrix 2 dims)
-    slm1: sine spherical harmonic coefficients (matrix 2 dims)
-        clm1 and slm1 are matrix with 2 dimensions
-        the dimensions are in the following order [l,m]
+    clm1: cosine spherical harmonic coefficients (matrix 2 or 3 dims)
+    slm1: sine spherical harmonic coefficients (matrix 2 or 3 dims)
+        clm1 and slm1 are matrix with 2 or 3 dimensions
+        the dimensions are in the following order [l,m] or [l,m,t]
 
 OUTPUTS:
     Wclm: filtered cosine spherical harmonic coefficients
     Wslm: filtered sine spherical harmonic coefficients
+    F: filter operators for each order (MMAX+1,LMAX+1,LMAX+1) (destripe_filter)
 
 OPTIONS:
     LMIN: Lower bound of Spherical Harmonic Degrees (default = 2)
@@ -45,6 +53,9 @@ REFERENCE:
         http://dx.doi.org/10.1029/2005GL025285
 
 UPDATE HISTORY:
+    Updated 08/2020: precompute the sliding-window fits as filter operators
+        for each order with a cache for each set of filter parameters
+        filter a stack of spherical harmonics with a single matrix product
     Updated 07/2020: added function docstrings
     Updated 03/2020: Updated for public release
     Updated 05/2018: using __future__ print and updated flags comments
@@ -53,6 +64,7 @@ UPDATE HISTORY:
     Updated 02/2014: generalization for GRACE GUI and other routines
 """
 from __future__ import print_function
+import functools
 import numpy as np
 
 def destripe_harmonics(clm1, slm1, LMIN=2, LMAX=60, MMAX=None,
@@ -87,23 +99,58 @@ def destripe_harmonics(clm1, slm1, LMIN=2, LMAX=60, MMAX=None,
     if MMAX is None:
         MMAX = np.copy(LMAX)
 
+    #-- filter operators for each order
+    F = destripe_filter(LMIN=LMIN, LMAX=LMAX, MMAX=MMAX,
+        ROUND=ROUND, NARROW=NARROW)
     #-- output filtered coefficients (copy to not modify input)
     Wclm = clm1.copy()
     Wslm = slm1.copy()
-    #-- matrix size declarations
-    clmeven = np.zeros((LMAX), dtype=np.float64)
-    slmeven = np.zeros((LMAX), dtype=np.float64)
-    clmodd = np.zeros((LMAX+1), dtype=np.float64)
-    slmodd = np.zeros((LMAX+1), dtype=np.float64)
-    clmsm = np.zeros((LMAX+1,MMAX+1), dtype=np.float64)
-    slmsm = np.zeros((LMAX+1,MMAX+1), dtype=np.float64)
+    #-- filter the harmonics for all orders (and all dates) at once
+    #-- transposing the harmonics to [m,l,t] for the matrix products
+    for W,Ylm in [(Wclm,clm1),(Wslm,slm1)]:
+        Y = np.reshape(Ylm[:LMAX+1,:MMAX+1,...], (LMAX+1,MMAX+1,-1))
+        WY = np.matmul(F, np.transpose(Y,axes=(1,0,2)))
+        W[:LMAX+1,:MMAX+1,...] = np.reshape(np.transpose(WY,axes=(1,0,2)),
+            W[:LMAX+1,:MMAX+1,...].shape)
+
+    return {'clm':Wclm,'slm':Wslm}
+
+def destripe_filter(LMIN=2, LMAX=60, MMAX=None, ROUND=True, NARROW=False):
+    """
+    Calculates the destriping filter operators for each spherical
+        harmonic order
 
+    Keyword arguments
+    -----------------
+    LMIN: Lower bound of Spherical Harmonic Degrees
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    ROUND: use round to find nearest even
+    NARROW: set harmonics to 0 if less than window size
+
+    Returns
+    -------
+    F: filter operators for each order (MMAX+1,LMAX+1,LMAX+1) (destripe_filter)
+    """
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    if MMAX is None:
+        MMAX = np.copy(LMAX)
+    #-- filter operators are cached for each set of parameters
+    return _destripe_filter(int(LMIN), int(LMAX), int(MMAX),
+        bool(ROUND), bool(NARROW))
+
+@functools.lru_cache(maxsize=32)
+def _destripe_filter(LMIN, LMAX, MMAX, ROUND, NARROW):
+    #-- filter operators for each order [m,l,l]
+    #-- orders below 5 and degrees below m are passed through unaltered
+    F = np.zeros((MMAX+1,LMAX+1,LMAX+1), dtype=np.float64)
+    F[:,:,:] = np.eye(LMAX+1)
     #-- start of the smoothing over orders (m)
-    for m in range(int(MMAX+1)):
+    for m in range(5,int(MMAX+1)):
         smooth = np.exp(-np.float64(m)/10.0)*15.0
         if ROUND:
             #-- round(smooth) to nearest even instead of int(smooth)
-            nsmooth = np.around(smooth)
+            nsmooth = np.int64(np.around(smooth))
         else:
             #-- Sean's method for finding nsmooth (use floor of smooth)
             nsmooth = np.int64(smooth)
@@ -112,158 +159,42 @@ def destripe_harmonics(clm1, slm1, LMIN=2, LMAX=60, MMAX=None,
             #-- Isabella's method of picking nsmooth sets minimum to 2
             nsmooth = np.int64(2)
 
-        rmat = np.zeros((3,3), dtype=np.float64)
-        lll = np.arange(np.float64(nsmooth)*2.+1.)-np.float64(nsmooth)
-        #-- create design matrix to have the following form:
+        #-- design matrix for fitting a quadratic polynomial to the window
+        #    [    1     ll     ll^2   ]
+        lll = np.arange(-nsmooth,nsmooth+1,dtype=np.float64)
+        DMAT = np.transpose([np.ones_like(lll),lll,lll**2])
+        #-- normal matrix to have the following form:
         #    [    1     ll     ll^2   ]
         #    [    ll    ll^2   ll^3   ]
         #    [    ll^2  ll^3   ll^4   ]
-        for i,ill in enumerate(lll):
-            rmat[0,0] += 1.0
-            rmat[0,1] += ill
-            rmat[0,2] += ill**2
-
-            rmat[1,0] += ill
-            rmat[1,1] += ill**2
-            rmat[1,2] += ill**3
-
-            rmat[2,0] += ill**2
-            rmat[2,1] += ill**3
-            rmat[2,2] += ill**4
-
-        #-- put the even and odd l's into their own arrays
-        ieven = -1
-        iodd = -1
-        leven = np.zeros((LMAX), dtype=np.int)
-        lodd = np.zeros((LMAX), dtype=np.int)
-
-        for l in range(int(m),int(LMAX+1)):
-            #-- check if degree is odd or even
-            if np.remainder(l,2).astype(np.bool):
-                iodd += 1
-                lodd[iodd] = l
-                clmodd[iodd] = clm1[l,m].copy()
-                slmodd[iodd] = slm1[l,m].copy()
+        rmat = np.dot(np.transpose(DMAT),DMAT)
+        #-- linear operator to get beta parameters for a window
+        beta = np.linalg.lstsq(rmat,np.transpose(DMAT),rcond=-1)[0]
+        #-- operator to evaluate the polynomial at each point in the window
+        S = np.dot(DMAT,beta)
+
+        #-- smoothing operator for the even and odd l's separately
+        for lseq in [np.arange(m+(m % 2),LMAX+1,2),
+            np.arange(m+1-(m % 2),LMAX+1,2)]:
+            n = len(lseq)
+            SMAT = np.zeros((n,n), dtype=np.float64)
+            if (n < (2*nsmooth+1)):
+                #-- number of points is less than window size
+                #-- Sean's method (NARROW): smoothed Clm=Slm=0
+                #-- Isabella's method: smoothed Clm and Slm passed through
+                if not NARROW:
+                    SMAT[:,:] = np.eye(n)
             else:
-                ieven += 1
-                leven[ieven] = l
-                clmeven[ieven] = clm1[l,m].copy()
-                slmeven[ieven] = slm1[l,m].copy()
-
-        #-- smooth, by fitting a quadratic polynomial to 7 points at a time
-        #-- deal with even stokes coefficients
-        l1 = 0
-        l2 = ieven
-
-        if (l1 > (l2-2*nsmooth)):
-            for l in range(l1,l2+1):
-                if NARROW:
-                    #-- Sean's method
-                    #-- Clm=Slm=0 if number of points is less than window size
-                    clmsm[leven[l],m] = 0.0
-                    slmsm[leven[l],m] = 0.0
-                else:
-                    #-- Isabella's method
-                    #-- Clm and Slm passed through unaltered
-                    clmsm[leven[l],m] = clm1[leven[l],m].copy()
-                    slmsm[leven[l],m] = slm1[leven[l],m].copy()
-        else:
-            for l in range(int(l1+nsmooth),int(l2-nsmooth+1)):
-                rhsc = np.zeros((3), dtype=np.float64)
-                rhss = np.zeros((3), dtype=np.float64)
-                for ll in range(int(-nsmooth),int(nsmooth+1)):
-                    rhsc[0] += clmeven[l+ll]
-                    rhsc[1] += clmeven[l+ll]*np.float64(ll)
-                    rhsc[2] += clmeven[l+ll]*np.float64(ll**2)
-                    rhss[0] += slmeven[l+ll]
-                    rhss[1] += slmeven[l+ll]*np.float64(ll)
-                    rhss[2] += slmeven[l+ll]*np.float64(ll**2)
-
-                #-- fit design matrix to coefficients
-                #-- to get beta parameters
-                bhsc = np.linalg.lstsq(rmat,rhsc.T,rcond=-1)[0]
-                bhss = np.linalg.lstsq(rmat,rhss.T,rcond=-1)[0]
-
-                #-- all other l is assigned as bhsc
-                clmsm[leven[l],m] = bhsc[0].copy()
-                #-- all other l is assigned as bhss
-                slmsm[leven[l],m] = bhss[0].copy()
-
-                if (l == (l1+nsmooth)):
-                    #-- deal with l=l1+nsmooth
-                    for ll in range(int(-nsmooth),0):
-                        clmsm[leven[l+ll],m] = bhsc[0]+bhsc[1]*np.float64(ll) + \
-                            bhsc[2]*np.float64(ll**2)
-                        slmsm[leven[l+ll],m] = bhss[0]+bhss[1]*np.float64(ll) + \
-                            bhss[2]*np.float64(ll**2)
-
-                if (l == (l2-nsmooth)):
-                    #-- deal with l=l2-nsmnooth
-                    for ll in range(1,int(nsmooth+1)):
-                        clmsm[leven[l+ll],m] = bhsc[0]+bhsc[1]*np.float64(ll) + \
-                            bhsc[2]*np.float64(ll**2)
-                        slmsm[leven[l+ll],m] = bhss[0]+bhss[1]*np.float64(ll) + \
-                            bhss[2]*np.float64(ll**2)
-
-        #-- deal with odd stokes coefficients
-        l1 = 0
-        l2 = iodd
-
-        if (l1 > (l2-2*nsmooth)):
-            for l in range(l1,l2+1):
-                if NARROW:
-                    #-- Sean's method
-                    #-- Clm=Slm=0 if number of points is less than window size
-                    clmsm[lodd[l],m] = 0.0
-                    slmsm[lodd[l],m] = 0.0
-                else:
-                    #-- Isabella's method
-                    #-- Clm and Slm passed through unaltered
-                    clmsm[lodd[l],m] = clm1[lodd[l],m].copy()
-                    slmsm[lodd[l],m] = slm1[lodd[l],m].copy()
-        else:
-            for l in range(int(l1+nsmooth),int(l2-nsmooth+1)):
-                rhsc = np.zeros((3), dtype=np.float64)
-                rhss = np.zeros((3), dtype=np.float64)
-                for ll in range(int(-nsmooth),int(nsmooth+1)):
-                    rhsc[0] += clmodd[l+ll]
-                    rhsc[1] += clmodd[l+ll]*np.float64(ll)
-                    rhsc[2] += clmodd[l+ll]*np.float64(ll**2)
-                    rhss[0] += slmodd[l+ll]
-                    rhss[1] += slmodd[l+ll]*np.float64(ll)
-                    rhss[2] += slmodd[l+ll]*np.float64(ll**2)
-
-                #-- fit design matrix to coefficients
-                #-- to get beta parameters
-                bhsc = np.linalg.lstsq(rmat,rhsc.T,rcond=-1)[0]
-                bhss = np.linalg.lstsq(rmat,rhss.T,rcond=-1)[0]
-
-                #-- all other l is assigned as bhsc
-                clmsm[lodd[l],m] = bhsc[0].copy()
-                #-- all other l is assigned as bhss
-                slmsm[lodd[l],m] = bhss[0].copy()
-
-                if (l == (l1+nsmooth)):
-                    #-- deal with l=l1+nsmooth
-                    for ll in range(int(-nsmooth),0):
-                        clmsm[lodd[l+ll],m] = bhsc[0]+bhsc[1]*np.float64(ll) + \
-                            bhsc[2]*np.float64(ll**2)
-                        slmsm[lodd[l+ll],m] = bhss[0]+bhss[1]*np.float64(ll) + \
-                            bhss[2]*np.float64(ll**2)
-
-                if (l == (l2-nsmooth)):
-                    #-- deal with l=l2-nsmnooth
-                    for ll in range(1,int(nsmooth+1)):
-                        clmsm[lodd[l+ll],m] = bhsc[0]+bhsc[1]*np.float64(ll) + \
-                            bhsc[2]*np.float64(ll**2)
-                        slmsm[lodd[l+ll],m] = bhss[0]+bhss[1]*np.float64(ll) + \
-                            bhss[2]*np.float64(ll**2)
-
-        #-- deal with m greater than or equal to 5
-        for l in range(int(m),int(LMAX+1)):
-            if (m >= 5):
-                #-- remove smoothed clm/slm from original spherical harmonics
-                Wclm[l,m] -= clmsm[l,m]
-                Wslm[l,m] -= slmsm[l,m]
-
-    return {'clm':Wclm,'slm':Wslm}
+                #-- smooth, by fitting a quadratic polynomial to
+                #-- 2*nsmooth+1 points at a time
+                for l in range(nsmooth,n-nsmooth):
+                    SMAT[l,l-nsmooth:l+nsmooth+1] = S[nsmooth,:]
+                #-- deal with l=l1+nsmooth
+                SMAT[:nsmooth,:2*nsmooth+1] = S[:nsmooth,:]
+                #-- deal with l=l2-nsmooth
+                SMAT[n-nsmooth:,n-2*nsmooth-1:] = S[nsmooth+1:,:]
+            #-- remove smoothed clm/slm from original spherical harmonics
+            F[m,lseq[:,None],lseq[None,:]] -= SMAT
+    #-- filter operators are shared between calls
+    F.flags.writeable = False
+    return F
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+u"""
+filters.py
+Written by Tyler Sutterley (08/2020)
+
+Data class for block-diagonal spherical harmonic filters
+    with a filter matrix for the cosine and sine harmonics of each order
+
+Filters are applied to all dates of a harmonics object with a matrix
+    product for each order
+Degree-dependent filters (e.g. Gaussian smoothing) are stored as diagonal
+    blocks and can be combined with decorrelation filters
+Filter matrices of other decorrelation filters (e.g. DDK) can be used
+    with from_blocks after reading the matrices for each order
+
+CALLING SEQUENCE:
+    F = filters().from_gaussian(300.0, 60)
+    F = filters().from_destripe(60).combine(F)
+    F.to_HDF5(filter_file)
+    F = filters().from_HDF5(filter_file)
+    Ylms = F.filter(GRACE_Ylms)
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    h5py: Pythonic interface to the HDF5 binary data format.
+        (https://www.h5py.org/)
+
+PROGRAM DEPENDENCIES:
+    gauss_weights.py: Computes the Gaussian weights as a function of degree
+    destripe_harmonics.py: filters spherical harmonics for correlated errors
+
+UPDATE HISTORY:
+    Written 08/2020
+"""
+import os
+import time
+import h5py
+import numpy as np
+from gravity_toolkit.gauss_weights import gauss_weights
+from gravity_toolkit.destripe_harmonics import destripe_filter
+
+class filters(object):
+    """
+    Data class for block-diagonal spherical harmonic filters
+    """
+    def __init__(self, lmax=None, mmax=None):
+        self.cosine=None
+        self.sine=None
+        self.lmax=lmax
+        self.mmax=mmax
+        self.diagonal=None
+        self.title=None
+        self.filename=None
+
+    def from_blocks(self, cosine, sine=None, title=None):
+        """
+        Create a filters object from the filter matrices of each order
+        Inputs: list of filter matrices for the cosine harmonics of each
+            order (m) with dimensions (LMAX+1-m,LMAX+1-m)
+        Options:
+            list of filter matrices for the sine harmonics of each order
+                (default is to use the cosine filter matrices)
+            title of the filter
+        """
+        #-- filter matrices for each order
+        self.cosine = [np.atleast_2d(np.array(b,dtype=np.float64))
+            for b in cosine]
+        if sine is None:
+            self.sine = [b.copy() for b in self.cosine]
+        else:
+            self.sine = [np.atleast_2d(np.array(b,dtype=np.float64))
+                for b in sine]
+        #-- maximum degree and order
+        self.lmax = self.cosine[0].shape[0] - 1
+        self.mmax = len(self.cosine) - 1
+        #-- check dimensions of the filter matrices
+        for m in range(0,self.mmax+1):
+            n = self.lmax + 1 - m
+            if (self.cosine[m].shape != (n,n)) or (self.sine[m].shape != (n,n)):
+                raise ValueError('Filter matrix for order {0:d} '
+                    'does not have dimensions ({1:d},{1:d})'.format(m,n))
+        #-- check if filter is degree-dependent
+        self.update_diagonal()
+        self.title = title
+        return self
+
+    def from_degree(self, wl, mmax=None, title=None):
+        """
+        Create a filters object from a degree-dependent filter
+        Inputs: degree-dependent filter weights (LMAX+1)
+        Options:
+            upper bound of spherical harmonic orders (default = LMAX)
+            title of the filter
+        """
+        wl = np.array(wl, dtype=np.float64)
+        self.lmax = len(wl) - 1
+        self.mmax = np.copy(self.lmax) if (mmax is None) else mmax
+        #-- diagonal filter matrices for each order
+        self.cosine = [np.diag(wl[m:]) for m in range(0,self.mmax+1)]
+        self.sine = [np.diag(wl[m:]) for m in range(0,self.mmax+1)]
+        self.diagonal = True
+        self.title = title
+        return self
+
+    def from_gaussian(self, hw, lmax, mmax=None):
+        """
+        Create a filters object for Gaussian smoothing
+        Inputs:
+            Gaussian smoothing radius in kilometers
+            maximum spherical harmonic degree
+        Options: upper bound of spherical harmonic orders (default = LMAX)
+        """
+        #-- normalized gaussian weights for each degree
+        wl = 2.0*np.pi*gauss_weights(hw, lmax)
+        title = 'Gaussian {0:0.0f}km'.format(hw)
+        return self.from_degree(wl, mmax=mmax, title=title)
+
+    def from_destripe(self, lmax, mmax=None, **kwargs):
+        """
+        Create a filters object for the Swenson and Wahr (2006)
+            decorrelation (destriping) filter
+        Inputs: maximum spherical harmonic degree
+        Options:
+            upper bound of spherical harmonic orders (default = LMAX)
+            keyword arguments for destripe_filter
+        """
+        mmax = np.copy(lmax) if (mmax is None) else mmax
+        kwargs.setdefault('LMIN',1)
+        F = destripe_filter(LMAX=lmax, MMAX=mmax, **kwargs)
+        #-- filter matrices for each order (cosine and sine are the same)
+        blocks = [F[m,m:,m:] for m in range(0,mmax+1)]
+        return self.from_blocks(blocks, title='Destriped')
+
+    def from_HDF5(self, filename):
+        """
+        Read a filters object from a HDF5 file
+        Inputs: full path of input HDF5 file
+        """
+        #-- set filename
+        self.filename = os.path.expanduser(filename)
+        #-- read packed filter matrices from HDF5 file
+        with h5py.File(self.filename,'r') as fileID:
+            self.lmax = np.int64(fileID.attrs['lmax'])
+            self.mmax = np.int64(fileID.attrs['mmax'])
+            self.diagonal = bool(fileID.attrs['diagonal'])
+            self.title = fileID.attrs.get('title')
+            cosine = fileID['cosine'][:]
+            sine = fileID['sine'][:]
+        #-- unpack filter matrices for each order
+        self.cosine = self.unpack(cosine)
+        self.sine = self.unpack(sine)
+        return self
+
+    def to_HDF5(self, filename, title=None):
+        """
+        Write a filters object to a HDF5 file
+        Inputs: full path of output HDF5 file
+        Options: title of the filter
+        """
+        self.filename = os.path.expanduser(filename)
+        #-- title of the filter
+        title = self.title if (title is None) else title
+        #-- opening HDF5 file for writing
+        with h5py.File(self.filename,'w') as fileID:
+            #-- packed filter matrices for each order
+            for key,blocks in [('cosine',self.cosine),('sine',self.sine)]:
+                fileID.create_dataset(key, data=self.pack(blocks),
+                    compression='gzip')
+            #-- filter attributes
+            fileID.attrs['lmax'] = self.lmax
+            fileID.attrs['mmax'] = self.mmax
+            fileID.attrs['diagonal'] = self.diagonal
+            if title is not None:
+                fileID.attrs['title'] = title
+            #-- date created
+            fileID.attrs['date_created'] = time.strftime('%Y-%m-%d',
+                time.localtime())
+
+    def pack(self, blocks):
+        """
+        Pack filter matrices for each order into a single array
+        Inputs: list of filter matrices for each order
+        """
+        if self.diagonal:
+            #-- only the diagonal of each matrix for degree-dependent filters
+            return np.concatenate([np.diag(b) for b in blocks])
+        else:
+            return np.concatenate([b.flatten() for b in blocks])
+
+    def unpack(self, packed):
+        """
+        Unpack filter matrices for each order from a single array
+        Inputs: packed filter matrices
+        """
+        #-- number of degrees for each order
+        n = self.lmax + 1 - np.arange(0,self.mmax+1)
+        if self.diagonal:
+            offset = np.concatenate(([0],np.cumsum(n)))
+            return [np.diag(packed[offset[m]:offset[m+1]])
+                for m in range(0,self.mmax+1)]
+        else:
+            offset = np.concatenate(([0],np.cumsum(n**2)))
+            return [np.reshape(packed[offset[m]:offset[m+1]],(n[m],n[m]))
+                for m in range(0,self.mmax+1)]
+
+    def update_diagonal(self):
+        """
+        Check if the filter matrices are diagonal (degree-dependent filters)
+        """
+        self.diagonal = all([np.count_nonzero(b - np.diag(np.diag(b))) == 0
+            for b in self.cosine + self.sine])
+
+    def copy(self):
+        """
+        Copy a filters object to a new filters object
+        """
+        temp = filters(lmax=self.lmax, mmax=self.mmax)
+        temp.cosine = [b.copy() for b in self.cosine]
+        temp.sine = [b.copy() for b in self.sine]
+        temp.diagonal = self.diagonal
+        temp.title = self.title
+        return temp
+
+    def truncate(self, lmax, mmax=None):
+        """
+        Truncate a filters object to a new degree and order
+            decorrelation (non-diagonal) filters can only be truncated in order
+        Inputs: lmax maximum degree of spherical harmonics
+        Options: mmax maximum order of spherical harmonics
+        """
+        #-- output harmonics dimensions
+        mmax = np.copy(lmax) if (mmax is None) else mmax
+        if (lmax > self.lmax) or (mmax > self.mmax):
+            raise ValueError('Filter is not defined to degree and order '
+                '{0:d}/{1:d}'.format(lmax,mmax))
+        #-- decorrelation filters couple the degrees of each order
+        #-- and need to be recalculated for a different maximum degree
+        if not self.diagonal and (lmax != self.lmax):
+            raise ValueError(('Decorrelation filter for degree {0:d} cannot '
+                'be truncated to degree {1:d}').format(self.lmax,lmax))
+        #-- truncate the filter matrices for each order
+        n = [lmax + 1 - m for m in range(0,mmax+1)]
+        self.cosine = [self.cosine[m][:n[m],:n[m]] for m in range(0,mmax+1)]
+        self.sine = [self.sine[m][:n[m],:n[m]] for m in range(0,mmax+1)]
+        self.lmax = np.copy(lmax)
+        self.mmax = np.copy(mmax)
+        return self
+
+    def combine(self, temp):
+        """
+        Combine two filters objects into a single filter
+            applying the filter followed by the input filter
+        Inputs: filters object to be applied after the filter
+        """
+        #-- truncate to common degree and order
+        #-- decorrelation filters must be defined to the common degree
+        lmax = np.min([self.lmax,temp.lmax])
+        mmax = np.min([self.mmax,temp.mmax])
+        F1 = self.copy().truncate(lmax, mmax=mmax)
+        F2 = temp.copy().truncate(lmax, mmax=mmax)
+        #-- product of the filter matrices for each order
+        cosine = [np.dot(b2,b1) for b1,b2 in zip(F1.cosine,F2.cosine)]
+        sine = [np.dot(b2,b1) for b1,b2 in zip(F1.sine,F2.sine)]
+        titles = [t for t in (self.title,temp.title) if t is not None]
+        return filters().from_blocks(cosine, sine=sine,
+            title=' + '.join(titles) if titles else None)
+
+    def filter(self, Ylms):
+        """
+        Filter a harmonics object for all dates
+        Inputs: harmonics object to be filtered
+        Returns: filtered harmonics object
+        """
+        #-- reassign shape and ndim attributes
+        Ylms.update_dimensions()
+        if (Ylms.lmax > self.lmax) or (Ylms.mmax > self.mmax):
+            raise ValueError('Filter is not defined to degree and order '
+                '{0:d}/{1:d}'.format(Ylms.lmax,Ylms.mmax))
+        #-- truncate filter to the degree and order of the harmonics
+        #-- decorrelation filters must be defined to the degree of the harmonics
+        F = self.copy().truncate(Ylms.lmax, mmax=Ylms.mmax)
+        #-- output filtered harmonics
+        temp = Ylms.copy()
+        #-- check if filter is degree-dependent
+        if not self.diagonal:
+            #-- errors are not propagated for decorrelation filters
+            temp.eclm = None
+            temp.eslm = None
+        #-- filter all dates with a matrix product for each order
+        for m in range(0,F.mmax+1):
+            for key,blocks in [('clm',F.cosine),('slm',F.sine)]:
+                Y = getattr(Ylms,key)
+                W = getattr(temp,key)
+                W[m:F.lmax+1,m,...] = np.tensordot(blocks[m],
+                    Y[m:F.lmax+1,m,...], axes=1)
+            #-- scale errors with the magnitude of degree-dependent filters
+            if self.diagonal and (temp.eclm is not None):
+                temp.eclm[m:F.lmax+1,m,...] = np.tensordot(
+                    np.abs(F.cosine[m]), Ylms.eclm[m:F.lmax+1,m,...], axes=1)
+                temp.eslm[m:F.lmax+1,m,...] = np.tensordot(
+                    np.abs(F.sine[m]), Ylms.eslm[m:F.lmax+1,m,...], axes=1)
+        #-- return the filtered harmonics
+        return temp
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_find_months.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Parses date index file from grace_date.py
 Finds the months available for a GRACE/GRACE-FO product
@@ -14,6 +14,7 @@ INPUTS:
 
 OPTIONS:
     DSET: GRACE dataset (GSM, GAC, GAD, GAB, GAA)
+    INDEX: read dates from the persistent metadata index of the product
 
 OUTPUTS:
     start: First month in a GRACE/GRACE-FO dataset
@@ -27,8 +28,10 @@ PYTHON DEPENDENCIES:
 
 PROGRAM DEPENDENCIES:
     grace_date.py: reads GRACE index file and calculates dates for each month
+    grace_metadata_index.py: creates persistent metadata index of a product
 
 UPDATE HISTORY:
+    Updated 08/2020: added option to read dates from metadata index (INDEX)
     Updated 07/2020: added function docstrings
     Updated 03/2020: check that GRACE/GRACE-FO date file exists
     Updated 10/2019: using local() function to set subdirectories
@@ -44,8 +47,9 @@ from __future__ import print_function
 import os
 import numpy as np
 from gravity_toolkit.grace_date import grace_date
+from gravity_toolkit.grace_metadata_index import grace_metadata_index
 
-def grace_find_months(base_dir, PROC, DREL, DSET='GSM'):
+def grace_find_months(base_dir, PROC, DREL, DSET='GSM', INDEX=False):
     """
     Parses date index file from grace_date.py
     Finds the months available for a GRACE/GRACE-FO product
@@ -69,6 +73,7 @@ def grace_find_months(base_dir, PROC, DREL, DSET='GSM'):
         GAC: combined non-tidal atmospheric and oceanic correction
         GAD: ocean bottom pressure product
         GSM: corrected monthly static gravity field product
+    INDEX: read dates from the persistent metadata index of the product
 
     Returns
     -------
@@ -82,16 +87,21 @@ def grace_find_months(base_dir, PROC, DREL, DSET='GSM'):
     #--  Directory of exact product (using date index from GSM)
     grace_dir = os.path.join(base_dir, PROC, DREL, DSET)
 
-    #-- check that GRACE/GRACE-FO date file exists
-    date_file = os.path.join(grace_dir,'{0}_{1}_DATES.txt'.format(PROC, DREL))
-    if not os.access(date_file, os.F_OK):
-        grace_date(base_dir,PROC=PROC,DREL=DREL,DSET=DSET,OUTPUT=True)
-
-    #-- read GRACE/GRACE-FO date ascii file from grace_date.py
-    #-- skip the header row and extract dates (decimal format) and months
-    date_input = np.loadtxt(date_file, skiprows=1)
-    tdec = date_input[:,0]
-    months = date_input[:,1].astype(np.int)
+    #-- query the persistent metadata index of the product
+    if INDEX:
+        dates = grace_metadata_index(base_dir, PROC, DREL, DSET)
+        tdec = dates['time']
+        months = dates['month']
+    else:
+        #-- check that GRACE/GRACE-FO date file exists
+        date_file = os.path.join(grace_dir,'{0}_{1}_DATES.txt'.format(PROC,DREL))
+        if not os.access(date_file, os.F_OK):
+            grace_date(base_dir,PROC=PROC,DREL=DREL,DSET=DSET,OUTPUT=True)
+        #-- read GRACE/GRACE-FO date ascii file from grace_date.py
+        #-- skip the header row and extract dates (decimal format) and months
+        date_input = np.loadtxt(date_file, skiprows=1)
+        tdec = date_input[:,0]
+        months = date_input[:,1].astype(np.int)
 
     #-- array of all possible months (or in case of CNES RL01/2: 10-day sets)
     all_months = np.arange(1,months.max(),dtype=np.int)
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+u"""
+grace_harmonics_cube.py
+Written by Tyler Sutterley (08/2020)
+
+Consolidates the GRACE/GRACE-FO files for a product into a single chunked and
+    compressed HDF5 cube of spherical harmonic coefficients
+Incrementally appends new (or replaced) months to an existing cube
+    and drops months that no longer have a GRACE/GRACE-FO file
+Reads spherical harmonic coefficients for a set of months from a cube
+
+CALLING SEQUENCE:
+    cube_file = grace_harmonics_cube(base_dir, PROC, DREL, DSET, LMAX)
+    Ylms = read_harmonics_cube(cube_file, months, LMAX)
+
+INPUTS:
+    base_dir: Working data directory for GRACE/GRACE-FO data
+    PROC: (CSR/CNES/JPL/GFZ) data processing center
+    DREL: (RL01,RL02,RL03,RL04,RL05,RL06) data release
+    DSET: (GAA/GAB/GAC/GAD/GSM) data product
+    LMAX: Upper bound of Spherical Harmonic Degrees (e.g. 60)
+
+OPTIONS:
+    MMAX: Upper bound of Spherical Harmonic Orders (default=LMAX)
+    POLE_TIDE: correct GSM data with pole tides following Wahr et al (2015)
+    FILENAME: output HDF5 cube file (default within product directory)
+    COMPRESSION: HDF5 compression filter for coefficient datasets
+    VERBOSE: print each month added to or removed from the cube
+    MODE: permissions mode of output file
+
+COMMAND LINE OPTIONS:
+    --help: list the command line options
+    --directory=X: working data directory
+    -C X, --center=X: GRACE/GRACE-FO Processing Center (CSR,GFZ,JPL)
+    -R X, --release=X: GRACE/GRACE-FO data releases (RL04,RL05,RL06)
+    -D X, --dataset=X: GRACE/GRACE-FO dataset (GAC,GAD,GSM)
+    -l X, --lmax=X: maximum spherical harmonic degree
+    -m X, --mmax=X: maximum spherical harmonic order
+    --pole-tide: correct GSM data with pole tides following Wahr et al (2015)
+    -V, --verbose: print each month added to or removed from the cube
+    -M X, --mode=X: permissions mode of output files
+
+OUTPUTS:
+    HDF5 cube file containing
+        clm, slm, eclm, eslm: coefficients and errors (LMAX+1,MMAX+1,nt)
+        time: mid-month date in year-decimal
+        start, end: start and end dates of each file as Julian day
+        month: GRACE/GRACE-FO month of each file
+        filename: name of each GRACE/GRACE-FO file
+        mtime: modification time of each GRACE/GRACE-FO file
+        header: file header of each GRACE/GRACE-FO file as JSON strings
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    PyYAML: YAML parser and emitter for Python (https://github.com/yaml/pyyaml)
+    h5py: Python interface for Hierarchal Data Format 5 (HDF5)
+        (https://www.h5py.org)
+
+PROGRAM DEPENDENCIES:
+    grace_date.py: reads GRACE index file and calculates dates for each month
+    read_GRACE_harmonics.py: reads an input GRACE data file and calculates date
+
+UPDATE HISTORY:
+    Written 08/2020
+"""
+from __future__ import print_function
+
+import sys
+import os
+import json
+import time
+import getopt
+import h5py
+import numpy as np
+from gravity_toolkit.grace_date import grace_date
+from gravity_toolkit.read_GRACE_harmonics import read_GRACE_harmonics
+
+#-- PURPOSE: create or update a HDF5 cube of GRACE/GRACE-FO coefficients
+def grace_harmonics_cube(base_dir, PROC, DREL, DSET, LMAX, MMAX=None,
+    POLE_TIDE=False, FILENAME=None, COMPRESSION='gzip', VERBOSE=False,
+    MODE=0o775):
+    """
+    Consolidates the GRACE/GRACE-FO files for a product into a single
+        chunked and compressed HDF5 cube of spherical harmonic coefficients
+    Appends only new or replaced months to an existing cube
+        and drops months that no longer have a GRACE/GRACE-FO file
+
+    Arguments
+    ---------
+    base_dir: Working data directory for GRACE/GRACE-FO data
+    PROC: GRACE/GRACE-FO data processing center
+    DREL: GRACE/GRACE-FO data release
+    DSET: GRACE/GRACE-FO data product
+    LMAX: Upper bound of Spherical Harmonic Degrees
+
+    Keyword arguments
+    -----------------
+    MMAX: Upper bound of Spherical Harmonic Orders
+    POLE_TIDE: correct GSM data with pole tides following Wahr et al (2015)
+    FILENAME: output HDF5 cube file
+    COMPRESSION: HDF5 compression filter for coefficient datasets
+    VERBOSE: print each month added to or removed from the cube
+    MODE: Permission mode of output file
+
+    Returns
+    -------
+    FILENAME: full path of the HDF5 cube file
+    """
+    #-- Directory of exact GRACE product
+    grace_dir = os.path.join(base_dir, PROC, DREL, DSET)
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    #-- default output cube file within the product directory
+    if FILENAME is None:
+        order_str = 'M{0:d}'.format(MMAX) if (MMAX != LMAX) else ''
+        pt_str = '_wPT' if POLE_TIDE else ''
+        args = (PROC,DREL,DSET,LMAX,order_str,pt_str)
+        FILENAME = os.path.join(grace_dir,
+            '{0}_{1}_{2}_L{3:d}{4}{5}_CUBE.H5'.format(*args))
+
+    #-- associate GRACE/GRACE-FO files with each GRACE/GRACE-FO month
+    grace_files=grace_date(base_dir,PROC=PROC,DREL=DREL,DSET=DSET,OUTPUT=False)
+
+    #-- open the HDF5 cube file for appending (create if not existing)
+    fileID = h5py.File(FILENAME, 'a')
+    if 'month' not in fileID.keys():
+        #-- create coefficient datasets with an extensible time dimension
+        #-- each chunk contains all coefficients for a single month
+        for key in ('clm','slm','eclm','eslm'):
+            fileID.create_dataset(key, (LMAX+1,MMAX+1,0),
+                maxshape=(LMAX+1,MMAX+1,None), chunks=(LMAX+1,MMAX+1,1),
+                dtype=np.float64, compression=COMPRESSION)
+        #-- create date and file metadata datasets
+        for key in ('time','start','end','mtime'):
+            fileID.create_dataset(key, (0,), maxshape=(None,),
+                dtype=np.float64)
+        fileID.create_dataset('month', (0,), maxshape=(None,), dtype=np.int64)
+        for key in ('filename','header'):
+            fileID.create_dataset(key, (0,), maxshape=(None,),
+                dtype=h5py.special_dtype(vlen=str))
+        #-- spherical harmonic degree and order
+        fileID.create_dataset('l', data=np.arange(LMAX+1))
+        fileID.create_dataset('m', data=np.arange(MMAX+1))
+        #-- attributes of the cube
+        fileID.attrs['PROC'] = PROC
+        fileID.attrs['DREL'] = DREL
+        fileID.attrs['DSET'] = DSET
+        fileID.attrs['LMAX'] = LMAX
+        fileID.attrs['MMAX'] = MMAX
+        fileID.attrs['POLE_TIDE'] = bool(POLE_TIDE)
+        fileID['clm'].attrs['units'] = 'Geodesy_Normalization'
+        fileID['slm'].attrs['units'] = 'Geodesy_Normalization'
+        fileID['time'].attrs['units'] = 'years'
+        fileID['start'].attrs['units'] = 'Julian_day'
+        fileID['end'].attrs['units'] = 'Julian_day'
+        fileID['mtime'].attrs['units'] = 'seconds since 1970-01-01T00:00:00'
+    elif ((fileID.attrs['LMAX'] != LMAX) or (fileID.attrs['MMAX'] != MMAX) or
+        (fileID.attrs['POLE_TIDE'] != bool(POLE_TIDE))):
+        fileID.close()
+        raise ValueError('Parameters do not match cube {0}'.format(FILENAME))
+
+    #-- drop months from the cube that no longer have a GRACE/GRACE-FO file
+    removed = sorted(set(fileID['month'][:]) - set(grace_files.keys()))
+    if removed:
+        print('Removing months: {0}'.format(','.join(map(str,removed)))) \
+            if VERBOSE else None
+        keep = [i for i,mon in enumerate(fileID['month'][:])
+            if mon not in removed]
+        n = len(keep)
+        for key in ('clm','slm','eclm','eslm'):
+            if keep:
+                fileID[key][:,:,:n] = fileID[key][:,:,keep]
+            fileID[key].resize(n, axis=2)
+        for key in ('time','start','end','mtime','month','filename','header'):
+            if keep:
+                fileID[key][:n] = fileID[key][keep]
+            fileID[key].resize((n,))
+    #-- index of each month currently within the cube
+    cube_index = {mon:i for i,mon in enumerate(fileID['month'][:])}
+    cube_files = [f.decode('utf8') if isinstance(f,bytes) else f
+        for f in fileID['filename'][:]]
+    cube_mtime = fileID['mtime'][:]
+    #-- for each GRACE/GRACE-FO month
+    for grace_month,infile in sorted(grace_files.items()):
+        mtime = os.stat(infile).st_mtime
+        #-- skip months in the cube with matching file names and times
+        if grace_month in cube_index.keys():
+            i = cube_index[grace_month]
+            if ((cube_files[i] == os.path.basename(infile)) and
+                (cube_mtime[i] == mtime)):
+                continue
+        else:
+            #-- extend the time dimension of the cube for the new month
+            i = fileID['month'].shape[0]
+            for key in ('clm','slm','eclm','eslm'):
+                fileID[key].resize(i+1, axis=2)
+            for key in ('time','start','end','mtime','month',
+                'filename','header'):
+                fileID[key].resize((i+1,))
+            cube_index[grace_month] = i
+        #-- read spherical harmonics from the GRACE/GRACE-FO file
+        print(os.path.basename(infile)) if VERBOSE else None
+        Ylms = read_GRACE_harmonics(infile,LMAX,MMAX=MMAX,POLE_TIDE=POLE_TIDE)
+        for key in ('clm','slm','eclm','eslm'):
+            fileID[key][:,:,i] = Ylms[key]
+        for key in ('time','start','end'):
+            fileID[key][i] = Ylms[key]
+        fileID['month'][i] = grace_month
+        fileID['mtime'][i] = mtime
+        fileID['filename'][i] = os.path.basename(infile)
+        fileID['header'][i] = json.dumps(Ylms.get('header'))
+
+    #-- update date of last modification and close the cube
+    fileID.attrs['date_modified'] = time.strftime('%Y-%m-%d',time.localtime())
+    fileID.close()
+    #-- set permissions level of output cube file
+    os.chmod(FILENAME, MODE)
+    #-- return the full path of the cube
+    return FILENAME
+
+#-- PURPOSE: read GRACE/GRACE-FO coefficients for months from a HDF5 cube
+def read_harmonics_cube(FILENAME, months, LMAX, MMAX=None, POLE_TIDE=None):
+    """
+    Reads spherical harmonic coefficients for a set of months from
+        a HDF5 cube of GRACE/GRACE-FO coefficients
+
+    Arguments
+    ---------
+    FILENAME: HDF5 cube file
+    months: list of GRACE/GRACE-FO months to read
+    LMAX: Upper bound of Spherical Harmonic Degrees
+
+    Keyword arguments
+    -----------------
+    MMAX: Upper bound of Spherical Harmonic Orders
+    POLE_TIDE: verify cube pole tide correction matches if not None
+
+    Returns
+    -------
+    clm: cosine spherical harmonics (LMAX+1,MMAX+1,nt)
+    slm: sine spherical harmonics (LMAX+1,MMAX+1,nt)
+    eclm: cosine spherical harmonic uncalibrated standard deviations
+    eslm: sine spherical harmonic uncalibrated standard deviations
+    time: mid-month date in year-decimal
+    start: start date of range as Julian day
+    end: end date of range as Julian day
+    month: GRACE/GRACE-FO months
+    filename: name of each GRACE/GRACE-FO file
+    header: file header of each GRACE/GRACE-FO file
+    """
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    MMAX = np.copy(LMAX) if (MMAX is None) else MMAX
+    Ylms = {}
+    with h5py.File(os.path.expanduser(FILENAME),'r') as fileID:
+        #-- check that the cube can be truncated to LMAX and MMAX
+        if (LMAX > fileID.attrs['LMAX']) or (MMAX > fileID.attrs['MMAX']):
+            raise ValueError('Cube truncation is lower than LMAX/MMAX')
+        #-- check that the cube has a matching pole tide correction
+        if (POLE_TIDE is not None) and \
+            (fileID.attrs['POLE_TIDE'] != bool(POLE_TIDE)):
+            raise ValueError('Cube pole tide correction does not match')
+        #-- index of each month within the cube
+        cube_index = {mon:i for i,mon in enumerate(fileID['month'][:])}
+        months_test = sorted(set(months) - set(cube_index.keys()))
+        if months_test:
+            gm = ','.join('{0:03d}'.format(gm) for gm in months_test)
+            raise IOError('No Matching Cube Months ({0})'.format(gm))
+        #-- HDF5 selections must be increasing: read sorted and reorder
+        indices = np.array([cube_index[mon] for mon in months],dtype=np.int64)
+        isort = np.argsort(indices)
+        inverse = np.argsort(isort)
+        for key in ('clm','slm','eclm','eslm'):
+            var = fileID[key][:LMAX+1,:MMAX+1,indices[isort].tolist()]
+            Ylms[key] = var[:,:,inverse]
+        for key in ('time','start','end','month','filename','header'):
+            Ylms[key] = fileID[key][indices[isort].tolist()][inverse]
+    #-- decode file names and file headers from JSON strings
+    Ylms['filename'] = [f.decode('utf8') if isinstance(f,bytes) else f
+        for f in Ylms['filename']]
+    Ylms['header'] = [json.loads(h) for h in Ylms['header']]
+    #-- return the python dictionary of coefficients
+    return Ylms
+
+#-- PURPOSE: help module to describe the optional input parameters
+def usage():
+    print('\nHelp: {}'.format(os.path.basename(sys.argv[0])))
+    print(' --directory=X\t\tGRACE/GRACE-FO working directory')
+    print(' -C X, --center=X\tGRACE/GRACE-FO Processing Center (CSR,GFZ,JPL)')
+    print(' -R X, --release=X\tGRACE/GRACE-FO data releases (RL04,RL05,RL06)')
+    print(' -D X, --dataset=X\tGRACE/GRACE-FO dataset (GAC,GAD,GSM)')
+    print(' -l X, --lmax=X\t\tMaximum spherical harmonic degree')
+    print(' -m X, --mmax=X\t\tMaximum spherical harmonic order')
+    print(' --pole-tide\t\tCorrect GSM data for pole tide drift')
+    print(' -V, --verbose\t\tPrint months added to or removed from the cube')
+    print(' -M X, --mode=X\t\tPermissions mode of output files\n')
+
+#-- PURPOSE: program that calls grace_harmonics_cube() with set parameters
+def main():
+    #-- Read the system arguments listed after the program
+    long_options = ['help','directory=','center=','release=','dataset=',
+        'lmax=','mmax=','pole-tide','verbose','mode=']
+    optlist,arglist = getopt.getopt(sys.argv[1:],'hC:R:D:l:m:VM:',long_options)
+
+    #-- GRACE/GRACE-FO directory
+    base_dir = os.getcwd()
+    #-- GRACE/GRACE-FO Processing Centers to run
+    PROC = ['CSR','GFZ','JPL']
+    #-- Data release
+    DREL = ['RL06']
+    #-- Dataset
+    DSET = ['GAC','GAD','GSM']
+    #-- maximum spherical harmonic degree and order
+    LMAX = 60
+    MMAX = None
+    #-- correct GSM data for pole tide drift
+    POLE_TIDE = False
+    #-- print each month added to or removed from the cube
+    VERBOSE = False
+    #-- permissions mode of output files (e.g. 0o775)
+    MODE = 0o775
+    for opt, arg in optlist:
+        if opt in ('-h','--help'):
+            usage()
+            sys.exit()
+        elif opt in ("--directory"):
+            base_dir = os.path.expanduser(arg)
+        elif opt in ("-C","--center"):
+            PROC = arg.upper().split(',')
+        elif opt in ("-R","--release"):
+            DREL = arg.upper().split(',')
+        elif opt in ("-D","--dataset"):
+            DSET = arg.upper().split(',')
+        elif opt in ("-l","--lmax"):
+            LMAX = int(arg)
+        elif opt in ("-m","--mmax"):
+            MMAX = int(arg)
+        elif opt in ("--pole-tide",):
+            POLE_TIDE = True
+        elif opt in ("-V","--verbose"):
+            VERBOSE = True
+        elif opt in ("-M","--mode"):
+            MODE = int(arg, 8)
+
+    #-- run GRACE/GRACE-FO cube program
+    for pr in PROC:
+        for rl in DREL:
+            for ds in DSET:
+                grace_harmonics_cube(base_dir, pr, rl, ds, LMAX, MMAX=MMAX,
+                    POLE_TIDE=POLE_TIDE, VERBOSE=VERBOSE, MODE=MODE)
+
+#-- run main program
+if __name__ == '__main__':
+    main()
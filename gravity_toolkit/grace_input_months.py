@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_input_months.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads GRACE/GRACE-FO files for a specified spherical harmonic degree and order
     and for a specified date range
@@ -36,6 +36,8 @@ INPUTS:
 OUTPUTS:
     clm: GRACE/GRACE-FO cosine spherical harmonic to degree/order LMAX and MMAX
     slm: GRACE/GRACE-FO sine spherical harmonic to degree/order LMAX and MMAX
+    eclm: GRACE/GRACE-FO cosine spherical harmonic calibrated errors
+    eslm: GRACE/GRACE-FO sine spherical harmonic calibrated errors
     time: time of each GRACE/GRACE-FO measurement (mid-month)
     month: GRACE/GRACE-FO months of input datasets
     l: spherical harmonic degree to LMAX
@@ -53,6 +55,11 @@ OPTIONS:
     ATM: correct data with ECMWF "jump" corrections GAE, GAF and GAG
     MODEL_DEG1: least-squares model missing degree 1 coefficients (True/False)
     DEG1_GIA: GIA-correction used when calculating degree 1 coefficients
+    PROCESSES: number of processes for parsing GRACE/GRACE-FO files in parallel
+    CACHE: directory for binary cache of parsed GRACE/GRACE-FO coefficients
+        and low degree replacement coefficients (C20, C30 and degree 1)
+    CUBE: read coefficients from a HDF5 cube created by grace_harmonics_cube
+    INDEX: read dates from the persistent metadata index of the product
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -66,9 +73,20 @@ PROGRAM DEPENDENCIES:
     read_tellus_geocenter.py: reads PO.DAAC degree 1 files
     read_SLR_geocenter.py: reads degree 1 files from Satellite Laser Ranging
     read_GRACE_geocenter.py: reads degree 1 files from Sutterley et al. (2019)
+    low_degree_cache.py: binary cache of parsed low degree coefficients
+    write_cache_file.py: writes numerical arrays to a binary cache file
     read_GRACE_harmonics.py: reads an input GRACE data file and calculates date
+    grace_harmonics_cube.py: reads coefficients from a HDF5 cube of a product
 
 UPDATE HISTORY:
+    Updated 08/2020: parse GRACE/GRACE-FO files in parallel (PROCESSES option)
+        added binary cache of parsed coefficients (CACHE option)
+        added option to read coefficients from a HDF5 cube (CUBE option)
+        added option to read dates from persistent metadata index (INDEX)
+        output calibrated errors (eclm and eslm) with replaced coefficients
+        use binary cache for parsed C20, C30 and degree 1 coefficients
+        use month indices for finding replacement coefficients
+        fix reading of AOD corrected SLR geocenter coefficients
     Updated 07/2020: added function docstrings
     Updated 06/2020: set relative time to mean of input within regress_model
     Updated 03/2020: for public release.  output degree and order in dict
@@ -107,18 +125,26 @@ from __future__ import print_function, division
 import os
 import re
 import gzip
+import hashlib
 import numpy as np
+import multiprocessing as mp
+import multiprocessing.pool
 from gravity_toolkit.grace_date import grace_date
 from gravity_toolkit.read_SLR_C20 import read_SLR_C20
 from gravity_toolkit.read_SLR_C30 import read_SLR_C30
 from gravity_toolkit.read_tellus_geocenter import read_tellus_geocenter
-from gravity_toolkit.read_SLR_geocenter import aod_corrected_SLR_geocenter
+from gravity_toolkit.read_SLR_geocenter import aod_corrected_SLR_geocenter, \
+    aod1b_geocenter_directory, aod1b_geocenter_files
 from read_GRACE_geocenter.read_GRACE_geocenter import read_GRACE_geocenter
 from gravity_toolkit.read_GRACE_harmonics import read_GRACE_harmonics
+from gravity_toolkit.grace_harmonics_cube import read_harmonics_cube
+from gravity_toolkit.low_degree_cache import low_degree_cache, month_index
+from gravity_toolkit.write_cache_file import write_cache_file
 
 def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
     start_mon, end_mon, missing, SLR_C20, DEG1, MMAX=None, SLR_C30='',
-    MODEL_DEG1=False, DEG1_GIA='', ATM=False, POLE_TIDE=False):
+    MODEL_DEG1=False, DEG1_GIA='', ATM=False, POLE_TIDE=False, PROCESSES=0,
+    CACHE=None, CUBE=None, INDEX=False):
     """
     Reads GRACE/GRACE-FO files for a spherical harmonic degree and order
         and a date range
@@ -159,6 +185,11 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
     ATM: correct data with ECMWF "jump" corrections GAE, GAF and GAG
     MODEL_DEG1: least-squares model missing degree 1 coefficients (True/False)
     DEG1_GIA: GIA-correction used when calculating degree 1 coefficients
+    PROCESSES: number of processes for parsing files (0 to run in series)
+    CACHE: directory for binary cache of parsed coefficients
+        (GRACE/GRACE-FO files and low degree replacement coefficients)
+    CUBE: read coefficients from a HDF5 cube created by grace_harmonics_cube
+    INDEX: read dates from the persistent metadata index of the product
 
     Returns
     -------
@@ -188,11 +219,11 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
             SLR_file = os.path.join(base_dir,'TN-07_C20_SLR.txt')
         elif (DREL == 'RL06'):
             SLR_file = os.path.join(base_dir,'TN-11_C20_SLR.txt')
-        C20_input = read_SLR_C20(SLR_file)
+        C20_input = low_degree_cache(read_SLR_C20, SLR_file, CACHE=CACHE)
         C20_str = '_wCSR_C20'
     elif (SLR_C20 == 'GSFC'):
         SLR_file=os.path.join(base_dir,'TN-14_C30_C20_GSFC_SLR.txt')
-        C20_input = read_SLR_C20(SLR_file)
+        C20_input = low_degree_cache(read_SLR_C20, SLR_file, CACHE=CACHE)
         C20_str = '_wGSFC_C20'
     else:
         C20_str = ''
@@ -201,15 +232,15 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
     #-- Running function read_SLR_C30.py
     if (SLR_C30 == 'CSR'):
         SLR_file=os.path.join(base_dir,'CSR_Monthly_5x5_Gravity_Harmonics.txt')
-        C30_input = read_SLR_C30(SLR_file)
+        C30_input = low_degree_cache(read_SLR_C30, SLR_file, CACHE=CACHE)
         C30_str = '_wCSR_C30'
     elif (SLR_C30 == 'LARES'):
         SLR_file=os.path.join(base_dir,'C30_LARES_filtered.txt')
-        C30_input = read_SLR_C30(SLR_file)
+        C30_input = low_degree_cache(read_SLR_C30, SLR_file, CACHE=CACHE)
         C30_str = '_wLARES_C30'
     elif (SLR_C30 == 'GSFC'):
         SLR_file=os.path.join(base_dir,'TN-14_C30_C20_GSFC_SLR.txt')
-        C30_input = read_SLR_C30(SLR_file)
+        C30_input = low_degree_cache(read_SLR_C30, SLR_file, CACHE=CACHE)
         C30_str = '_wGSFC_C30'
     else:
         C30_str = ''
@@ -227,7 +258,8 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
                 'TN-13_GEOC_{0}_{1}.txt'.format(PROC,DREL))
             JPL = True
         #-- Running function read_tellus_geocenter.py
-        DEG1_input = read_tellus_geocenter(DEG1_file,JPL=JPL)
+        DEG1_input = low_degree_cache(read_tellus_geocenter, DEG1_file,
+            CACHE=CACHE, JPL=JPL)
         DEG1_str = '_w{0}_DEG1'.format(DEG1)
     elif (DEG1 == 'SLR'):
         #-- CSR Satellite Laser Ranging (SLR) degree 1
@@ -240,7 +272,12 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
         #-- https://cddis.nasa.gov/lw20/docs/2016/papers/14-Ries_paper.pdf
         #-- ftp://ftp.csr.utexas.edu/pub/slr/geocenter/GCN_L1_L2_30d_CF-CM.txt
         DEG1_file = os.path.join(base_dir,'geocenter','GCN_L1_L2_30d_CF-CM.txt')
-        DEG1_input = aod_corrected_slr_deg1(DEG1_file,DREL,skiprows=111)
+        #-- cache is invalidated if any of the AOD1b geocenter files change
+        AOD1B_files = aod1b_geocenter_files(
+            aod1b_geocenter_directory(DEG1_file,DREL), DREL) \
+            if (CACHE is not None) else None
+        DEG1_input = low_degree_cache(aod_corrected_SLR_geocenter, DEG1_file,
+            args=(DREL,), FILES=AOD1B_files, CACHE=CACHE, skiprows=111)
         DEG1_str = '_w{0}_DEG1'.format(DEG1)
     elif (DEG1 == 'SLF'):
         #-- read iterated degree one files from Sutterley and Velicogna (2019)
@@ -271,24 +308,41 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
     #-- Initializing input data matrices
     grace_clm = np.zeros((LMAX+1,MMAX+1,n_cons))
     grace_slm = np.zeros((LMAX+1,MMAX+1,n_cons))
+    grace_eclm = np.zeros((LMAX+1,MMAX+1,n_cons))
+    grace_eslm = np.zeros((LMAX+1,MMAX+1,n_cons))
     tdec = np.zeros((n_cons))
     mon = np.zeros((n_cons),dtype=np.int)
     #-- output dimensions
     lout = np.arange(LMAX+1)
     mout = np.arange(MMAX+1)
 
-    #-- associate GRACE/GRACE-FO files with each GRACE/GRACE-FO month
-    grace_files=grace_date(base_dir,PROC=PROC,DREL=DREL,DSET=DSET,OUTPUT=False)
-
-    #-- importing data from GRACE/GRACE-FO files
-    for i,grace_month in enumerate(months):
-        #-- Effects of Pole tide drift will be compensated if soecified
-        infile = grace_files[grace_month]
-        Ylms = read_GRACE_harmonics(infile,LMAX,MMAX=MMAX,POLE_TIDE=POLE_TIDE)
-        grace_clm[:,:,i] = Ylms['clm'][0:LMAX+1,0:MMAX+1]
-        grace_slm[:,:,i] = Ylms['slm'][0:LMAX+1,0:MMAX+1]
-        tdec[i] = Ylms['time']
-        mon[i] = np.int(grace_month)
+    #-- importing data from a HDF5 cube of the GRACE/GRACE-FO product
+    if CUBE is not None:
+        #-- Effects of Pole tide drift must match the cube
+        Ylms = read_harmonics_cube(CUBE, months, LMAX, MMAX=MMAX,
+            POLE_TIDE=POLE_TIDE)
+        grace_clm[:,:,:] = Ylms['clm'][:,:,:]
+        grace_slm[:,:,:] = Ylms['slm'][:,:,:]
+        grace_eclm[:,:,:] = Ylms['eclm'][:,:,:]
+        grace_eslm[:,:,:] = Ylms['eslm'][:,:,:]
+        tdec[:] = Ylms['time']
+        mon[:] = np.array(months,dtype=np.int64)
+    else:
+        #-- associate GRACE/GRACE-FO files with each GRACE/GRACE-FO month
+        grace_files = grace_date(base_dir, PROC=PROC, DREL=DREL, DSET=DSET,
+            OUTPUT=False, INDEX=INDEX)
+        #-- importing data from GRACE/GRACE-FO files
+        #-- Effects of Pole tide drift will be compensated if specified
+        input_files = [grace_files[grace_month] for grace_month in months]
+        Ylms_list = read_harmonics_files(input_files, LMAX, MMAX=MMAX,
+            POLE_TIDE=POLE_TIDE, PROCESSES=PROCESSES, CACHE=CACHE)
+        for i,(grace_month,Ylms) in enumerate(zip(months,Ylms_list)):
+            grace_clm[:,:,i] = Ylms['clm'][0:LMAX+1,0:MMAX+1]
+            grace_slm[:,:,i] = Ylms['slm'][0:LMAX+1,0:MMAX+1]
+            grace_eclm[:,:,i] = Ylms['eclm'][0:LMAX+1,0:MMAX+1]
+            grace_eslm[:,:,i] = Ylms['eslm'][0:LMAX+1,0:MMAX+1]
+            tdec[i] = Ylms['time']
+            mon[i] = np.int(grace_month)
 
     #-- Replace C20 with SLR coefficients
     if SLR_C20 in ('CSR','GSFC'):
@@ -298,11 +352,10 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
             gm = ','.join('{0:03d}'.format(gm) for gm in months_test)
             raise IOError('No Matching C20 Months ({0})'.format(gm))
         #-- replace C20 with SLR coefficients
-        for i,grace_month in enumerate(months):
-            count = np.count_nonzero(C20_input['month'] == grace_month)
-            if (count != 0):
-                k, = np.nonzero(C20_input['month'] == grace_month)
-                grace_clm[2,0,i] = C20_input['data'][k]
+        C20_index = month_index(C20_input['month'])
+        k = np.array([C20_index[grace_month] for grace_month in months])
+        grace_clm[2,0,:] = C20_input['data'][k]
+        grace_eclm[2,0,:] = C20_input['error'][k]
 
     #-- Replace C30 with SLR coefficients for single-accelerometer months
     if SLR_C30 in ('CSR','GSFC','LARES'):
@@ -312,11 +365,12 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
             gm = ','.join('{0:03d}'.format(gm) for gm in months_test)
             raise IOError('No Matching C30 Months ({0})'.format(gm))
         #-- replace C30 with SLR coefficients
+        C30_index = month_index(C30_input['month'])
         for i,grace_month in enumerate(months):
-            count = np.count_nonzero(C30_input['month'] == grace_month)
-            if (count != 0) and (grace_month > 176):
-                k, = np.nonzero(C30_input['month'] == grace_month)
+            k = C30_index.get(grace_month)
+            if (k is not None) and (grace_month > 176):
                 grace_clm[3,0,i] = C30_input['data'][k]
+                grace_eclm[3,0,i] = C30_input['error'][k]
 
     #-- Use Degree 1 coefficients
     #-- Tellus: Tellus Degree 1 (PO.DAAC following Sun et al., 2016)
@@ -340,20 +394,30 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
                 gm = ','.join('{0:03d}'.format(gm) for gm in months_test)
                 raise IOError('No Matching Geocenter Months ({0})'.format(gm))
         #-- for each considered date
+        DEG1_index = month_index(DEG1_input['month'])
         for i,grace_month in enumerate(months):
-            k, = np.nonzero(DEG1_input['month'] == grace_month)
-            count = np.count_nonzero(DEG1_input['month'] == grace_month)
+            k = DEG1_index.get(grace_month)
             #-- Degree 1 is missing for particular month
-            if (count == 0) and MODEL_DEG1:
+            if (k is None) and MODEL_DEG1:
                 #-- using least-squares modeled coefficients from
                 #-- lsq_model_degree_one.py
                 grace_clm[1,0,i] = C10_model[i]
                 grace_clm[1,1,i] = C11_model[i]
                 grace_slm[1,1,i] = S11_model[i]
+                #-- using the RMS of the degree 1 errors
+                if 'eC10' in DEG1_input.keys():
+                    grace_eclm[1,0,i] = np.sqrt(np.mean(DEG1_input['eC10']**2))
+                    grace_eclm[1,1,i] = np.sqrt(np.mean(DEG1_input['eC11']**2))
+                    grace_eslm[1,1,i] = np.sqrt(np.mean(DEG1_input['eS11']**2))
             else:#-- using coefficients from data file
                 grace_clm[1,0,i] = DEG1_input['C10'][k]
                 grace_clm[1,1,i] = DEG1_input['C11'][k]
                 grace_slm[1,1,i] = DEG1_input['S11'][k]
+                #-- using errors from data file if available
+                if 'eC10' in DEG1_input.keys():
+                    grace_eclm[1,0,i] = DEG1_input['eC10'][k]
+                    grace_eclm[1,1,i] = DEG1_input['eC11'][k]
+                    grace_eslm[1,1,i] = DEG1_input['eS11'][k]
 
     #-- read and add/remove the GAE and GAF atmospheric correction coefficients
     if ATM:
@@ -372,8 +436,122 @@ def grace_input_months(base_dir, PROC, DREL, DSET, LMAX,
                     grace_clm[l,m,:] += atm_corr['clm'][l,m,:]
                     grace_slm[l,m,:] += atm_corr['slm'][l,m,:]
 
-    return {'clm':grace_clm, 'slm':grace_slm, 'time':tdec, 'month':mon,
-        'l':lout, 'm':mout, 'title':out_str, 'directory':grace_dir}
+    return {'clm':grace_clm, 'slm':grace_slm, 'eclm':grace_eclm,
+        'eslm':grace_eslm, 'time':tdec, 'month':mon, 'l':lout, 'm':mout,
+        'title':out_str, 'directory':grace_dir}
+
+#-- PURPOSE: read a list of GRACE/GRACE-FO files in series or in parallel
+def read_harmonics_files(input_files, LMAX, MMAX=None, POLE_TIDE=False,
+    PROCESSES=0, CACHE=None):
+    """
+    Reads a list of GRACE/GRACE-FO files in series or in parallel
+    Optionally reads and writes parsed coefficients from a binary cache
+
+    Arguments
+    ---------
+    input_files: list of GRACE/GRACE-FO Level-2 spherical harmonic files
+    LMAX: Upper bound of Spherical Harmonic Degrees
+
+    Keyword arguments
+    -----------------
+    MMAX: Upper bound of Spherical Harmonic Orders
+    POLE_TIDE: correct GSM data with pole tides following Wahr et al (2015)
+    PROCESSES: number of processes for parsing files (0 to run in series)
+    CACHE: directory for binary cache of parsed coefficients
+
+    Returns
+    -------
+    list of python dictionaries with the coefficients for each file
+    """
+    #-- output list of spherical harmonics for each file
+    Ylms_list = [None]*len(input_files)
+    #-- read any files existing within the binary cache
+    if CACHE is not None:
+        #-- create the cache directory if not currently existing
+        if not os.access(os.path.expanduser(CACHE), os.F_OK):
+            os.makedirs(os.path.expanduser(CACHE))
+        #-- binary cache files for each input file
+        cache_files = [cache_filename(f, LMAX, MMAX=MMAX, POLE_TIDE=POLE_TIDE,
+            CACHE=CACHE) for f in input_files]
+        #-- reading cached files is I/O bound: use a pool of threads
+        if (PROCESSES == 0):
+            Ylms_list = [read_cache_file(f) for f in cache_files]
+        else:
+            pool = mp.pool.ThreadPool(processes=PROCESSES)
+            Ylms_list = pool.map(read_cache_file, cache_files)
+            pool.close()
+            pool.join()
+    #-- indices of files that need to be parsed
+    indices = [i for i,Ylms in enumerate(Ylms_list) if Ylms is None]
+    args = [(input_files[i],LMAX,MMAX,POLE_TIDE) for i in indices]
+    #-- parsing files is CPU bound: use a pool of processes
+    if (PROCESSES == 0) or (len(indices) <= 1):
+        parsed = [read_GRACE_harmonics(*a) for a in args]
+    else:
+        pool = mp.Pool(processes=PROCESSES)
+        parsed = pool.starmap(read_GRACE_harmonics, args)
+        pool.close()
+        pool.join()
+    #-- add parsed coefficients to output list and write to the binary cache
+    for i,Ylms in zip(indices,parsed):
+        Ylms_list[i] = Ylms
+        if CACHE is not None:
+            write_cache_file(cache_files[i], **{key:Ylms[key] for key in
+                ('clm','slm','eclm','eslm','time','start','end')})
+    #-- return the list of coefficients
+    return Ylms_list
+
+#-- PURPOSE: calculate the binary cache filename for a GRACE/GRACE-FO file
+#-- hashes the file path, modification time, size and the read parameters
+def cache_filename(input_file, LMAX, MMAX=None, POLE_TIDE=False, CACHE=None):
+    """
+    Calculates the binary cache filename for a GRACE/GRACE-FO file
+
+    Arguments
+    ---------
+    input_file: GRACE/GRACE-FO Level-2 spherical harmonic data file
+    LMAX: Upper bound of Spherical Harmonic Degrees
+
+    Keyword arguments
+    -----------------
+    MMAX: Upper bound of Spherical Harmonic Orders
+    POLE_TIDE: correct GSM data with pole tides following Wahr et al (2015)
+    CACHE: directory for binary cache of parsed coefficients
+
+    Returns
+    -------
+    full path to the binary cache file
+    """
+    #-- full path and file information for input file
+    input_file = os.path.abspath(os.path.expanduser(input_file))
+    file_info = os.stat(input_file)
+    MMAX = LMAX if (MMAX is None) else MMAX
+    #-- unique key for file and read parameters
+    args = (input_file,file_info.st_mtime_ns,file_info.st_size,
+        LMAX,MMAX,bool(POLE_TIDE))
+    key = '{0}:{1:d}:{2:d}:{3:d}:{4:d}:{5}'.format(*args)
+    digest = hashlib.sha1(key.encode('utf8')).hexdigest()
+    return os.path.join(os.path.expanduser(CACHE),'{0}.npz'.format(digest))
+
+#-- PURPOSE: read parsed coefficients from a binary cache file
+def read_cache_file(cache_file):
+    """
+    Reads parsed GRACE/GRACE-FO coefficients from a binary cache file
+
+    Arguments
+    ---------
+    cache_file: binary cache file
+
+    Returns
+    -------
+    python dictionary with coefficients and dates (None if not cached)
+    """
+    #-- check that cache file exists
+    if not os.access(cache_file, os.F_OK):
+        return None
+    #-- read all variables from the binary cache file
+    with np.load(cache_file) as fileID:
+        return {key:fileID[key] for key in fileID.files}
 
 #-- PURPOSE: read atmospheric jump corrections from Fagiolini et al. (2015)
 def read_ecmwf_corrections(base_dir, LMAX, months, MMAX=None):
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+u"""
+grace_metadata_index.py
+Written by Tyler Sutterley (08/2020)
+
+Creates and incrementally updates a persistent JSON index of metadata for
+    each GRACE/GRACE-FO file within a working data directory
+Parses dates of each GRACE/GRACE-FO file and assigns the month number
+
+CALLING SEQUENCE:
+    dates = grace_metadata_index(base_dir, PROC, DREL, DSET)
+
+INPUTS:
+    base_dir: Working data directory for GRACE/GRACE-FO data
+    PROC: GRACE data processing center (CSR/CNES/JPL/GFZ)
+    DREL: GRACE data release (RL03 for CNES) (RL06 for CSR/GFZ/JPL)
+    DSET: GRACE dataset (GAA/GAB/GAC/GAD/GSM)
+
+OPTIONS:
+    CHECKSUM: calculate MD5 checksums of new and modified files
+    MODE: permissions mode of output index file
+
+OUTPUTS:
+    filename: full path of each GRACE/GRACE-FO file
+    time: mid-month date of each file in year-decimal
+    month: GRACE/GRACE-FO month of each file
+    start_yr, start_day: start date of each file as year and day of year
+    end_yr, end_day: end date of each file as year and day of year
+    tot_days: number of days since the start of 2002
+    size: size of each file in bytes
+    mtime: modification time of each file
+    checksum: MD5 checksum of each file
+
+COMMAND LINE OPTIONS:
+    --help: list the command line options
+    --directory=X: working data directory
+    -C X, --center=X: GRACE/GRACE-FO Processing Center (CSR,GFZ,JPL)
+    -R X, --release=X: GRACE/GRACE-FO data releases (RL04,RL05,RL06)
+    -D X, --dataset=X: GRACE/GRACE-FO dataset (GAC,GAD,GSM)
+    --checksum: calculate MD5 checksums of new and modified files
+    -M X, --mode=X: permissions mode of output files
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+
+PROGRAM DEPENDENCIES:
+    convert_julian.py: converts a Julian date into a calendar date
+
+UPDATE HISTORY:
+    Written 08/2020
+"""
+from __future__ import print_function
+
+import sys
+import os
+import re
+import json
+import getopt
+import hashlib
+import tempfile
+import numpy as np
+from gravity_toolkit.convert_julian import convert_julian
+
+#-- PURPOSE: create or update the metadata index for a GRACE/GRACE-FO product
+def grace_metadata_index(base_dir, PROC, DREL, DSET, CHECKSUM=False,
+    MODE=0o775):
+    """
+    Creates and incrementally updates a persistent JSON index of metadata
+        for each file of a GRACE/GRACE-FO product
+
+    Arguments
+    ---------
+    base_dir: working data directory
+    PROC: GRACE data processing center
+        CSR: University of Texas Center for Space Research
+        GFZ: German Research Centre for Geosciences (GeoForschungsZentrum)
+        JPL: Jet Propulsion Laboratory
+        CNES: French Centre National D'Etudes Spatiales
+    DREL: GRACE/GRACE-FO data release
+    DSET: GRACE/GRACE-FO dataset
+
+    Keyword arguments
+    -----------------
+    CHECKSUM: calculate MD5 checksums of new and modified files
+    MODE: Permission mode of output index file
+
+    Returns
+    -------
+    filename: full path of each GRACE/GRACE-FO file
+    time: mid-month date of each file in year-decimal
+    month: GRACE/GRACE-FO month of each file
+    start_yr: year of start date
+    start_day: day of year of start date
+    end_yr: year of end date
+    end_day: day of year of end date
+    tot_days: number of days since the start of 2002
+    size: size of each file in bytes
+    mtime: modification time of each file
+    checksum: MD5 checksum of each file
+    """
+    #--  Directory of exact product
+    grace_dir = os.path.join(base_dir, PROC, DREL, DSET)
+    #-- persistent metadata index file for the working data directory
+    index_file = os.path.join(base_dir, 'grace_metadata_index.json')
+    #-- read the metadata index if existing
+    if os.access(index_file, os.F_OK):
+        with open(index_file, 'r') as f:
+            metadata = json.load(f)
+    else:
+        metadata = {}
+    #-- key for the product within the metadata index
+    key = '{0}_{1}_{2}'.format(PROC, DREL, DSET)
+    product = metadata.get(key, dict(files=[]))
+    #-- entries for each file currently within the metadata index
+    entries = {e['filename']:e for e in product['files']}
+
+    #-- input index file containing GRACE data filenames
+    with open(os.path.join(grace_dir, 'index.txt'),'r') as f:
+        input_files = f.read().splitlines()
+    #-- check if any files have been added, removed or modified
+    UPDATE = (input_files != [e['filename'] for e in product['files']])
+    output_files = []
+    for infile in input_files:
+        file_info = os.stat(os.path.join(grace_dir, infile))
+        entry = entries.get(infile, dict(filename=infile))
+        #-- verify that file is unchanged since last indexed
+        if ((entry.get('size') != file_info.st_size) or
+            (entry.get('mtime') != file_info.st_mtime) or
+            (CHECKSUM and not entry.get('checksum'))):
+            entry = dict(filename=infile, center=PROC, release=DREL,
+                dataset=DSET, size=file_info.st_size,
+                mtime=file_info.st_mtime)
+            #-- calculate the checksum of the new or modified file
+            if CHECKSUM:
+                entry['checksum'] = get_hash(os.path.join(grace_dir, infile))
+            UPDATE = True
+        output_files.append(entry)
+
+    #-- update dates and months and write the metadata index if changed
+    if UPDATE:
+        dates = grace_file_dates(input_files, PROC=PROC, DREL=DREL)
+        for i,entry in enumerate(output_files):
+            for k in ('time','start_yr','start_day','end_yr','end_day',
+                'tot_days'):
+                entry[k] = dates[k][i].item()
+            entry['month'] = int(dates['month'][i])
+        metadata[key] = dict(files=output_files)
+        #-- write to a temporary file and then move to the index file
+        fd,temp_file = tempfile.mkstemp(suffix='.json', dir=base_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(metadata, f, indent=1)
+        os.replace(temp_file, index_file)
+        os.chmod(index_file, MODE)
+
+    #-- convert entries of the metadata index into output arrays
+    dates = {}
+    dates['filename'] = [os.path.join(grace_dir,e['filename'])
+        for e in output_files]
+    dates['month'] = np.array([e['month'] for e in output_files],dtype=np.int64)
+    for k in ('time','start_yr','start_day','end_yr','end_day','tot_days',
+        'size','mtime'):
+        dates[k] = np.array([e[k] for e in output_files],dtype=np.float64)
+    dates['checksum'] = [e.get('checksum','') for e in output_files]
+    #-- return the python dictionary of metadata
+    return dates
+
+#-- PURPOSE: parse dates of each GRACE/GRACE-FO file and assign month number
+def grace_file_dates(input_files, PROC='', DREL=''):
+    """
+    Parses dates of each GRACE/GRACE-FO file and assigns the month number
+
+    Arguments
+    ---------
+    input_files: list of GRACE/GRACE-FO files in chronological order
+
+    Keyword arguments
+    -----------------
+    PROC: GRACE data processing center
+    DREL: GRACE/GRACE-FO data release
+
+    Returns
+    -------
+    time: mid-month date of each file in year-decimal
+    month: GRACE/GRACE-FO month of each file
+    start_yr: year of start date
+    start_day: day of year of start date
+    end_yr: year of end date
+    end_day: day of year of end date
+    tot_days: number of days since the start of 2002
+    """
+    #--  number of lines in input_files
+    n_files = len(input_files)
+
+    #-- define date variables
+    start_yr = np.zeros((n_files))#-- year start date
+    end_yr = np.zeros((n_files))#-- year end date
+    start_day = np.zeros((n_files))#-- day number start date
+    end_day = np.zeros((n_files))#-- day number end date
+    mid_day = np.zeros((n_files))#-- mid-month day
+    JD = np.zeros((n_files))#-- Julian date of mid-month
+    tot_days = np.zeros((n_files))#-- number of days since Jan 2002
+    tdec = np.zeros((n_files))#-- tdec is the date in decimal form
+    mon = np.zeros((n_files,),dtype=np.int)#-- GRACE/GRACE-FO month number
+
+    #-- compile numerical expression operator for parameters from files
+    #-- will work with previous releases and releases for GRACE-FO
+    #-- UTCSR: The University of Texas at Austin Center for Space Research
+    #-- EIGEN: GFZ German Research Center for Geosciences (RL01-RL05)
+    #-- GFZOP: GFZ German Research Center for Geosciences (RL06+GRACE-FO)
+    #-- JPLEM: NASA Jet Propulsion Laboratory (harmonic solutions)
+    #-- JPLMSC: NASA Jet Propulsion Laboratory (mascon solutions)
+    regex_pattern = ('(.*?)-2_(\d+)-(\d+)_(.*?)_({0})_(.*?)_(\d+)(.*?)'
+        '(\.gz|\.gfc)?$').format('UTCSR|EIGEN|GFZOP|JPLEM|JPLMSC')
+    rx = re.compile(regex_pattern, re.VERBOSE)
+
+    #-- for each data file
+    for t, infile in enumerate(input_files):
+        #-- extract parameters from input filename
+        PFX,start_date,end_date,AUX,PRC,F1,DRL,F2,SFX = rx.findall(infile).pop()
+        #-- find start date, end date and number of days
+        start_yr[t] = np.float(start_date[:4])
+        end_yr[t] = np.float(end_date[:4])
+        start_day[t] = np.float(start_date[4:])
+        end_day[t] = np.float(end_date[4:])
+        #-- end_day (will be changed if the month crosses 2 years)
+        end_plus = np.copy(end_day[t])
+
+        #-- calculate mid-month date taking into account if measurements are
+        #-- on different years
+        if ((start_yr[t] % 4) == 0):#-- Leap Year (% = modulus)
+            dpy = 366.0
+        else:#-- Standard Year
+            dpy = 365.0
+        #-- For data that crosses years
+        if (start_yr[t] != end_yr[t]):
+            #-- end_yr - start_yr should be 1
+            end_plus = (end_yr[t]-start_yr[t])*dpy + end_day[t]
+        #-- Calculation of Mid-month value
+        mid_day[t] = np.mean([start_day[t], end_plus])
+
+        #-- Calculation of the Julian date from start_yr and mid_day
+        JD[t] = np.float(367.0*start_yr[t] - \
+            np.floor(7.0*(start_yr[t] + np.floor(10.0/12.0))/4.0) - \
+            np.floor(3.0*(np.floor((start_yr[t] - 8.0/7.0)/100.0) + 1.0)/4.0) +\
+            np.floor(275.0/9.0) + mid_day[t] + 1721028.5)
+        #-- convert the julian date into calendar dates (hour, day, month, year)
+        cal_date = convert_julian(JD[t])
+
+        #-- Calculating the mid-month date in decimal form
+        tdec[t] = start_yr[t] + mid_day[t]/dpy
+
+        #-- Calculation of total days since start of campaign
+        count = 0
+        n_yrs = np.int(start_yr[t]-2002)
+        #-- for each of the GRACE years up to the file year
+        for iyr in range(n_yrs):
+            #-- year i
+            year = 2002 + iyr
+            #-- number of days in year i (if leap year or standard year)
+            if ((year % 4) == 0):
+                #-- Leap Year
+                dpm=[31,29,31,30,31,30,31,31,30,31,30,31]
+            else:
+                #-- Standard Year
+                dpm=[31,28,31,30,31,30,31,31,30,31,30,31]
+            #-- add all days from prior years to count
+            count += np.sum(dpm)
+
+        #-- calculating the total number of days since 2002
+        tot_days[t] = np.mean([count+start_day[t], count+end_plus])
+
+        #-- Calculates the month number (or 10-day number for CNES RL01,RL02)
+        if ((PROC == 'CNES') and (DREL in ('RL01','RL02'))):
+            mon[t] = np.round(1.0+(tot_days[t]-tot_days[0])/10.0)
+        else:
+            #-- calculate the GRACE/GRACE-FO month (Apr02 == 004)
+            #-- https://grace.jpl.nasa.gov/data/grace-months/
+            #-- Notes on special months (e.g. 119, 120) below
+            mon[t] = 12*(cal_date['year']-2002) + cal_date['month']
+
+            #-- The 'Special Months' (Nov 2011, Dec 2011 and April 2012) with
+            #-- Accelerometer shutoffs make this relation between month number
+            #-- and date more complicated as days from other months are used
+            #-- For CSR and GFZ: Nov11 (month 119) is centered in Oct11 (118)
+            #-- For JPL: Dec 2011 (month 120) is centered in Jan12 (121)
+            #-- For all: May15 (month 161) is centered in Apr15 (160)
+            if PROC in ('CSR','GFZ') and (mon[t] == mon[t-1]) and (mon[t-1] == 118):
+                mon[t] = mon[t-1] + 1
+            elif (mon[t] == mon[t-1]) and (mon[t-1] == 160):
+                mon[t] = mon[t-1] + 1
+            elif PROC in ('JPL') and (mon[t-1] == 119):
+                mon[t] = mon[t-1] + 1
+
+    #-- return the python dictionary of dates and months
+    return {'time':tdec, 'month':mon, 'start_yr':start_yr,
+        'start_day':start_day, 'end_yr':end_yr, 'end_day':end_day,
+        'tot_days':tot_days}
+
+#-- PURPOSE: get the MD5 hash value of a file
+def get_hash(local_file):
+    """
+    Get the MD5 hash value from a local file
+
+    Arguments
+    ---------
+    local_file: path to file
+    """
+    #-- read the input file in chunks to calculate the hash value
+    md5 = hashlib.md5()
+    with open(os.path.expanduser(local_file), 'rb') as local_buffer:
+        for chunk in iter(lambda: local_buffer.read(1048576), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+#-- PURPOSE: help module to describe the optional input parameters
+def usage():
+    print('\nHelp: {}'.format(os.path.basename(sys.argv[0])))
+    print(' --directory=X\t\tGRACE/GRACE-FO working directory')
+    print(' -C X, --center=X\tGRACE/GRACE-FO Processing Center (CSR,GFZ,JPL)')
+    print(' -R X, --release=X\tGRACE/GRACE-FO data releases (RL04,RL05,RL06)')
+    print(' -D X, --dataset=X\tGRACE/GRACE-FO dataset (GAC,GAD,GSM)')
+    print(' --checksum\t\tCalculate MD5 checksums of new and modified files')
+    print(' -M X, --mode=X\t\tPermissions mode of output files\n')
+
+#-- PURPOSE: program that calls grace_metadata_index() with set parameters
+def main():
+    #-- Read the system arguments listed after the program
+    long_options = ['help','directory=','center=','release=','dataset=',
+        'checksum','mode=']
+    optlist,arglist = getopt.getopt(sys.argv[1:],'hC:R:D:M:',long_options)
+
+    #-- GRACE/GRACE-FO directory
+    base_dir = os.getcwd()
+    #-- GRACE/GRACE-FO Processing Centers to run
+    PROC = ['CSR','GFZ','JPL']
+    #-- Data release
+    DREL = ['RL06']
+    #-- Dataset
+    DSET = ['GAC','GAD','GSM']
+    #-- calculate MD5 checksums of new and modified files
+    CHECKSUM = False
+    #-- permissions mode of output files (e.g. 0o775)
+    MODE = 0o775
+    for opt, arg in optlist:
+        if opt in ('-h','--help'):
+            usage()
+            sys.exit()
+        elif opt in ("--directory"):
+            base_dir = os.path.expanduser(arg)
+        elif opt in ("-C","--center"):
+            PROC = arg.upper().split(',')
+        elif opt in ("-R","--release"):
+            DREL = arg.upper().split(',')
+        elif opt in ("-D","--dataset"):
+            DSET = arg.upper().split(',')
+        elif opt in ("--checksum",):
+            CHECKSUM = True
+        elif opt in ("-M","--mode"):
+            MODE = int(arg, 8)
+
+    #-- run GRACE/GRACE-FO metadata index program
+    for pr in PROC:
+        for rl in DREL:
+            for ds in DSET:
+                grace_metadata_index(base_dir, pr, rl, ds,
+                    CHECKSUM=CHECKSUM, MODE=MODE)
+
+#-- run main program
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_months_index.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Creates a file with the start and end days for each dataset
 Shows the range of each month for (CSR/GFZ/JPL) (RL04/RL05/RL06)
@@ -13,6 +13,7 @@ INPUTS:
 OPTIONS:
     DREL: GRACE/GRACE-FO data release (RL04, RL05, RL06)
     MODE: Permissions mode of output index file
+    INDEX: read dates from the persistent metadata index of each product
 
 OUTPUTS:
     GRACE_months.txt
@@ -27,11 +28,16 @@ COMMAND LINE OPTIONS:
     -D X, --directory=X: Working GRACE/GRACE-FO data directory
     -R X, --release=X: GRACE data releases to run (RL06)
     --mode=X: permissions mode of output GRACE month file
+    --index: read dates from the persistent metadata index of each product
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
 
+PROGRAM DEPENDENCIES:
+    grace_metadata_index.py: creates persistent metadata index of a product
+
 UPDATE HISTORY:
+    Updated 08/2020: added option to read dates from metadata index (INDEX)
     Updated 07/2020: added function docstrings
     Updated 05/2020 for public release
     Updated 05-06/2018: GRACE release 6 (not all processing centers have RL06)
@@ -52,8 +58,9 @@ import os
 import getopt
 import calendar
 import numpy as np
+from gravity_toolkit.grace_metadata_index import grace_metadata_index
 
-def grace_months_index(base_dir, DREL=['RL06'], MODE=None):
+def grace_months_index(base_dir, DREL=['RL06'], MODE=None, INDEX=False):
     """
     Creates a file with the start and end days for each dataset
     Shows the range of each month for (CSR/GFZ/JPL) (RL04/RL05/RL06)
@@ -67,6 +74,7 @@ def grace_months_index(base_dir, DREL=['RL06'], MODE=None):
     -----------------
     DREL: GRACE/GRACE-FO data release (RL04, RL05, RL06)
     MODE: Permissions mode of output index file
+    INDEX: read dates from the persistent metadata index of each product
     """
     #-- Output GRACE months file
     grace_months_file = 'GRACE_months.txt'
@@ -93,36 +101,45 @@ def grace_months_index(base_dir, DREL=['RL06'], MODE=None):
             #-- read GRACE date ascii file
             #-- file created in read_grace.py or grace_dates.py
             grace_date_file = '{0}_{1}_DATES.txt'.format(pr,rl)
-            if os.access(os.path.join(grace_dir,grace_date_file), os.F_OK):
+            if INDEX and os.access(os.path.join(grace_dir,'index.txt'),os.F_OK):
+                #-- query the persistent metadata index of the product
+                dates = grace_metadata_index(base_dir, pr, rl, DSET)
+                #-- same columns as the GRACE date ascii file
+                date_input = np.c_[dates['time'], dates['month'],
+                    dates['start_yr'], dates['start_day'], dates['end_yr'],
+                    dates['end_day'], dates['tot_days']]
+            elif os.access(os.path.join(grace_dir,grace_date_file), os.F_OK):
                 #-- skip the header line
                 date_input = np.loadtxt(os.path.join(grace_dir,grace_date_file),
                     skiprows=1)
-                #-- number of months
-                nmon = np.shape(date_input)[0]
-
-                #-- Setting the dictionary key e.g. 'CSR_RL04'
-                var_name = '{0}_{1}'.format(pr,rl)
-
-                #-- Creating a python dictionary for each dataset with parameters:
-                #-- month #, start year, start day, end year, end day
-                #-- Purpose is to get all of the dates loaded for each dataset
-                #-- Adding data to dictionary for data processing and release
-                var_info[var_name] = {}
-                #-- allocate for output variables
-                var_info[var_name]['mon'] = np.zeros((nmon),dtype=np.int)
-                var_info[var_name]['styr'] = np.zeros((nmon),dtype=np.int)
-                var_info[var_name]['stday'] = np.zeros((nmon),dtype=np.int)
-                var_info[var_name]['endyr'] = np.zeros((nmon),dtype=np.int)
-                var_info[var_name]['endday'] = np.zeros((nmon),dtype=np.int)
-                #-- place output variables in dictionary
-                for i,key in enumerate(['mon','styr','stday','endyr','endday']):
-                    #-- first column is date in decimal form (start at 1 not 0)
-                    var_info[var_name][key] = date_input[:,i+1].astype(np.int)
-                #-- Finding the maximum month measured
-                if (var_info[var_name]['mon'].max() > max_mon):
-                    #-- if the maximum month in this dataset is greater
-                    #-- than the previously read datasets
-                    max_mon = np.int(var_info[var_name]['mon'].max())
+            else:
+                continue
+            #-- number of months
+            nmon = np.shape(date_input)[0]
+
+            #-- Setting the dictionary key e.g. 'CSR_RL04'
+            var_name = '{0}_{1}'.format(pr,rl)
+
+            #-- Creating a python dictionary for each dataset with parameters:
+            #-- month #, start year, start day, end year, end day
+            #-- Purpose is to get all of the dates loaded for each dataset
+            #-- Adding data to dictionary for data processing and release
+            var_info[var_name] = {}
+            #-- allocate for output variables
+            var_info[var_name]['mon'] = np.zeros((nmon),dtype=np.int)
+            var_info[var_name]['styr'] = np.zeros((nmon),dtype=np.int)
+            var_info[var_name]['stday'] = np.zeros((nmon),dtype=np.int)
+            var_info[var_name]['endyr'] = np.zeros((nmon),dtype=np.int)
+            var_info[var_name]['endday'] = np.zeros((nmon),dtype=np.int)
+            #-- place output variables in dictionary
+            for i,key in enumerate(['mon','styr','stday','endyr','endday']):
+                #-- first column is date in decimal form (start at 1 not 0)
+                var_info[var_name][key] = date_input[:,i+1].astype(np.int)
+            #-- Finding the maximum month measured
+            if (var_info[var_name]['mon'].max() > max_mon):
+                #-- if the maximum month in this dataset is greater
+                #-- than the previously read datasets
+                max_mon = np.int(var_info[var_name]['mon'].max())
 
     #-- sort datasets alphanumerically
     var_name = sorted(var_info.keys())
@@ -179,12 +196,13 @@ def grace_months_index(base_dir, DREL=['RL06'], MODE=None):
 def usage():
     print('\nHelp: {0}'.format(os.path.basename(sys.argv[0])))
     print(' -R X, --release=X\tGRACE data releases to run (RL04,RL05)')
-    print(' -M X, --mode=X\t\tPermission mode of output GRACE month file\n')
+    print(' -M X, --mode=X\t\tPermission mode of output GRACE month file')
+    print(' --index\t\tRead dates from the metadata index of each product\n')
 
 #-- PURPOSE: functional call to grace_months() if running as program
 def main():
     #-- Read the system arguments listed after the program
-    long_options = ['help','directory=','release=','mode=']
+    long_options = ['help','directory=','release=','mode=','index']
     optlist, arglist = getopt.getopt(sys.argv[1:],'hD:R:M:',long_options)
 
     #-- command line parameters
@@ -194,6 +212,8 @@ def main():
     DREL = ['RL06']
     #-- permissions mode of the local directories and files (number in octal)
     MODE = 0o775
+    #-- read dates from the persistent metadata index of each product
+    INDEX = False
     for opt, arg in optlist:
         if opt in ('-h','--help'):
             usage()
@@ -204,9 +224,11 @@ def main():
             DREL = arg.split(',')
         elif opt in ("-M","--mode"):
             MODE = int(arg, 8)
+        elif opt in ("--index",):
+            INDEX = True
 
     #-- run grace months program
-    grace_months_index(base_dir, DREL=DREL, MODE=MODE)
+    grace_months_index(base_dir, DREL=DREL, MODE=MODE, INDEX=INDEX)
 
 #-- run main program
 if __name__ == '__main__':
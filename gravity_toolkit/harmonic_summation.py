@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 harmonic_summation.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Returns the spatial field for a series of spherical harmonics
 
@@ -19,6 +19,7 @@ OPTIONS:
     LMAX: Upper bound of Spherical Harmonic Degrees
     MMAX: Upper bound of Spherical Harmonic Orders (default = LMAX)
     PLM: Fully-normalized associated Legendre polynomials
+    DTYPE: data type of output spatial field (summation is in float64)
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
@@ -27,6 +28,7 @@ PROGRAM DEPENDENCIES:
     plm_holmes.py: Computes fully-normalized associated Legendre polynomials
 
 UPDATE HISTORY:
+    Updated 08/2020: added option for the data type of the output field
     Updated 07/2020: added function docstrings
     Updated 05/2015: added parameter MMAX for MMAX != LMAX.
     Written 05/2013
@@ -34,7 +36,8 @@ UPDATE HISTORY:
 import numpy as np
 from gravity_toolkit.plm_holmes import plm_holmes
 
-def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None):
+def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None,
+    DTYPE=np.float64):
     """
     Converts data from spherical harmonic coefficients to a spatial field
 
@@ -51,6 +54,7 @@ def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None):
     LMAX: Upper bound of Spherical Harmonic Degrees
     MMAX: Upper bound of Spherical Harmonic Orders
     PLM: Fully-normalized associated Legendre polynomials
+    DTYPE: data type of output spatial field (summation is in float64)
 
     Returns
     -------
@@ -97,5 +101,5 @@ def harmonic_summation(clm1,slm1,lon,lat,LMIN=0,LMAX=0,MMAX=None,PLM=None):
     #-- summation of cosine and sine harmonics
     s = np.dot(np.transpose(ccos),d_cos) + np.dot(np.transpose(ssin),d_sin)
 
-    #-- return output data
-    return s
+    #-- return output data in the output data type
+    return s.astype(DTYPE, copy=False)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+u"""
+harmonic_variance_summation.py
+Written by Tyler Sutterley (08/2020)
+
+Returns the spatial variance field for the errors of a series of
+    spherical harmonics
+
+The variance of each coefficient can be propagated for multiple fields
+    simultaneously (e.g. calibrated errors for each month)
+The full or block-diagonal (by order) covariance matrix of the coefficients
+    can also be propagated to the spatial domain
+Signal and calibrated error fields of multiple months can be calculated
+    in the same pass with harmonic_signal_error_summation
+
+CALLING SEQUENCE:
+    variance = harmonic_variance_summation(var_clm, var_slm, lon, lat,
+        LMIN=0, LMAX=60)
+    Ygrid = harmonic_signal_error_summation(clm, slm, eclm, eslm, lon, lat,
+        LMIN=0, LMAX=60)
+
+INPUTS:
+    var_clm: variance of cosine spherical harmonics in output units
+        (LMAX+1,MMAX+1) or (LMAX+1,MMAX+1,nfields)
+    var_slm: variance of sine spherical harmonics in output units
+        (LMAX+1,MMAX+1) or (LMAX+1,MMAX+1,nfields)
+    lon: longitude array for output spatial field
+    lat: latitude array for output spatial field
+
+OUTPUTS:
+    variance: spatial variance field (nlon,nlat) or (nlon,nlat,nfields)
+
+OPTIONS:
+    LMIN: Lower bound of Spherical Harmonic Degrees
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders (default = LMAX)
+    PLM: Fully-normalized associated Legendre polynomials
+    COVARIANCE: covariance matrix of the spherical harmonics in output units
+        (used in place of var_clm and var_slm)
+        full: single matrix for all coefficients ordered by order (m) with
+            the cosine and then the sine harmonics of each order (by degree)
+        block-diagonal: list of matrices for each order (m) with the
+            cosine and then the sine harmonics of the order (by degree)
+    DTYPE: data type of output signal and error fields
+        (harmonic_signal_error_summation)
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+
+PROGRAM DEPENDENCIES:
+    plm_holmes.py: Computes fully-normalized associated Legendre polynomials
+
+UPDATE HISTORY:
+    Updated 08/2020: added signal and calibrated error summation for months
+        added option for the data type of the output fields
+    Written 08/2020
+"""
+import numpy as np
+from gravity_toolkit.plm_holmes import plm_holmes
+
+def harmonic_variance_summation(var_clm, var_slm, lon, lat, LMIN=0, LMAX=0,
+    MMAX=None, PLM=None, COVARIANCE=None):
+    """
+    Converts the errors of spherical harmonic coefficients to a spatial
+        variance field
+
+    Arguments
+    ---------
+    var_clm: variance of cosine spherical harmonics in output units
+    var_slm: variance of sine spherical harmonics in output units
+    lon: longitude array
+    lat: latitude array
+
+    Keyword arguments
+    -----------------
+    LMIN: Lower bound of Spherical Harmonic Degrees
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    PLM: Fully-normalized associated Legendre polynomials
+    COVARIANCE: full or block-diagonal covariance matrix of the harmonics
+
+    Returns
+    -------
+    variance: spatial variance field
+    """
+
+    #-- if LMAX is not specified, will use the size of the input harmonics
+    if (LMAX == 0):
+        LMAX = np.shape(var_clm)[0]-1
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    if MMAX is None:
+        MMAX = np.copy(LMAX)
+
+    #-- Longitude in radians
+    phi = (np.squeeze(lon)*np.pi/180.0)[np.newaxis,:]
+    #-- Colatitude in radians
+    th = (90.0 - np.squeeze(lat))*np.pi/180.0
+    thmax = len(th)
+    if PLM is None:
+        #-- if plms are not pre-computed: calculate Legendre polynomials
+        PLM,dPLM = plm_holmes(LMAX,np.cos(th))
+
+    #-- Calculating cos(m*phi) and sin(m*phi)
+    m = np.arange(0,MMAX+1)[:,np.newaxis]
+    ccos = np.cos(np.dot(m,phi))
+    ssin = np.sin(np.dot(m,phi))
+
+    #-- propagate the covariance of the harmonics
+    if COVARIANCE is not None:
+        #-- degrees and orders for each coefficient in each order block
+        #-- with the cosine and then the sine harmonics of each order
+        lblock = [np.tile(np.arange(max(mi,LMIN),LMAX+1),2)
+            for mi in range(0,MMAX+1)]
+        #-- spatial variance field
+        var = np.zeros((phi.shape[1],thmax))
+        if isinstance(COVARIANCE, (list,tuple)):
+            #-- block-diagonal covariance with a block for each order
+            for mi,ll in enumerate(lblock):
+                n = len(ll)//2
+                #-- cosine and sine of order for each longitude
+                T = np.transpose([ccos[mi,:],ssin[mi,:]])
+                for k in range(0,thmax):
+                    p = PLM[ll,mi,k]
+                    W = COVARIANCE[mi]*p[:,np.newaxis]*p[np.newaxis,:]
+                    #-- sum over degrees for the cosine and sine harmonics
+                    A = np.add.reduceat(np.add.reduceat(W,[0,n],axis=0),
+                        [0,n],axis=1)
+                    var[:,k] += np.sum(np.dot(T,A)*T,axis=1)
+        else:
+            #-- full covariance for all coefficients
+            ll = np.concatenate(lblock)
+            mm = np.concatenate([np.full((len(l)),mi,dtype=np.int64)
+                for mi,l in enumerate(lblock)])
+            #-- indices for the start of each cosine and sine group
+            n = np.array([len(l)//2 for l in lblock])
+            start = np.concatenate([[0],np.cumsum(2*n)[:-1]])
+            groups = np.ravel(np.transpose([start,start+n]))
+            #-- cosine and sine of each order for each longitude
+            T = np.zeros((phi.shape[1],2*(MMAX+1)))
+            T[:,0::2] = np.transpose(ccos)
+            T[:,1::2] = np.transpose(ssin)
+            for k in range(0,thmax):
+                p = PLM[ll,mm,k]
+                W = COVARIANCE*p[:,np.newaxis]*p[np.newaxis,:]
+                #-- sum over degrees for each cosine and sine group
+                A = np.add.reduceat(np.add.reduceat(W,groups,axis=0),
+                    groups,axis=1)
+                var[:,k] = np.sum(np.dot(T,A)*T,axis=1)
+        #-- return output variance
+        return var
+
+    #-- Truncating variances to degree and order LMAX
+    #-- removing coefficients below LMIN and above MMAX
+    nfields = np.shape(var_clm)[2] if (np.ndim(var_clm) == 3) else 1
+    mm = np.arange(0,MMAX+1)
+    clm = np.zeros((LMAX+1,MMAX+1,nfields))
+    slm = np.zeros((LMAX+1,MMAX+1,nfields))
+    clm[LMIN:LMAX+1,:,:] = np.reshape(var_clm,
+        (np.shape(var_clm)[0],np.shape(var_clm)[1],nfields))[LMIN:LMAX+1,mm,:]
+    slm[LMIN:LMAX+1,:,:] = np.reshape(var_slm,
+        (np.shape(var_slm)[0],np.shape(var_slm)[1],nfields))[LMIN:LMAX+1,mm,:]
+    #-- square of legendre polynomials truncated to order MMAX [m,th,l]
+    PLM2 = np.transpose(PLM[0:LMAX+1,mm,:]**2,axes=(1,2,0))
+    #-- Calculate fourier coefficients for all fields [m,th,fields]
+    #-- summation over all spherical harmonic degrees
+    d_cos = np.matmul(PLM2, np.transpose(clm,axes=(1,0,2)))
+    d_sin = np.matmul(PLM2, np.transpose(slm,axes=(1,0,2)))
+    #-- summation of cosine and sine harmonics with cos(m*phi)^2 and
+    #-- sin(m*phi)^2 for all latitudes and fields
+    var = np.tensordot(np.transpose(ccos**2),d_cos,axes=1) + \
+        np.tensordot(np.transpose(ssin**2),d_sin,axes=1)
+    #-- return output variance
+    return var if (np.ndim(var_clm) == 3) else var[:,:,0]
+
+def harmonic_signal_error_summation(clm1, slm1, eclm1, eslm1, lon, lat,
+    LMIN=0, LMAX=0, MMAX=None, PLM=None, DTYPE=np.float64):
+    """
+    Converts spherical harmonic coefficients and their calibrated errors
+        to spatial fields for multiple months in the same pass
+
+    Arguments
+    ---------
+    clm1: cosine spherical harmonics (LMAX+1,MMAX+1,nt) in output units
+    slm1: sine spherical harmonics (LMAX+1,MMAX+1,nt) in output units
+    eclm1: cosine spherical harmonic errors in output units (or None)
+    eslm1: sine spherical harmonic errors in output units (or None)
+    lon: longitude array
+    lat: latitude array
+
+    Keyword arguments
+    -----------------
+    LMIN: Lower bound of Spherical Harmonic Degrees
+    LMAX: Upper bound of Spherical Harmonic Degrees
+    MMAX: Upper bound of Spherical Harmonic Orders
+    PLM: Fully-normalized associated Legendre polynomials
+    DTYPE: data type of output spatial fields (summations are in float64)
+
+    Returns
+    -------
+    data: spatial fields (nlon,nlat,nt)
+    error: spatial error fields (nlon,nlat,nt)
+    """
+
+    #-- if LMAX is not specified, will use the size of the input harmonics
+    if (LMAX == 0):
+        LMAX = np.shape(clm1)[0]-1
+    #-- upper bound of spherical harmonic orders (default = LMAX)
+    if MMAX is None:
+        MMAX = np.copy(LMAX)
+
+    #-- Longitude in radians
+    phi = (np.squeeze(lon)*np.pi/180.0)[np.newaxis,:]
+    #-- Colatitude in radians
+    th = (90.0 - np.squeeze(lat))*np.pi/180.0
+    if PLM is None:
+        #-- if plms are not pre-computed: calculate Legendre polynomials
+        PLM,dPLM = plm_holmes(LMAX,np.cos(th))
+
+    #-- Calculating cos(m*phi) and sin(m*phi)
+    m = np.arange(0,MMAX+1)[:,np.newaxis]
+    ccos = np.transpose(np.cos(np.dot(m,phi)))
+    ssin = np.transpose(np.sin(np.dot(m,phi)))
+    #-- legendre polynomials truncated to order MMAX [m,th,l]
+    mm = np.arange(0,MMAX+1)
+    PLMt = np.transpose(PLM[0:LMAX+1,mm,:],axes=(1,2,0))
+
+    #-- Truncating harmonics to degree and order LMAX
+    #-- removing coefficients below LMIN and above MMAX
+    nt = np.shape(clm1)[2] if (np.ndim(clm1) == 3) else 1
+    Ylms = {}
+    for key,val in [('clm',clm1),('slm',slm1),('eclm',eclm1),('eslm',eslm1)]:
+        if val is None:
+            continue
+        val = np.reshape(val, (np.shape(val)[0],np.shape(val)[1],nt))
+        Ylms[key] = np.zeros((LMAX+1,MMAX+1,nt))
+        Ylms[key][LMIN:LMAX+1,:,:] = val[LMIN:LMAX+1,mm,:]
+        #-- transpose to [m,l,t] for summations over degree
+        Ylms[key] = np.transpose(Ylms[key],axes=(1,0,2))
+
+    #-- Calculate fourier coefficients [m,th,t] and signal for all months
+    d_cos = np.matmul(PLMt, Ylms['clm'])
+    d_sin = np.matmul(PLMt, Ylms['slm'])
+    Ygrid = {}
+    Ygrid['data'] = np.tensordot(ccos,d_cos,axes=1) + \
+        np.tensordot(ssin,d_sin,axes=1)
+    #-- Calculate error fields from the variance of the harmonics
+    if 'eclm' in Ylms.keys():
+        PLM2 = PLMt**2
+        v_cos = np.matmul(PLM2, Ylms['eclm']**2)
+        v_sin = np.matmul(PLM2, Ylms['eslm']**2)
+        Ygrid['error'] = np.sqrt(np.tensordot(ccos**2,v_cos,axes=1) +
+            np.tensordot(ssin**2,v_sin,axes=1))
+    #-- convert to output data type and remove singleton dimensions
+    #-- if calculating a single field
+    for key,val in Ygrid.items():
+        Ygrid[key] = val.astype(DTYPE, copy=False)
+        if (np.ndim(clm1) != 3):
+            Ygrid[key] = Ygrid[key][:,:,0]
+    #-- return output data
+    return Ygrid
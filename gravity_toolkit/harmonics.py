@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 harmonics.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Spherical harmonic data class for processing GRACE/GRACE-FO Level-2 data
 
@@ -19,8 +19,23 @@ PROGRAM DEPENDENCIES:
     hdf5_read_stokes.py: reads spherical harmonic data from HDF5
     read_ICGEM_harmonics.py: reads gravity model coefficients from GFZ ICGEM
     destripe_harmonics.py: filters spherical harmonics for correlated errors
+    tssmooth_batch.py: smoothes a batch of time-series for seasonal effects
+    write_cache_file.py: writes numerical arrays to a binary cache file
 
 UPDATE HISTORY:
+    Updated 08/2020: vectorized ascii parser reading all values in one pass
+        added delta to calculate the noise of the smoothed time series
+            with an optional content-addressed cache
+        carry calibrated errors (eclm and eslm) with the harmonics
+        destripe all dates of a temporal field at once with an option
+            for filtering blocks of dates in parallel
+        append dates to existing netCDF4 and HDF5 files
+        lazily read harmonics from netCDF4 and HDF5 datasets with
+            hyperslabs read for index and subset and chunked means
+        read files from an index in parallel into preallocated arrays
+        convolve harmonics by broadcasting over dates or stacked fields
+        read lazily-loaded harmonics into memory before modifying or copying
+            and close the file of lazily-loaded harmonics
     Updated 07/2020: added class docstring and using kwargs for output to file
         added case_insensitive_filename function to search directories
     Updated 06/2020: output list of filenames with from_list()
@@ -35,6 +50,10 @@ UPDATE HISTORY:
 """
 import os
 import re
+import hashlib
+import functools
+import multiprocessing
+import multiprocessing.pool
 import numpy as np
 from gravity_toolkit.ncdf_stokes import ncdf_stokes
 from gravity_toolkit.hdf5_stokes import hdf5_stokes
@@ -42,6 +61,8 @@ from gravity_toolkit.ncdf_read_stokes import ncdf_read_stokes
 from gravity_toolkit.hdf5_read_stokes import hdf5_read_stokes
 from gravity_toolkit.read_ICGEM_harmonics import read_ICGEM_harmonics
 from gravity_toolkit.destripe_harmonics import destripe_harmonics
+from gravity_toolkit.tssmooth_batch import tssmooth_batch
+from gravity_toolkit.write_cache_file import write_cache_file
 
 class harmonics(object):
     """
@@ -51,6 +72,8 @@ class harmonics(object):
     def __init__(self, lmax=None, mmax=None):
         self.clm=None
         self.slm=None
+        self.eclm=None
+        self.eslm=None
         self.time=None
         self.month=None
         self.lmax=lmax
@@ -60,6 +83,7 @@ class harmonics(object):
         self.shape=None
         self.ndim=None
         self.filename=None
+        self.lazy=False
 
     def case_insensitive_filename(self,filename):
         """
@@ -85,26 +109,21 @@ class harmonics(object):
         """
         #-- set filename
         self.case_insensitive_filename(filename)
-        #-- read input ascii file (.txt) and split lines
+        #-- read input ascii file (.txt) and convert fortran exponentials
         with open(self.filename,'r') as f:
-            file_contents = f.read().splitlines()
-        #-- compile regular expression operator for extracting numerical values
-        #-- from input ascii files of spherical harmonics
-        regex_pattern = '[-+]?(?:(?:\d*\.\d+)|(?:\d+\.?))(?:[EeD][+-]?\d+)?'
-        rx = re.compile(regex_pattern, re.VERBOSE)
+            file_contents = f.read().translate(str.maketrans('Dd','Ee'))
+        #-- number of columns in the ascii file
+        ncols = 5 if date else 4
+        #-- convert all numerical values within the file in a single pass
+        #-- columns: degree, order, clm, slm and (optionally) time
+        file_values = np.array(file_contents.split(), dtype=np.float64)
+        file_values = file_values.reshape(-1,ncols)
+        #-- convert degree and order to integers
+        l1 = file_values[:,0].astype(np.int64)
+        m1 = file_values[:,1].astype(np.int64)
         #-- find maximum degree and order of harmonics
-        self.lmax = 0
-        self.mmax = 0
-        #-- for each line in the file
-        for line in file_contents:
-            if date:
-                l1,m1,clm1,slm1,time = rx.findall(line)
-            else:
-                l1,m1,clm1,slm1 = rx.findall(line)
-            #-- convert line degree and order to integers
-            l1,m1 = np.array([l1,m1],dtype=np.int)
-            self.lmax = np.copy(l1) if (l1 > self.lmax) else self.lmax
-            self.mmax = np.copy(m1) if (m1 > self.mmax) else self.mmax
+        self.lmax = np.max(l1)
+        self.mmax = np.max(m1)
         #-- output spherical harmonics dimensions array
         self.l = np.arange(self.lmax+1)
         self.m = np.arange(self.mmax+1)
@@ -112,37 +131,36 @@ class harmonics(object):
         self.slm = np.zeros((self.lmax+1,self.mmax+1))
         #-- if the ascii file contains date variables
         if date:
-            self.time = np.float(time)
-            self.month = np.int(12.0*(self.time - 2002.0)) + 1
+            self.time = np.float64(file_values[-1,4])
+            self.month = np.int64(12.0*(self.time - 2002.0)) + 1
         #-- extract harmonics and convert to matrix
-        #-- for each line in the file
-        for line in file_contents:
-            if date:
-                l1,m1,clm1,slm1,time = rx.findall(line)
-            else:
-                l1,m1,clm1,slm1 = rx.findall(line)
-            #-- convert line degree and order to integers
-            l1,m1 = np.array([l1,m1],dtype=np.int)
-            #-- convert fortran exponentials if applicable
-            self.clm[ll,mm] = np.float(clm1.replace('D','E'))
-            self.slm[ll,mm] = np.float(slm1.replace('D','E'))
+        self.clm[l1,m1] = file_values[:,2]
+        self.slm[l1,m1] = file_values[:,3]
         #-- assign shape and ndim attributes
         self.update_dimensions()
         return self
 
-    def from_netCDF4(self, filename, date=True):
+    def from_netCDF4(self, filename, date=True, lazy=False):
         """
         Read a harmonics object from a netCDF4 file
         Inputs: full path of input netCDF4 file
-        Options: netCDF4 file contains date information
+        Options:
+            netCDF4 file contains date information
+            lazily read the harmonics of each date from the netCDF4 file
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- read data from netCDF4 file
         Ylms = ncdf_read_stokes(self.filename,
-            ATTRIBUTES=False, DATE=date)
-        self.clm = Ylms['clm'].copy()
-        self.slm = Ylms['slm'].copy()
+            ATTRIBUTES=False, DATE=date, LAZY=lazy)
+        #-- harmonics are lazily read if stored with multiple dates
+        self.lazy = lazy and not isinstance(Ylms['clm'], np.ndarray)
+        if self.lazy:
+            self.clm = Ylms['clm']
+            self.slm = Ylms['slm']
+        else:
+            self.clm = Ylms['clm'].copy()
+            self.slm = Ylms['slm'].copy()
         self.l = Ylms['l'].copy()
         self.m = Ylms['m'].copy()
         self.lmax = np.max(Ylms['l'])
@@ -154,19 +172,27 @@ class harmonics(object):
         self.update_dimensions()
         return self
 
-    def from_HDF5(self, filename, date=True):
+    def from_HDF5(self, filename, date=True, lazy=False):
         """
         Read a harmonics object from a HDF5 file
         Inputs: full path of input HDF5 file
-        Options: HDF5 file contains date information
+        Options:
+            HDF5 file contains date information
+            lazily read the harmonics of each date from the HDF5 file
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- read data from HDF5 file
         Ylms = hdf5_read_stokes(self.filename,
-            ATTRIBUTES=False, DATE=date)
-        self.clm = Ylms['clm'].copy()
-        self.slm = Ylms['slm'].copy()
+            ATTRIBUTES=False, DATE=date, LAZY=lazy)
+        #-- harmonics are lazily read if stored with multiple dates
+        self.lazy = lazy and not isinstance(Ylms['clm'], np.ndarray)
+        if self.lazy:
+            self.clm = Ylms['clm']
+            self.slm = Ylms['slm']
+        else:
+            self.clm = Ylms['clm'].copy()
+            self.slm = Ylms['slm'].copy()
         self.l = Ylms['l'].copy()
         self.m = Ylms['m'].copy()
         self.lmax = np.max(Ylms['l'])
@@ -201,7 +227,8 @@ class harmonics(object):
         self.update_dimensions()
         return self
 
-    def from_index(self, filename, format=None, date=True, sort=True):
+    def from_index(self, filename, format=None, date=True, sort=True,
+        processes=0, threads=False):
         """
         Read a harmonics object from an index of ascii, netCDF4 or HDF5 files
         Inputs: full path of index file to be read into a harmonics object
@@ -209,27 +236,108 @@ class harmonics(object):
             format of files in index (ascii, netCDF4 or HDF5)
             ascii, netCDF4, or HDF5 contains date information
             sort harmonics objects by date information
+            processes: number of workers for reading files in parallel
+                (0 to read the files sequentially)
+            threads: read files with a pool of threads instead of processes
+                (netCDF4 files are always read with processes)
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- Read index file of input spherical harmonics
         with open(self.filename,'r') as f:
-            file_list = f.read().splitlines()
-        #-- create a list of harmonic objects
-        h = []
-        #-- for each file in the index
-        for i,f in enumerate(file_list):
-            if (format == 'ascii'):
-                #-- ascii (.txt)
-                h.append(harmonics().from_ascii(os.path.expanduser(f),date=date))
-            elif (format == 'netCDF4'):
-                #-- netcdf (.nc)
-                h.append(harmonics().from_netCDF4(os.path.expanduser(f),date=date))
-            elif (format == 'HDF5'):
-                #-- HDF5 (.H5)
-                h.append(harmonics().from_HDF5(os.path.expanduser(f),date=date))
-        #-- create a single harmonic object from the list
-        return self.from_list(h,date=date,sort=sort)
+            file_list = [os.path.expanduser(i) for i in f.read().splitlines()]
+        #-- number of files in the index
+        n = len(file_list)
+        if (n == 0):
+            raise ValueError('No files found in index {0}'.format(self.filename))
+        #-- reader for the format of the files in the index
+        #-- ascii (.txt), netcdf (.nc) or HDF5 (.H5)
+        readers = dict(ascii=harmonics.from_ascii,
+            netCDF4=harmonics.from_netCDF4, HDF5=harmonics.from_HDF5)
+        reader = functools.partial(readers[format], date=date)
+        #-- pool of workers for reading files in parallel
+        #-- files are read in blocks to bound the number of objects in memory
+        #-- netCDF4 files are read with processes as netCDF-C is not thread-safe
+        threads &= (format != 'netCDF4')
+        pool = None
+        if (processes > 0) and threads:
+            pool = multiprocessing.pool.ThreadPool(processes=processes)
+        elif (processes > 0):
+            pool = multiprocessing.Pool(processes=processes)
+        nblock = 4*processes if (processes > 0) else 1
+        try:
+            #-- for each block of files in the index
+            for b in range(0,n,nblock):
+                args = [(harmonics(),f) for f in file_list[b:b+nblock]]
+                if (processes > 0):
+                    h = pool.starmap(reader, args)
+                else:
+                    h = [reader(*a) for a in args]
+                #-- fill the output harmonics in place
+                for t,Ylms in enumerate(h, start=b):
+                    #-- allocate for all files using the first file in the index
+                    if (t == 0):
+                        self.lmax = np.copy(Ylms.lmax)
+                        self.mmax = np.copy(Ylms.mmax)
+                        self.clm = np.zeros((self.lmax+1,self.mmax+1,n))
+                        self.slm = np.zeros((self.lmax+1,self.mmax+1,n))
+                        #-- output errors if available for all harmonics
+                        errors = (Ylms.eclm is not None)
+                        if errors:
+                            self.eclm = np.zeros((self.lmax+1,self.mmax+1,n))
+                            self.eslm = np.zeros((self.lmax+1,self.mmax+1,n))
+                        #-- create list of files
+                        self.filename = []
+                        #-- output dates
+                        if date:
+                            self.time = np.zeros((n))
+                            self.month = np.zeros((n),dtype=np.int64)
+                    #-- truncate to maximum degree and order of all files
+                    self.lmax = np.min([self.lmax,Ylms.lmax])
+                    self.mmax = np.min([self.mmax,Ylms.mmax])
+                    l1,m1 = (self.lmax+1,self.mmax+1)
+                    self.clm[:l1,:m1,t] = Ylms.clm[:l1,:m1]
+                    self.slm[:l1,:m1,t] = Ylms.slm[:l1,:m1]
+                    errors &= (Ylms.eclm is not None)
+                    if errors:
+                        self.eclm[:l1,:m1,t] = Ylms.eclm[:l1,:m1]
+                        self.eslm[:l1,:m1,t] = Ylms.eslm[:l1,:m1]
+                    if date:
+                        self.time[t] = np.squeeze(Ylms.time)
+                        self.month[t] = np.squeeze(Ylms.month)
+                    #-- append filename to list
+                    self.filename.append(Ylms.filename)
+        finally:
+            #-- close the pool of workers
+            if pool is not None:
+                pool.close()
+                pool.join()
+        #-- truncate to maximum degree and order of all files
+        self.clm = self.clm[:self.lmax+1,:self.mmax+1,:]
+        self.slm = self.slm[:self.lmax+1,:self.mmax+1,:]
+        if errors:
+            self.eclm = self.eclm[:self.lmax+1,:self.mmax+1,:]
+            self.eslm = self.eslm[:self.lmax+1,:self.mmax+1,:]
+        else:
+            self.eclm = None
+            self.eslm = None
+        #-- sort harmonics by date information
+        if date and sort:
+            isort = np.argsort(self.time)
+            self.clm = self.clm[:,:,isort]
+            self.slm = self.slm[:,:,isort]
+            if errors:
+                self.eclm = self.eclm[:,:,isort]
+                self.eslm = self.eslm[:,:,isort]
+            self.time = self.time[isort]
+            self.month = self.month[isort]
+            self.filename = [self.filename[i] for i in isort]
+        #-- output degree and order
+        self.l = np.arange(self.lmax+1)
+        self.m = np.arange(self.mmax+1)
+        #-- assign shape and ndim attributes
+        self.update_dimensions()
+        return self
 
     def from_list(self, object_list, date=True, sort=True):
         """
@@ -255,6 +363,11 @@ class harmonics(object):
         #-- create output harmonics
         self.clm = np.zeros((self.lmax+1,self.mmax+1,n))
         self.slm = np.zeros((self.lmax+1,self.mmax+1,n))
+        #-- create output errors if available for all harmonics
+        errors = all([getattr(d,'eclm',None) is not None for d in object_list])
+        if errors:
+            self.eclm = np.zeros((self.lmax+1,self.mmax+1,n))
+            self.eslm = np.zeros((self.lmax+1,self.mmax+1,n))
         #-- create list of files
         self.filename = []
         #-- output dates
@@ -265,6 +378,9 @@ class harmonics(object):
         for t,i in enumerate(list_sort):
             self.clm[:,:,t] = object_list[i].clm[:self.lmax+1,:self.mmax+1]
             self.slm[:,:,t] = object_list[i].slm[:self.lmax+1,:self.mmax+1]
+            if errors:
+                self.eclm[:,:,t] = object_list[i].eclm[:self.lmax+1,:self.mmax+1]
+                self.eslm[:,:,t] = object_list[i].eslm[:self.lmax+1,:self.mmax+1]
             if date:
                 self.time[t] = object_list[i].time[:].copy()
                 self.month[t] = object_list[i].month[:].copy()
@@ -282,7 +398,7 @@ class harmonics(object):
         Inputs: dictionary object to be converted
         """
         #-- assign dictionary variables to self
-        for key in ['l','m','clm','slm','time','month']:
+        for key in ['l','m','clm','slm','eclm','eslm','time','month']:
             try:
                 setattr(self, key, d[key].copy())
             except:
@@ -300,6 +416,8 @@ class harmonics(object):
         Inputs: full path of output ascii file
         Options: harmonics objects contain date information
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         self.filename = os.path.expanduser(filename)
         #-- open the output file
         fid = open(self.filename, 'w')
@@ -315,35 +433,43 @@ class harmonics(object):
         #-- close the output file
         fid.close()
 
-    def to_netCDF4(self, filename, date=True, **kwargs):
+    def to_netCDF4(self, filename, date=True, append=False, **kwargs):
         """
         Write a harmonics object to netCDF4 file
         Inputs: full path of output netCDF4 file
-        Options: harmonics objects contain date information
+        Options:
+            harmonics objects contain date information
+            append dates to an existing netCDF4 file
         **kwargs: keyword arguments for ncdf_stokes
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         self.filename = os.path.expanduser(filename)
         if 'TIME_UNITS' not in kwargs.keys():
             kwargs['TIME_UNITS'] = 'years'
         if 'TIME_LONGNAME' not in kwargs.keys():
             kwargs['TIME_LONGNAME'] = 'Date_in_Decimal_Years'
         ncdf_stokes(self.clm, self.slm, self.l, self.m, self.time, self.month,
-            FILENAME=self.filename, DATE=date, **kwargs)
+            FILENAME=self.filename, DATE=date, APPEND=append, **kwargs)
 
-    def to_HDF5(self, filename, date=True, **kwargs):
+    def to_HDF5(self, filename, date=True, append=False, **kwargs):
         """
         Write a harmonics object to HDF5 file
         Inputs: full path of output HDF5 file
-        Options: harmonics objects contain date information
+        Options:
+            harmonics objects contain date information
+            append dates to an existing HDF5 file
         **kwargs: keyword arguments for hdf5_stokes
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         self.filename = os.path.expanduser(filename)
         if 'TIME_UNITS' not in kwargs.keys():
             kwargs['TIME_UNITS'] = 'years'
         if 'TIME_LONGNAME' not in kwargs.keys():
             kwargs['TIME_LONGNAME'] = 'Date_in_Decimal_Years'
         hdf5_stokes(self.clm, self.slm, self.l, self.m, self.time, self.month,
-            FILENAME=self.filename, DATE=date, **kwargs)
+            FILENAME=self.filename, DATE=date, APPEND=append, **kwargs)
 
     def update_dimensions(self):
         """
@@ -358,6 +484,9 @@ class harmonics(object):
         Add two harmonics objects
         Inputs: harmonic object to be added
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
+        temp.load()
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp.update_dimensions()
@@ -380,6 +509,9 @@ class harmonics(object):
         Subtract one harmonics object from another
         Inputs: harmonic object to be subtracted
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
+        temp.load()
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp.update_dimensions()
@@ -402,6 +534,9 @@ class harmonics(object):
         Multiply two harmonics objects
         Inputs: harmonic object to be multiplied
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
+        temp.load()
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp.update_dimensions()
@@ -424,6 +559,9 @@ class harmonics(object):
         Divide one harmonics object from another
         Inputs: harmonic object to be divided
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
+        temp.load()
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp.update_dimensions()
@@ -450,6 +588,8 @@ class harmonics(object):
         """
         Copy a harmonics object to a new harmonics object
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         temp = harmonics(lmax=self.lmax, mmax=self.mmax)
         #-- try to assign variables to self
         for key in ['clm','slm','time','month','shape','ndim','filename']:
@@ -458,6 +598,10 @@ class harmonics(object):
                 setattr(temp, key, np.copy(val))
             except:
                 pass
+        #-- copy errors if available
+        for key in ['eclm','eslm']:
+            if getattr(self, key) is not None:
+                setattr(temp, key, np.copy(getattr(self, key)))
         #-- assign ndim and shape attributes
         temp.update_dimensions()
         return temp
@@ -466,6 +610,8 @@ class harmonics(object):
         """
         Create a harmonics object using the dimensions of another
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         temp = harmonics(lmax=self.lmax, mmax=self.mmax)
         #-- assign variables to self
         for key in ['clm','slm','time','month']:
@@ -482,6 +628,8 @@ class harmonics(object):
         """
         Add a singleton dimension to a harmonics object if non-existent
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         #-- change time dimensions to be iterable
         if (np.ndim(self.time) == 0):
             self.time = np.array([self.time])
@@ -490,6 +638,9 @@ class harmonics(object):
         if (self.ndim == 2):
             self.clm = self.clm[:,:,None]
             self.slm = self.slm[:,:,None]
+            if self.eclm is not None:
+                self.eclm = self.eclm[:,:,None]
+                self.eslm = self.eslm[:,:,None]
         #-- reassign ndim and shape attributes
         self.update_dimensions()
         return self
@@ -498,11 +649,16 @@ class harmonics(object):
         """
         Remove singleton dimensions from a harmonics object
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         #-- squeeze singleton dimensions
         self.time = np.squeeze(self.time)
         self.month = np.squeeze(self.month)
         self.clm = np.squeeze(self.clm)
         self.slm = np.squeeze(self.slm)
+        if self.eclm is not None:
+            self.eclm = np.squeeze(self.eclm)
+            self.eslm = np.squeeze(self.eslm)
         #-- reassign ndim and shape attributes
         self.update_dimensions()
         return self
@@ -512,6 +668,8 @@ class harmonics(object):
         Flatten harmonics matrices into arrays
         Options: harmonics objects contain date information
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         n_harm = (self.lmax**2 + 3*self.lmax - (self.lmax-self.mmax)**2 -
             (self.lmax-self.mmax))//2 + 1
         #-- restructured degree and order
@@ -596,6 +754,10 @@ class harmonics(object):
         #-- subset output harmonics
         temp.clm = self.clm[:,:,indice].copy()
         temp.slm = self.slm[:,:,indice].copy()
+        #-- subset output errors
+        if self.eclm is not None:
+            temp.eclm = self.eclm[:,:,indice].copy()
+            temp.eslm = self.eslm[:,:,indice].copy()
         #-- subset output dates
         if date:
             temp.time = self.time[indice].copy()
@@ -632,10 +794,16 @@ class harmonics(object):
         temp.time = np.zeros((n))
         temp.month = np.zeros((n),dtype=np.int)
         temp.filename = []
+        if self.eclm is not None:
+            temp.eclm = np.zeros((temp.lmax+1,temp.mmax+1,n))
+            temp.eslm = np.zeros((temp.lmax+1,temp.mmax+1,n))
         #-- for each indice
         for t,i in enumerate(months_list):
             temp.clm[:,:,t] = self.clm[:,:,i].copy()
             temp.slm[:,:,t] = self.slm[:,:,i].copy()
+            if self.eclm is not None:
+                temp.eclm[:,:,t] = self.eclm[:,:,i].copy()
+                temp.eslm[:,:,t] = self.eslm[:,:,i].copy()
             temp.time[t] = self.time[i].copy()
             temp.month[t] = self.month[i].copy()
             if getattr(self, 'filename'):
@@ -645,6 +813,38 @@ class harmonics(object):
         #-- remove singleton dimensions if importing a single value
         return temp.squeeze()
 
+    def load(self):
+        """
+        Read lazily-loaded harmonics from the on-disk datasets into memory
+            and close the file of the on-disk datasets
+        """
+        if self.lazy:
+            clm = self.clm[:,:,:]
+            slm = self.slm[:,:,:]
+            #-- close the file of the on-disk datasets
+            self.close()
+            self.clm = clm
+            self.slm = slm
+            #-- assign ndim and shape attributes
+            self.update_dimensions()
+        return self
+
+    def close(self):
+        """
+        Close the file of lazily-loaded harmonics
+        """
+        if self.lazy:
+            #-- netCDF4 variables or HDF5 datasets
+            dataset = self.clm.dataset
+            if hasattr(dataset, 'group'):
+                dataset.group().close()
+            else:
+                dataset.file.close()
+            self.clm = None
+            self.slm = None
+            self.lazy = False
+        return self
+
     def truncate(self, lmax, lmin=0, mmax=None):
         """
         Truncate or expand a harmonics object to a new degree and order
@@ -652,6 +852,8 @@ class harmonics(object):
         Option: lmin minimum degree of spherical harmonics
             mmax maximum order of spherical harmonics
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         #-- output harmonics object
         mmax = np.copy(lmax) if (mmax == None) else mmax
         #-- copy prior harmonics object
@@ -662,19 +864,19 @@ class harmonics(object):
         #-- truncation levels
         l1 = self.lmax+1 if (temp.lmax > self.lmax) else temp.lmax+1
         m1 = self.mmax+1 if (temp.mmax > self.mmax) else temp.mmax+1
-        #-- create output harmonics
-        if (temp.ndim == 3):
-            #-- number of months
-            n = temp.clm.shape[-1]
-            self.clm = np.zeros((self.lmax+1,self.mmax+1,n))
-            self.slm = np.zeros((self.lmax+1,self.mmax+1,n))
-            self.clm[lmin:l1,:m1,:] = temp.clm[lmin:l1,:m1,:].copy()
-            self.slm[lmin:l1,:m1,:] = temp.slm[lmin:l1,:m1,:].copy()
-        else:
-            self.clm = np.zeros((self.lmax+1,self.mmax+1))
-            self.slm = np.zeros((self.lmax+1,self.mmax+1))
-            self.clm[lmin:l1,:m1] = temp.clm[lmin:l1,:m1].copy()
-            self.slm[lmin:l1,:m1] = temp.slm[lmin:l1,:m1].copy()
+        #-- create output harmonics (and errors if available)
+        keys = ['clm','slm','eclm','eslm'] if (temp.eclm is not None) \
+            else ['clm','slm']
+        for key in keys:
+            val = getattr(temp, key)
+            if (temp.ndim == 3):
+                #-- number of months
+                n = temp.clm.shape[-1]
+                setattr(self, key, np.zeros((self.lmax+1,self.mmax+1,n)))
+                getattr(self, key)[lmin:l1,:m1,:] = val[lmin:l1,:m1,:].copy()
+            else:
+                setattr(self, key, np.zeros((self.lmax+1,self.mmax+1)))
+                getattr(self, key)[lmin:l1,:m1] = val[lmin:l1,:m1].copy()
         #-- reassign ndim and shape attributes
         self.update_dimensions()
         #-- return the truncated or expanded harmonics object
@@ -689,6 +891,20 @@ class harmonics(object):
         #-- allocate for mean field
         temp.clm = np.zeros((temp.lmax+1,temp.mmax+1))
         temp.slm = np.zeros((temp.lmax+1,temp.mmax+1))
+        #-- compute the mean chunk by chunk from the on-disk datasets
+        if self.lazy:
+            n = self.shape[2]
+            for s in self.clm.blocks():
+                temp.clm += np.sum(self.clm[:,:,s],axis=2)/n
+                temp.slm += np.sum(self.slm[:,:,s],axis=2)/n
+            #-- read harmonics into memory to remove the mean field
+            if apply:
+                self.load()
+                self.clm -= temp.clm[:,:,np.newaxis]
+                self.slm -= temp.slm[:,:,np.newaxis]
+            #-- assign ndim and shape attributes
+            temp.update_dimensions()
+            return temp
         #-- Computes the mean for each spherical harmonic degree and order
         for m in range(0,temp.mmax+1):#-- MMAX+1 to include l
             for l in range(m,temp.lmax+1):#-- LMAX+1 to include LMAX
@@ -710,6 +926,8 @@ class harmonics(object):
         Multiply a harmonics object by a constant
         Inputs: scalar value to which the harmonics object will be multiplied
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp = harmonics(lmax=self.lmax, mmax=self.mmax)
@@ -729,6 +947,13 @@ class harmonics(object):
             for i,v in enumerate(var):
                 temp.clm[:,:,i] = v*self.clm[:,:,i]
                 temp.slm[:,:,i] = v*self.slm[:,:,i]
+        #-- scale errors by the magnitude of the scalar values
+        if self.eclm is not None and (np.ndim(var) == 1) and (self.ndim == 2):
+            temp.eclm = self.eclm[:,:,None]*np.abs(var)
+            temp.eslm = self.eslm[:,:,None]*np.abs(var)
+        elif self.eclm is not None:
+            temp.eclm = self.eclm*np.abs(var)
+            temp.eslm = self.eslm*np.abs(var)
         #-- assign ndim and shape attributes
         temp.update_dimensions()
         return temp
@@ -738,6 +963,8 @@ class harmonics(object):
         Raise a harmonics object to a power
         Inputs: power to which the harmonics object will be raised
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp = harmonics(lmax=self.lmax, mmax=self.mmax)
@@ -755,47 +982,126 @@ class harmonics(object):
         Convolve spherical harmonics with a degree-dependent array
         Inputs: degree dependent array for convolution
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         #-- reassign shape and ndim attributes
         self.update_dimensions()
-        #-- check if a single field or a temporal field
-        if (self.ndim == 2):
-            for l in range(0,self.lmax+1):#-- LMAX+1 to include LMAX
-                self.clm[l,:] *= var[l]
-                self.slm[l,:] *= var[l]
-        else:
-            for i,t in enumerate(self.time):
-                for l in range(0,self.lmax+1):#-- LMAX+1 to include LMAX
-                    self.clm[l,:,i] *= var[l]
-                    self.slm[l,:,i] *= var[l]
+        #-- broadcast the degree dependent array over the orders and
+        #-- over the dates of a temporal field (or a stack of fields)
+        var = np.array(var[:self.lmax+1])#-- LMAX+1 to include LMAX
+        shape = (self.lmax+1,) + (1,)*(self.ndim-1)
+        self.clm *= np.reshape(var, shape)
+        self.slm *= np.reshape(var, shape)
+        #-- convolve errors with the magnitude of the degree dependent array
+        if self.eclm is not None:
+            shape = (self.lmax+1,) + (1,)*(np.ndim(self.eclm)-1)
+            self.eclm *= np.reshape(np.abs(var), shape)
+            self.eslm *= np.reshape(np.abs(var), shape)
         #-- return the convolved field
         return self
 
-    def destripe(self, **kwargs):
+    def destripe(self, processes=0, **kwargs):
         """
         Filters spherical harmonic coefficients for correlated "striping" errors
-        Option: keyword arguments for destripe_harmonics
+        Options:
+            processes: number of processes for filtering a very large
+                temporal field in parallel (0 to filter as a single stack)
+            keyword arguments for destripe_harmonics
         """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
         #-- reassign shape and ndim attributes
         self.update_dimensions()
         temp = harmonics(lmax=np.copy(self.lmax),mmax=np.copy(self.mmax))
         temp.time = np.copy(self.time)
         temp.month = np.copy(self.month)
+        #-- destriping filter with shared filter operators for each order
+        destripe = functools.partial(destripe_harmonics,
+            LMIN=1, LMAX=self.lmax, MMAX=self.mmax, **kwargs)
         #-- check if a single field or a temporal field
-        if (self.ndim == 2):
-            Ylms = destripe_harmonics(self.clm, self.slm,
-                LMIN=1, LMAX=self.lmax, MMAX=self.mmax, **kwargs)
+        if (self.ndim == 2) or (processes == 0):
+            #-- filter all dates of the temporal field at once
+            Ylms = destripe(self.clm, self.slm)
             temp.clm = Ylms['clm'].copy()
             temp.slm = Ylms['slm'].copy()
         else:
+            #-- split the temporal field into blocks of dates
+            #-- and filter each block of dates in parallel
             n = self.shape[-1]
-            temp.clm = np.zeros((self.lmax+1,self.mmax+1,n))
-            temp.slm = np.zeros((self.lmax+1,self.mmax+1,n))
-            for i in range(n):
-                Ylms = destripe_harmonics(self.clm[:,:,i], self.slm[:,:,i],
-                    LMIN=1, LMAX=self.lmax, MMAX=self.mmax, **kwargs)
-                temp.clm[:,:,i] = Ylms['clm'].copy()
-                temp.slm[:,:,i] = Ylms['slm'].copy()
+            indices = np.array_split(np.arange(n), min(processes,n))
+            args = [(self.clm[:,:,i],self.slm[:,:,i]) for i in indices]
+            with multiprocessing.Pool(processes=processes) as pool:
+                output = pool.starmap(destripe, args)
+            temp.clm = np.concatenate([Ylms['clm'] for Ylms in output],axis=2)
+            temp.slm = np.concatenate([Ylms['slm'] for Ylms in output],axis=2)
         #-- assign ndim and shape attributes
         temp.update_dimensions()
         #-- return the destriped field
         return temp
+
+    def delta(self, hfwth=6, cache=None):
+        """
+        Calculates the delta coefficients of a harmonics time series
+            following Wahr et al. (2006): the RMS of the noise after removing
+            the Loess-smoothed and seasonal components
+        Options:
+            hfwth: half-width of the Loess filter (6 for 13-month Loess)
+            cache: directory for content-addressed cache of delta coefficients
+        Returns: harmonics object with the delta coefficients and
+            the number of smoothed points as time and month
+        """
+        #-- read lazily-loaded harmonics into memory
+        self.load()
+        #-- reassign shape and ndim attributes
+        self.update_dimensions()
+        if (self.ndim != 3):
+            raise ValueError('Delta coefficients require a harmonics time series')
+        temp = harmonics(lmax=self.lmax, mmax=self.mmax)
+        #-- check if delta coefficients were previously calculated
+        if cache is not None:
+            #-- unique key from the contents of the harmonics time series
+            h = hashlib.sha1()
+            for key in ['clm','slm','time']:
+                val = np.ascontiguousarray(getattr(self, key), dtype=np.float64)
+                h.update(val.tobytes())
+            h.update('{0:d}:{1:d}:{2:d}'.format(self.lmax,self.mmax,
+                hfwth).encode('utf8'))
+            cache_file = os.path.join(os.path.expanduser(cache),
+                'delta_{0}.npz'.format(h.hexdigest()))
+            if os.access(cache_file, os.F_OK):
+                with np.load(cache_file) as fileID:
+                    temp.clm = fileID['clm'].copy()
+                    temp.slm = fileID['slm'].copy()
+                    temp.time = fileID['time'].copy()
+                    temp.month = fileID['month'].copy()
+                #-- assign ndim and shape attributes
+                temp.update_dimensions()
+                return temp
+        #-- indices for spherical harmonic degrees and orders
+        l1,m1 = (self.lmax+1,self.mmax+1)
+        lc,mc = np.tril_indices(l1, m=m1)
+        temp.clm = np.zeros((l1,m1))
+        temp.slm = np.zeros((l1,m1))
+        #-- Equal to the noise of the smoothed time-series
+        #-- smooth the time series of all degrees and orders at once
+        for key in ['clm','slm']:
+            val = getattr(self, key)
+            smth = tssmooth_batch(self.time, val[lc,mc,:], HFWTH=hfwth)
+            #-- number of smoothed points
+            nsmth = len(smth['time'])
+            #-- variance of data-(smoothed+annual+semi)
+            getattr(temp, key)[lc,mc] = np.sqrt(np.sum(smth['noise']**2,
+                axis=1)/nsmth)
+        #-- save number of smoothed points
+        temp.time = np.copy(nsmth)
+        temp.month = np.copy(nsmth)
+        #-- write the delta coefficients to the cache
+        if cache is not None:
+            if not os.access(os.path.expanduser(cache), os.F_OK):
+                os.makedirs(os.path.expanduser(cache))
+            write_cache_file(cache_file, clm=temp.clm, slm=temp.slm,
+                time=temp.time, month=temp.month)
+        #-- assign ndim and shape attributes
+        temp.update_dimensions()
+        #-- return the delta coefficients
+        return temp
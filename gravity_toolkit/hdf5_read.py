@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 hdf5_read.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads spatial data from HDF5 files
 
@@ -16,6 +16,7 @@ OUTPUTS:
     lon: longitudinal array
     lat: latitudinal array
     time: time value of dataset (if specified by DATE)
+    month: GRACE/GRACE-FO months (if specified by DATE and within file)
     attributes: HDF5 attributes (for variables and title)
 
 OPTIONS:
@@ -25,6 +26,12 @@ OPTIONS:
     LONNAME: longitude variable name in HDF5 file
     LATNAME: latitude variable name in HDF5 file
     TIMENAME: time variable name in HDF5 file
+    MONTHSNAME: GRACE/GRACE-FO months variable name in HDF5 file
+    INDICES: slices of the lat, lon and time dimensions to read
+        (default is to read the entire dataset)
+    LAZY: output data as the on-disk HDF5 dataset for reading hyperslabs
+        (file remains open and INDICES are not applied)
+        packed data is unpacked in memory and is not read lazily
     ATTRIBUTES: HDF5 variables contain attribute parameters
     TITLE: HDF5 file contains description attribute parameter
 
@@ -33,7 +40,15 @@ PYTHON DEPENDENCIES:
     h5py: Python interface for Hierarchal Data Format 5 (HDF5)
         (https://www.h5py.org)
 
+PROGRAM DEPENDENCIES:
+    pack_data.py: packs and quantizes floating point data
+
 UPDATE HISTORY:
+    Updated 08/2020: added option to read windows of lat, lon and time
+        read GRACE/GRACE-FO months variable if within the file
+        added option to lazily read data from the on-disk dataset
+        unpack data packed with a scale factor and offset
+        restore floating point fill value of packed data from missing_value
     Updated 07/2020: added function docstrings
     Updated 06/2020: output data as lat/lon following spatial module
         attempt to read fill value attribute and set to None if not present
@@ -60,9 +75,11 @@ from __future__ import print_function
 
 import h5py
 import numpy as np
+from gravity_toolkit.pack_data import unpack_data
 
 def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
-    LATNAME='lat', TIMENAME='time', ATTRIBUTES=True, TITLE=True):
+    LATNAME='lat', TIMENAME='time', MONTHSNAME='month', INDICES=None,
+    LAZY=False, ATTRIBUTES=True, TITLE=True):
     """
     Reads spatial data from HDF5 files
 
@@ -78,6 +95,12 @@ def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     LONNAME: longitude variable name in HDF5 file
     LATNAME: latitude variable name in HDF5 file
     TIMENAME: time variable name in HDF5 file
+    MONTHSNAME: GRACE/GRACE-FO months variable name in HDF5 file
+    INDICES: slices of the lat, lon and time dimensions to read
+        (default is to read the entire dataset)
+    LAZY: output data as the on-disk HDF5 dataset for reading hyperslabs
+        (file remains open and INDICES are not applied)
+        packed data is unpacked in memory and is not read lazily
     ATTRIBUTES: HDF5 variables contain attribute parameters
     TITLE: HDF5 file contains a description attribute
 
@@ -87,6 +110,7 @@ def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     lon: longitudinal array
     lat: latitudinal array
     time: time value of dataset
+    month: GRACE/GRACE-FO months
     attributes: HDF5 attributes
     """
 
@@ -100,16 +124,42 @@ def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
         print(fileID.filename)
         print(list(fileID.keys()))
 
+    #-- data packed into integers is unpacked in memory
+    PACKED = 'scale_factor' in fileID[VARNAME].attrs.keys()
+    LAZY &= not PACKED
+    #-- slices of the lat, lon and time dimensions
+    ndim = fileID[VARNAME].ndim
+    if (INDICES is None) or LAZY:
+        INDICES = (slice(None),)*ndim
+    else:
+        INDICES = tuple(INDICES) + (slice(None),)*(ndim - len(INDICES))
+    tslice = INDICES[2] if (ndim == 3) else slice(None)
     #-- Getting the data from each HDF5 variable
-    dinput['lon'] = fileID[LONNAME][:]
-    dinput['lat'] = fileID[LATNAME][:]
-    dinput['data'] = fileID[VARNAME][:]
+    #-- only reading the window of the spatial data
+    dinput['lon'] = fileID[LONNAME][INDICES[1]]
+    dinput['lat'] = fileID[LATNAME][INDICES[0]]
+    if LAZY:
+        dinput['data'] = fileID[VARNAME]
+    else:
+        dinput['data'] = fileID[VARNAME][INDICES]
+    #-- unpack data with the scale factor and offset
+    #-- and restore the floating point fill value of the data
+    if PACKED:
+        dinput['data'] = unpack_data(dinput['data'],
+            fileID[VARNAME].attrs['scale_factor'],
+            fileID[VARNAME].attrs['add_offset'],
+            FILL_VALUE=fileID[VARNAME].attrs.get('_FillValue'),
+            MISSING_VALUE=fileID[VARNAME].attrs.get('missing_value'))
     if DATE:
-        dinput['time'] = fileID[TIMENAME][:]
+        dinput['time'] = fileID[TIMENAME][tslice]
+    #-- GRACE/GRACE-FO months if within the file
+    if DATE and (MONTHSNAME in fileID.keys()):
+        dinput['month'] = fileID[MONTHSNAME][tslice]
 
     #-- switching data array to lat/lon if lon/lat
     sz = dinput['data'].shape
-    if (dinput['data'].ndim == 2) and (len(dinput['lon']) == sz[0]):
+    if (not LAZY) and (dinput['data'].ndim == 2) and \
+        (len(dinput['lon']) == sz[0]):
         dinput['data'] = dinput['data'].T
 
     #-- Getting attributes of included variables
@@ -130,10 +180,15 @@ def hdf5_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
         dinput['attributes']['_FillValue'] = fileID[VARNAME].attrs['_FillValue']
     except:
         dinput['attributes']['_FillValue'] = None
+    #-- floating point fill value of packed data
+    if PACKED and ('missing_value' in fileID[VARNAME].attrs.keys()):
+        dinput['attributes']['_FillValue'] = \
+            fileID[VARNAME].attrs['missing_value']
     #-- Global attribute description
     if TITLE:
         dinput['attributes']['title'] = fileID.attrs['description']
 
-    #-- Closing the HDF5 file
-    fileID.close()
+    #-- Closing the HDF5 file if not reading lazily
+    if not LAZY:
+        fileID.close()
     return dinput
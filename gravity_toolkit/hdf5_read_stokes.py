@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 hdf5_read_stokes.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads spherical harmonic data from HDF5 files
 
@@ -25,13 +25,24 @@ OPTIONS:
     DATE: HDF5 file has date information
     ATTRIBUTES: HDF5 variables contain attribute parameters
     VERBOSE: will print to screen the HDF5 structure parameters
+    LAZY: read the harmonics lazily from the on-disk datasets
+        (file remains open for reading the harmonics of each date)
+        packed harmonics are unpacked in memory and are not read lazily
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
     h5py: Python interface for Hierarchal Data Format 5 (HDF5)
         (https://www.h5py.org)
 
+PROGRAM DEPENDENCIES:
+    lazy_stokes.py: lazy view of packed spherical harmonic datasets
+    pack_data.py: packs and quantizes floating point data
+
 UPDATE HISTORY:
+    Updated 08/2020: read files with an extendable time dimension
+        restructure harmonics to matrix format without looping
+        added option to lazily read the harmonics from on-disk datasets
+        unpack harmonics packed with a scale factor and offset
     Updated 07/2020: added function docstrings
     Updated 03/2020: added ATTRIBUTES option to check if file has attributes
     Updated 10/2019: changing Y/N flags to True/False.  check if time is array
@@ -50,8 +61,11 @@ from __future__ import print_function
 
 import h5py
 import numpy as np
+from gravity_toolkit.lazy_stokes import lazy_stokes
+from gravity_toolkit.pack_data import unpack_data
 
-def hdf5_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
+def hdf5_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False,
+    LAZY=False):
     """
     Reads spherical harmonic data from HDF5 files
 
@@ -64,6 +78,9 @@ def hdf5_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
     DATE: HDF5 file has date information
     ATTRIBUTES: HDF5 variables contain attribute parameters
     VERBOSE: will print to screen the HDF5 structure parameters
+    LAZY: read the harmonics lazily from the on-disk datasets
+        (file remains open for reading the harmonics of each date)
+        packed harmonics are unpacked in memory and are not read lazily
 
     Returns
     -------
@@ -104,26 +121,35 @@ def hdf5_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
     #-- LMAX+1 to include LMAX (LMAX+1 elements)
     dinput['l'] = np.arange(0,LMAX+1)
     dinput['m'] = np.arange(0,MMAX+1)
-    #-- convert input clm/slm to numpy arrays
-    CLM = np.array(fileID['clm'][:])
-    SLM = np.array(fileID['slm'][:])
-    #-- size of the input grids
-    n_harm, = fileID['l'].shape
-    #-- import spherical harmonic data
-    if (DATE and (n_time > 1)):
-        #-- contains multiple dates
-        dinput['clm'] = np.zeros((LMAX+1,MMAX+1,n_time))
-        dinput['slm'] = np.zeros((LMAX+1,MMAX+1,n_time))
-        for lm in range(n_harm):
-            dinput['clm'][ll[lm],mm[lm],:] = CLM[lm,:]
-            dinput['slm'][ll[lm],mm[lm],:] = SLM[lm,:]
+    #-- read harmonics lazily if stored with multiple dates
+    LAZY &= (fileID['clm'].ndim == 2) and (fileID['clm'].shape[1] > 1)
+    #-- harmonics packed into integers are unpacked in memory
+    PACKED = 'scale_factor' in fileID['clm'].attrs.keys()
+    LAZY &= not PACKED
+    if LAZY:
+        #-- harmonics are read from the on-disk datasets for each date
+        dinput['clm'] = lazy_stokes(fileID['clm'], ll, mm)
+        dinput['slm'] = lazy_stokes(fileID['slm'], ll, mm)
     else:
-        #-- contains either no dates or a single date
-        dinput['clm'] = np.zeros((LMAX+1,MMAX+1))
-        dinput['slm'] = np.zeros((LMAX+1,MMAX+1))
-        for lm in range(n_harm):
-            dinput['clm'][ll[lm],mm[lm]] = CLM[lm]
-            dinput['slm'][ll[lm],mm[lm]] = SLM[lm]
+        #-- convert input clm/slm to numpy arrays
+        CLM = np.array(fileID['clm'][:])
+        SLM = np.array(fileID['slm'][:])
+        #-- unpack harmonics with the scale factor and offset
+        if PACKED:
+            CLM = unpack_data(CLM, fileID['clm'].attrs['scale_factor'],
+                fileID['clm'].attrs['add_offset'])
+            SLM = unpack_data(SLM, fileID['slm'].attrs['scale_factor'],
+                fileID['slm'].attrs['add_offset'])
+        #-- single dates can be stored with an extendable time dimension
+        if (CLM.ndim == 2) and (CLM.shape[1] == 1) and (n_time <= 1):
+            CLM = CLM[:,0]
+            SLM = SLM[:,0]
+        #-- import spherical harmonic data
+        #-- contains either multiple dates, no dates or a single date
+        dinput['clm'] = np.zeros((LMAX+1,MMAX+1) + CLM.shape[1:])
+        dinput['slm'] = np.zeros((LMAX+1,MMAX+1) + SLM.shape[1:])
+        dinput['clm'][ll,mm,...] = CLM
+        dinput['slm'][ll,mm,...] = SLM
 
     #-- Getting attributes of clm/slm and included variables
     if ATTRIBUTES:
@@ -145,8 +171,9 @@ def hdf5_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
         #-- Global attribute description
         dinput['attributes']['title'] = fileID.attrs['description']
 
-    #-- Closing the HDF5 file
-    fileID.close()
+    #-- Closing the HDF5 file if not reading lazily
+    if not LAZY:
+        fileID.close()
 
     #-- return the output variable
     return dinput
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 hdf5_stokes.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Writes spherical harmonic coefficients to HDF5 files
 
@@ -26,15 +26,37 @@ OPTIONS:
     MONTHS_LONGNAME: months variable description
     TITLE: title attribute of dataset
     CLOBBER: will overwrite an existing HDF5 file
+    APPEND: will append dates to an existing HDF5 file
+        (packed harmonics must be within the range of the existing file)
+        (months already within the existing file are replaced)
     VERBOSE: will print to screen the HDF5 structure parameters
     DATE: harmonics have date information
+    PACKING: pack harmonics into integers with a scale factor and offset
+        (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed harmonics
+        (default is to use the full range of the packed integers)
+    ADD_OFFSET: offset of the packed harmonics
+        (default is the center of the range of the harmonics)
+    LEAST_SIGNIFICANT_DIGIT: quantize harmonics to a number of decimal places
+    COMPRESSION: compression filter of harmonics (gzip, lzf or None)
+    COMPRESSION_LEVEL: gzip compression level of harmonics (1-9)
+    SHUFFLE: apply the byte shuffle filter to harmonics before compression
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
     h5py: Python interface for Hierarchal Data Format 5 (HDF5)
         (https://www.h5py.org)
 
+PROGRAM DEPENDENCIES:
+    pack_data.py: packs and quantizes floating point data
+
 UPDATE HISTORY:
+    Updated 08/2020: unlimited time dimension chunked along time
+        added APPEND option to write only new dates to an existing file
+        replace months already within the file when appending
+        restructure harmonics to array format without looping
+        added options for packing and quantizing the harmonics
+        added options for the compression filter, level and shuffle
     Updated 07/2020: added function docstrings
     Updated 03/2020: only include title if not None
     Updated 10/2019: changing Y/N flags to True/False
@@ -64,14 +86,18 @@ UPDATE HISTORY:
 """
 from __future__ import print_function, division
 
+import os
 import time
 import h5py
 import numpy as np
+from gravity_toolkit.pack_data import pack_data, quantize_data
 
 def hdf5_stokes(clm1, slm1, linp, minp, tinp, month, FILENAME=None,
     UNITS='Geodesy_Normalization', TIME_UNITS=None, TIME_LONGNAME=None,
     MONTHS_NAME='month', MONTHS_UNITS='number', MONTHS_LONGNAME='GRACE_month',
-    TITLE=None, DATE=True, CLOBBER=True, VERBOSE=False):
+    TITLE=None, DATE=True, PACKING=None, SCALE_FACTOR=None, ADD_OFFSET=None,
+    LEAST_SIGNIFICANT_DIGIT=None, COMPRESSION='gzip', COMPRESSION_LEVEL=None,
+    SHUFFLE=False, CLOBBER=True, APPEND=False, VERBOSE=False):
     """
     Writes spherical harmonic coefficients to HDF5 files
 
@@ -95,59 +121,128 @@ def hdf5_stokes(clm1, slm1, linp, minp, tinp, month, FILENAME=None,
     MONTHS_LONGNAME: months variable description
     TITLE: title attribute of dataset
     CLOBBER: will overwrite an existing HDF5 file
+    APPEND: will append dates to an existing HDF5 file
+        (packed harmonics must be within the range of the existing file)
+        (months already within the existing file are replaced)
     VERBOSE: will print to screen the HDF5 structure parameters
     DATE: harmonics have date information
+    PACKING: pack harmonics into integers with a scale factor and offset
+        (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed harmonics
+        (default is to use the full range of the packed integers)
+    ADD_OFFSET: offset of the packed harmonics
+        (default is the center of the range of the harmonics)
+    LEAST_SIGNIFICANT_DIGIT: quantize harmonics to a number of decimal places
+    COMPRESSION: compression filter of harmonics (gzip, lzf or None)
+    COMPRESSION_LEVEL: gzip compression level of harmonics (1-9)
+    SHUFFLE: apply the byte shuffle filter to harmonics before compression
     """
 
-    #-- setting HDF5 clobber attribute
-    if CLOBBER:
-        clobber = 'w'
-    else:
-        clobber = 'w-'
-
-    #-- opening HDF5 file for writing
-    fileID = h5py.File(FILENAME, clobber)
-
     #-- Maximum spherical harmonic degree (LMAX) and order (MMAX)
     LMAX = np.max(linp)
     MMAX = np.max(minp)
-    #-- Calculating the number of cos and sin harmonics up to LMAX
-    #-- taking into account MMAX (if MMAX == LMAX then LMAX-MMAX=0)
-    n_harm = (LMAX**2 + 3*LMAX - (LMAX-MMAX)**2 - (LMAX-MMAX))//2 + 1
+    #-- restructured degree and order for each order m (l from m to LMAX)
+    lout = np.concatenate([np.arange(m,LMAX+1,dtype=np.int32)
+        for m in range(0,MMAX+1)])
+    mout = np.concatenate([np.full((LMAX+1-m),m,dtype=np.int32)
+        for m in range(0,MMAX+1)])
+    #-- number of cos and sin harmonics up to LMAX and MMAX
+    n_harm = len(lout)
 
     #-- Restructuring output matrix to array format
     #-- will reduce matrix size and insure compatibility between platforms
+    clm = np.array(clm1)[lout,mout,...]
+    slm = np.array(slm1)[lout,mout,...]
     if DATE:
-        if (np.ndim(tinp) == 0):
-            n_time = 1
-            clm = np.zeros((n_harm))
-            slm = np.zeros((n_harm))
-        else:
-            n_time = len(tinp)
-            clm = np.zeros((n_harm,n_time))
-            slm = np.zeros((n_harm,n_time))
-    else:
-        n_time = 0
-        clm = np.zeros((n_harm))
-        slm = np.zeros((n_harm))
-
-    #-- restructured degree and order
-    lout = np.zeros((n_harm,), dtype=np.int32)
-    mout = np.zeros((n_harm,), dtype=np.int32)
-    #-- create counter variable lm
-    lm = 0
-    for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-        for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-            lout[lm] = np.int(l)
-            mout[lm] = np.int(m)
-            if (DATE and (n_time > 1)):
-                clm[lm,:] = clm1[l,m,:]
-                slm[lm,:] = slm1[l,m,:]
+        #-- harmonics with dates are stored as (lm,time)
+        tinp = np.atleast_1d(tinp)
+        month = np.atleast_1d(month)
+        n_time = len(tinp)
+        clm = np.reshape(clm, (n_harm,n_time))
+        slm = np.reshape(slm, (n_harm,n_time))
+    #-- quantize the harmonics to a number of decimal places
+    if LEAST_SIGNIFICANT_DIGIT is not None:
+        clm = quantize_data(clm, LEAST_SIGNIFICANT_DIGIT=LEAST_SIGNIFICANT_DIGIT)
+        slm = quantize_data(slm, LEAST_SIGNIFICANT_DIGIT=LEAST_SIGNIFICANT_DIGIT)
+
+    #-- append dates to an existing HDF5 file
+    if DATE and APPEND and os.access(os.path.expanduser(FILENAME),os.F_OK):
+        #-- opening HDF5 file for appending
+        fileID = h5py.File(FILENAME, 'a')
+        #-- check that the harmonics match the existing file
+        if not (np.array_equal(fileID['l'][:],lout) and
+            np.array_equal(fileID['m'][:],mout)):
+            fileID.close()
+            raise ValueError('Degree and order do not match {0}'.format(
+                FILENAME))
+        #-- check that the file can be extended along time
+        if (fileID['clm'].ndim != 2) or (fileID['clm'].maxshape[1] is not None):
+            fileID.close()
+            raise ValueError('Time dimension is not extendable {0}'.format(
+                FILENAME))
+        #-- pack the new dates with the attributes of the file
+        #-- before modifying the file (values must be within packed range)
+        output = {}
+        for key,val in [('clm',clm),('slm',slm)]:
+            if 'scale_factor' in fileID[key].attrs.keys():
+                try:
+                    output[key] = pack_data(val, PACKING=fileID[key].dtype,
+                        SCALE_FACTOR=fileID[key].attrs['scale_factor'],
+                        ADD_OFFSET=fileID[key].attrs['add_offset'])['data']
+                except ValueError as e:
+                    fileID.close()
+                    raise ValueError(('Cannot append to {0}: {1}. Write the '
+                        'file with a SCALE_FACTOR and ADD_OFFSET with headroom '
+                        'for new dates').format(FILENAME,e))
             else:
-                clm[lm] = clm1[l,m]
-                slm[lm] = slm1[l,m]
-            #-- add 1 to lm counter variable
-            lm += 1
+                output[key] = val
+        #-- months already within the file are replaced
+        #-- and new months are written along the time dimension
+        n_end = fileID['time'].shape[0]
+        indices = {int(m):i for i,m in enumerate(fileID[MONTHS_NAME][:])}
+        for m in month:
+            if int(m) not in indices:
+                indices[int(m)] = n_end
+                n_end += 1
+        #-- extend the time dimension for the new months
+        for key in ['time',MONTHS_NAME]:
+            fileID[key].resize((n_end,))
+        for key in output.keys():
+            fileID[key].resize((n_harm,n_end))
+        for t,m in enumerate(month):
+            i = indices[int(m)]
+            fileID['time'][i] = tinp[t]
+            fileID[MONTHS_NAME][i] = m
+            for key,val in output.items():
+                fileID[key][:,i] = val[:,t]
+        #-- date modified
+        fileID.attrs['date_modified'] = time.strftime('%Y-%m-%d',
+            time.localtime())
+        #-- Output HDF5 structure information
+        if VERBOSE:
+            print(FILENAME)
+            print(list(fileID.keys()))
+        #-- Closing the HDF5 file
+        fileID.close()
+        return
+
+    #-- pack the harmonics into integers with a scale factor and offset
+    packed = {}
+    if PACKING is not None:
+        for key,val in [('clm',clm),('slm',slm)]:
+            packed[key] = pack_data(val, PACKING=PACKING,
+                SCALE_FACTOR=SCALE_FACTOR, ADD_OFFSET=ADD_OFFSET)
+        clm = packed['clm']['data']
+        slm = packed['slm']['data']
+
+    #-- setting HDF5 clobber attribute
+    if CLOBBER:
+        clobber = 'w'
+    else:
+        clobber = 'w-'
+
+    #-- opening HDF5 file for writing
+    fileID = h5py.File(FILENAME, clobber)
 
     #-- Defining the HDF5 dataset variables
     h5 = {}
@@ -155,22 +250,30 @@ def hdf5_stokes(clm1, slm1, linp, minp, tinp, month, FILENAME=None,
         data=lout, dtype=np.int, compression='gzip')
     h5['m'] = fileID.create_dataset('m', (n_harm,), \
         data=mout, dtype=np.int, compression='gzip')
+    #-- spherical harmonics with compression filters
+    kwargs = dict(compression=COMPRESSION, shuffle=SHUFFLE)
+    if (COMPRESSION == 'gzip'):
+        kwargs['compression_opts'] = COMPRESSION_LEVEL
+    if PACKING is not None:
+        kwargs['fillvalue'] = packed['clm']['_FillValue']
+    dtype = np.float64 if (PACKING is None) else clm.dtype
     if DATE:
+        #-- unlimited time dimension chunked along time
         h5['time'] = fileID.create_dataset('time', (n_time,), \
-            data=tinp, dtype=np.float, compression='gzip')
+            data=tinp, dtype=np.float, maxshape=(None,), compression='gzip')
         h5['month'] = fileID.create_dataset(MONTHS_NAME, (n_time,), \
-            data=month, dtype=np.int, compression='gzip')
-    #-- if more than 1 date in file
-    if (n_time > 1):
+            data=month, dtype=np.int, maxshape=(None,), compression='gzip')
         h5['clm'] = fileID.create_dataset('clm', (n_harm,n_time,), \
-            data=clm, dtype=np.float, compression='gzip')
+            data=clm, dtype=dtype, maxshape=(n_harm,None,), \
+            chunks=(n_harm,1,), **kwargs)
         h5['slm'] = fileID.create_dataset('slm', (n_harm,n_time,), \
-            data=slm, dtype=np.float, compression='gzip')
+            data=slm, dtype=dtype, maxshape=(n_harm,None,), \
+            chunks=(n_harm,1,), **kwargs)
     else:
         h5['clm'] = fileID.create_dataset('clm', (n_harm,), \
-            data=clm, dtype=np.float, compression='gzip')
+            data=clm, dtype=dtype, **kwargs)
         h5['slm'] = fileID.create_dataset('slm', (n_harm,), \
-            data=slm, dtype=np.float, compression='gzip')
+            data=slm, dtype=dtype, **kwargs)
 
     #-- filling HDF5 dataset attributes
     #-- Defining attributes for degree and order
@@ -183,6 +286,14 @@ def hdf5_stokes(clm1, slm1, linp, minp, tinp, month, FILENAME=None,
     h5['clm'].attrs['units'] = UNITS
     h5['slm'].attrs['long_name'] = 'sine_spherical_harmonics'
     h5['slm'].attrs['units'] = UNITS
+    #-- Defining attributes for packed and quantized harmonics
+    for key in ['clm','slm']:
+        if PACKING is not None:
+            h5[key].attrs['scale_factor'] = packed[key]['scale_factor']
+            h5[key].attrs['add_offset'] = packed[key]['add_offset']
+            h5[key].attrs['_FillValue'] = packed[key]['_FillValue']
+        if LEAST_SIGNIFICANT_DIGIT is not None:
+            h5[key].attrs['least_significant_digit'] = LEAST_SIGNIFICANT_DIGIT
     if DATE:
         #-- Defining attributes for date and month (or integer date)
         h5['time'].attrs['long_name'] = TIME_LONGNAME
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 hdf5_write.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Writes spatial data to HDF5 files
 
@@ -24,17 +24,44 @@ OPTIONS:
     FILL_VALUE: missing value for z variable
     TIME_UNITS: time variable units
     TIME_LONGNAME: time variable description
+    MONTH: GRACE/GRACE-FO months for each time
+    MONTHS_NAME: name of months variable within HDF5 file
     TITLE: title attribute of dataset
     CLOBBER: will overwrite an existing HDF5 file
     VERBOSE: will print to screen the HDF5 structure parameters
     DATE: data has date information
+    DTYPE: data type of z variable (default is the data type of the input)
+    PACKING: pack z variable into integers with a scale factor and offset
+        (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed z variable
+        (default is to use the full range of the packed integers)
+    ADD_OFFSET: offset of the packed z variable
+        (default is the center of the range of the valid data)
+    LEAST_SIGNIFICANT_DIGIT: quantize z variable to a number of decimal places
+    CHUNKS: chunk shape of z variable (lat,lon) or (lat,lon,time)
+    COMPRESSION: compression filter of z variable (gzip, lzf or None)
+    COMPRESSION_LEVEL: gzip compression level of z variable (1-9)
+    SHUFFLE: apply the byte shuffle filter to z variable before compression
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
     h5py: Python interface for Hierarchal Data Format 5 (HDF5)
         (https://www.h5py.org)
 
+PROGRAM DEPENDENCIES:
+    pack_data.py: packs and quantizes floating point data
+
 UPDATE HISTORY:
+    Updated 08/2020: added options for chunk shape and compression level
+        added option for the data type of the z variable (e.g. float32)
+        added options for packing and quantizing the z variable
+        added option for the byte shuffle filter
+        added option for the compression filter (gzip or lzf)
+        added option to output GRACE/GRACE-FO months with the times
+        time dimension for three-dimensional data with a single date
+        reduce chunk shape to the dimensions of the data
+        retain floating point fill value of packed data as missing_value
+        use True/False flags for CLOBBER and VERBOSE
     Updated 07/2020: added function docstrings
     Updated 04/2020: added option DATE if including time data
     Updated 03/2020: only include title if not None
@@ -62,10 +89,14 @@ from __future__ import print_function
 import time
 import h5py
 import numpy as np
+from gravity_toolkit.pack_data import pack_data, quantize_data
 
 def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     LATNAME='lat', TIMENAME='time', UNITS=None, LONGNAME=None, FILL_VALUE=None,
-    TIME_UNITS=None, TIME_LONGNAME=None, TITLE=None, DATE=True, CLOBBER=True,
+    TIME_UNITS=None, TIME_LONGNAME=None, MONTH=None, MONTHS_NAME='month',
+    TITLE=None, DATE=True, DTYPE=None, PACKING=None, SCALE_FACTOR=None,
+    ADD_OFFSET=None, LEAST_SIGNIFICANT_DIGIT=None, CHUNKS=None,
+    COMPRESSION='gzip', COMPRESSION_LEVEL=None, SHUFFLE=False, CLOBBER=True,
     VERBOSE=False):
     """
     Writes spatial data to HDF5 files
@@ -88,14 +119,51 @@ def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     FILL_VALUE: missing value for z variable
     TIME_UNITS: time variable units
     TIME_LONGNAME: time variable description
+    MONTH: GRACE/GRACE-FO months for each time
+    MONTHS_NAME: name of months variable within HDF5 file
     TITLE: title attribute of dataset
     CLOBBER: will overwrite an existing HDF5 file
     VERBOSE: will print to screen the HDF5 structure parameters
     DATE: data has date information
+    DTYPE: data type of z variable (default is the data type of the input)
+    PACKING: pack z variable into integers with a scale factor and offset
+        (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed z variable
+        (default is to use the full range of the packed integers)
+    ADD_OFFSET: offset of the packed z variable
+        (default is the center of the range of the valid data)
+    LEAST_SIGNIFICANT_DIGIT: quantize z variable to a number of decimal places
+    CHUNKS: chunk shape of z variable (lat,lon) or (lat,lon,time)
+    COMPRESSION: compression filter of z variable (gzip, lzf or None)
+    COMPRESSION_LEVEL: gzip compression level of z variable (1-9)
+    SHUFFLE: apply the byte shuffle filter to z variable before compression
     """
 
+    #-- convert data and fill value to output data type
+    if DTYPE is not None:
+        data = data.astype(DTYPE, copy=False)
+    if FILL_VALUE is not None:
+        FILL_VALUE = data.dtype.type(FILL_VALUE)
+    #-- quantize the data to a number of decimal places
+    if LEAST_SIGNIFICANT_DIGIT is not None:
+        data = quantize_data(data,
+            LEAST_SIGNIFICANT_DIGIT=LEAST_SIGNIFICANT_DIGIT)
+    #-- pack the data into integers with a scale factor and offset
+    #-- floating point fill value is retained as the missing value
+    MISSING_VALUE = None
+    if PACKING is not None:
+        packed = pack_data(data, PACKING=PACKING, SCALE_FACTOR=SCALE_FACTOR,
+            ADD_OFFSET=ADD_OFFSET, FILL_VALUE=FILL_VALUE)
+        data = packed['data']
+        MISSING_VALUE = FILL_VALUE
+        FILL_VALUE = packed['_FillValue']
+
+    #-- reduce chunk shape to the dimensions of the data
+    if CHUNKS is not None:
+        CHUNKS = tuple(CHUNKS)[:data.ndim]
+
     #-- setting HDF5 clobber attribute
-    if CLOBBER in ('Y','y'):
+    if CLOBBER:
         clobber = 'w'
     else:
         clobber = 'w-'
@@ -111,17 +179,25 @@ def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
         dtype=lon.dtype, compression='gzip')
     h5[LATNAME] = fileID.create_dataset(LATNAME, lat.shape, data=lat,
         dtype=lat.dtype, compression='gzip')
+    #-- spatial data with chunk shape and compression filters
+    kwargs = dict(chunks=CHUNKS, compression=COMPRESSION, shuffle=SHUFFLE)
+    if (COMPRESSION == 'gzip'):
+        kwargs['compression_opts'] = COMPRESSION_LEVEL
     h5[VARNAME] = fileID.create_dataset(VARNAME, data.shape, data=data,
-        dtype=data.dtype, fillvalue=FILL_VALUE, compression='gzip')
+        dtype=data.dtype, fillvalue=FILL_VALUE, **kwargs)
     if DATE:
         h5[TIMENAME] = fileID.create_dataset(TIMENAME, (n_time,), data=tim,
             dtype=np.float, compression='gzip')
+    #-- GRACE/GRACE-FO months
+    if DATE and (MONTH is not None):
+        h5[MONTHS_NAME] = fileID.create_dataset(MONTHS_NAME, (n_time,),
+            data=MONTH, dtype=np.int, compression='gzip')
     #-- add dimensions
     h5[VARNAME].dims[0].label=LATNAME
     h5[VARNAME].dims[0].attach_scale(h5[LATNAME])
     h5[VARNAME].dims[1].label=LONNAME
-    #-- if more than 1 date in file
-    if (n_time > 1):
+    #-- if data has a time dimension
+    if (data.ndim == 3):
         h5[VARNAME].dims[2].label=TIMENAME
         h5[VARNAME].dims[2].attach_scale(h5[TIMENAME])
 
@@ -134,6 +210,14 @@ def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     #-- Defining attributes for dataset
     h5[VARNAME].attrs['long_name'] = LONGNAME
     h5[VARNAME].attrs['units'] = UNITS
+    #-- Defining attributes for packed and quantized data
+    if PACKING is not None:
+        h5[VARNAME].attrs['scale_factor'] = packed['scale_factor']
+        h5[VARNAME].attrs['add_offset'] = packed['add_offset']
+    if (PACKING is not None) and (MISSING_VALUE is not None):
+        h5[VARNAME].attrs['missing_value'] = MISSING_VALUE
+    if LEAST_SIGNIFICANT_DIGIT is not None:
+        h5[VARNAME].attrs['least_significant_digit'] = LEAST_SIGNIFICANT_DIGIT
     #-- Dataset contains missing values
     if (FILL_VALUE is not None):
         h5[VARNAME].attrs['_FillValue'] = FILL_VALUE
@@ -141,6 +225,9 @@ def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     if DATE:
         h5[TIMENAME].attrs['long_name'] = TIME_LONGNAME
         h5[TIMENAME].attrs['units'] = TIME_UNITS
+    if DATE and (MONTH is not None):
+        h5[MONTHS_NAME].attrs['long_name'] = 'GRACE_month'
+        h5[MONTHS_NAME].attrs['units'] = 'number'
     #-- description of file
     if TITLE:
         fileID.attrs['description'] = TITLE
@@ -148,7 +235,7 @@ def hdf5_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     fileID.attrs['date_created'] = time.strftime('%Y-%m-%d',time.localtime())
 
     #-- Output HDF5 structure information
-    if VERBOSE in ('Y','y'):
+    if VERBOSE:
         print(FILENAME)
         print(list(fileID.keys()))
 
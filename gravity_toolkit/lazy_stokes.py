@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+u"""
+lazy_stokes.py
+Written by Tyler Sutterley (08/2020)
+
+Lazy view of a spherical harmonic dataset within an open netCDF4 or HDF5 file
+    stored with the degree and order packed into a single dimension (lm,time)
+Indexing the view returns the harmonics for the requested dates in matrix
+    format (l,m,time) and only reads the hyperslab of the requested dates
+
+CALLING SEQUENCE:
+    clm = lazy_stokes(fileID['clm'], l, m)
+    Ylms = clm[:,:,i]
+    for s in clm.blocks():
+        Ylms = clm[:,:,s]
+
+INPUTS:
+    dataset: netCDF4 variable or HDF5 dataset with dimensions (lm) or (lm,time)
+    l: spherical harmonic degree of each coefficient
+    m: spherical harmonic order of each coefficient
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+
+UPDATE HISTORY:
+    Written 08/2020
+"""
+import numpy as np
+
+class lazy_stokes(object):
+    """
+    Lazy view of a packed spherical harmonic dataset as a (l,m,time) array
+    """
+    def __init__(self, dataset, l, m):
+        self.dataset=dataset
+        self.l=np.array(l, dtype=np.int64)
+        self.m=np.array(m, dtype=np.int64)
+        self.lmax=np.max(self.l)
+        self.mmax=np.max(self.m)
+        self.shape=(self.lmax+1,self.mmax+1) + tuple(dataset.shape[1:])
+        self.ndim=len(self.shape)
+        self.dtype=np.dtype(np.float64)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None):
+        return np.asarray(self[...], dtype=dtype)
+
+    def __getitem__(self, key):
+        """
+        Read the harmonics for a set of dates from the on-disk dataset
+        Inputs: indices of the degree, order and time dimensions
+        """
+        #-- expand the indices to the (l,m,time) dimensions
+        if not isinstance(key, tuple):
+            key = (key,)
+        ellipsis = [k is Ellipsis for k in key]
+        if any(ellipsis):
+            i = ellipsis.index(True)
+            key = key[:i] + (slice(None),)*(self.ndim-len(key)+1) + key[i+1:]
+        key = key + (slice(None),)*(self.ndim-len(key))
+        #-- read the hyperslab of dates from the on-disk dataset
+        if (self.ndim == 3):
+            nt = self.shape[2]
+            if isinstance(key[2], slice) and (key[2].indices(nt)[2] > 0):
+                Ylms = self.dataset[:,slice(*key[2].indices(nt))]
+            elif isinstance(key[2], (int,np.integer)):
+                Ylms = self.dataset[:,np.arange(nt)[key[2]]]
+            else:
+                #-- read unique dates in increasing order
+                indices = np.arange(nt)[key[2]]
+                u,inverse = np.unique(indices, return_inverse=True)
+                Ylms = self.dataset[:,u.tolist()][:,inverse]
+        else:
+            Ylms = self.dataset[:]
+        #-- restructure harmonics into matrix format
+        temp = np.zeros((self.lmax+1,self.mmax+1) + np.shape(Ylms)[1:])
+        temp[self.l,self.m,...] = Ylms
+        return temp[key[0],key[1],...]
+
+    def blocks(self):
+        """
+        Slices of dates for reading the on-disk dataset chunk by chunk
+        """
+        #-- chunk shape of netCDF4 variables or HDF5 datasets
+        if hasattr(self.dataset, 'chunking'):
+            chunks = self.dataset.chunking()
+        else:
+            chunks = self.dataset.chunks
+        #-- number of dates in each block
+        nt = self.shape[2]
+        n = chunks[1] if isinstance(chunks, (list,tuple)) else nt
+        return [slice(i,np.min([i+n,nt])) for i in range(0,nt,n)]
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+u"""
+low_degree_cache.py
+Written by Tyler Sutterley (08/2020)
+
+Reads low degree replacement coefficients (C20, C30 and geocenter) using
+    a binary cache of the parsed columns for each input file
+The cache is invalidated when the input file (or any file that the
+    parsed values depend on) is modified
+Only numerical arrays are cached: parsed values of other types are read
+    directly from the input file
+Creates indices of GRACE/GRACE-FO months for constant-time lookups
+
+CALLING SEQUENCE:
+    C20_input = low_degree_cache(read_SLR_C20, SLR_file, CACHE=CACHE)
+    DEG1_input = low_degree_cache(aod_corrected_SLR_geocenter, DEG1_file,
+        args=(DREL,), FILES=AOD1B_files, CACHE=CACHE, skiprows=111)
+    index = month_index(C20_input['month'])
+
+INPUTS:
+    reader: function for reading the low degree coefficient file
+    input_file: low degree coefficient file
+
+OUTPUTS:
+    python dictionary of parsed columns from the reader function
+        (month, time, values and errors)
+
+OPTIONS:
+    args: additional positional arguments for the reader function
+    FILES: additional files that the parsed values depend on
+    CACHE: directory for binary cache of parsed coefficients
+    **kwargs: keyword arguments for the reader function
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+
+PROGRAM DEPENDENCIES:
+    write_cache_file.py: writes numerical arrays to a binary cache file
+
+UPDATE HISTORY:
+    Written 08/2020
+"""
+import os
+import hashlib
+import numpy as np
+from gravity_toolkit.write_cache_file import write_cache_file
+
+#-- PURPOSE: read low degree coefficients using a binary cache
+def low_degree_cache(reader, input_file, args=(), FILES=None, CACHE=None,
+    **kwargs):
+    """
+    Reads low degree replacement coefficients using a binary cache
+
+    Arguments
+    ---------
+    reader: function for reading the low degree coefficient file
+    input_file: low degree coefficient file
+
+    Keyword arguments
+    -----------------
+    args: additional positional arguments for the reader function
+    FILES: additional files that the parsed values depend on
+    CACHE: directory for binary cache of parsed coefficients
+    **kwargs: keyword arguments for the reader function
+
+    Returns
+    -------
+    python dictionary of parsed columns from the reader function
+    """
+    #-- parse the file directly if not using a binary cache
+    if CACHE is None:
+        return reader(input_file, *args, **kwargs)
+    #-- create the cache directory if not currently existing
+    if not os.access(os.path.expanduser(CACHE), os.F_OK):
+        os.makedirs(os.path.expanduser(CACHE))
+    #-- check that the input file exists before calculating the cache key
+    if not os.access(os.path.expanduser(input_file), os.F_OK):
+        raise IOError('{0} not found in file system'.format(input_file))
+    #-- binary cache file for the input file and read parameters
+    cache_file = cache_filename(reader, input_file, args=args, FILES=FILES,
+        CACHE=CACHE, **kwargs)
+    #-- read the parsed columns from the binary cache if existing
+    if os.access(cache_file, os.F_OK):
+        with np.load(cache_file) as fileID:
+            return unflatten({key:fileID[key] for key in fileID.files})
+    #-- parse the file and write the columns to the binary cache
+    dinput = reader(input_file, *args, **kwargs)
+    columns = flatten(dinput)
+    #-- values that are not numerical arrays cannot be restored from the
+    #-- binary cache without pickling and are not cached
+    if not all(cacheable(val) for val in columns.values()):
+        return dinput
+    write_cache_file(cache_file, **columns)
+    return dinput
+
+#-- PURPOSE: calculate the binary cache filename for a low degree file
+#-- hashes the file paths, modification times, sizes and the read parameters
+def cache_filename(reader, input_file, args=(), FILES=None, CACHE=None,
+    **kwargs):
+    """
+    Calculates the binary cache filename for a low degree coefficient file
+
+    Arguments
+    ---------
+    reader: function for reading the low degree coefficient file
+    input_file: low degree coefficient file
+
+    Keyword arguments
+    -----------------
+    args: additional positional arguments for the reader function
+    FILES: additional files that the parsed values depend on
+    CACHE: directory for binary cache of parsed coefficients
+    **kwargs: keyword arguments for the reader function
+
+    Returns
+    -------
+    full path to the binary cache file
+    """
+    #-- unique key for the reader function and read parameters
+    key = [reader.__module__, reader.__name__, repr(args)]
+    key.extend('{0}={1!r}'.format(k,v) for k,v in sorted(kwargs.items()))
+    #-- full path and file information for each file
+    for f in [input_file] + sorted(FILES or []):
+        f = os.path.abspath(os.path.expanduser(f))
+        file_info = os.stat(f)
+        key.append('{0}:{1:d}:{2:d}'.format(f,file_info.st_mtime_ns,
+            file_info.st_size))
+    digest = hashlib.sha1(':'.join(key).encode('utf8')).hexdigest()
+    return os.path.join(os.path.expanduser(CACHE),'SLR_{0}.npz'.format(digest))
+
+#-- PURPOSE: flatten nested dictionaries of parsed columns for the cache
+def flatten(dinput, prefix=''):
+    """
+    Flattens nested dictionaries of parsed columns into a single dictionary
+    """
+    output = {}
+    for key,val in dinput.items():
+        if isinstance(val, dict):
+            output.update(flatten(val, prefix='{0}{1}/'.format(prefix,key)))
+        else:
+            output['{0}{1}'.format(prefix,key)] = val
+    return output
+
+#-- PURPOSE: check if a parsed column can be written to the binary cache
+def cacheable(val):
+    """
+    Checks if a parsed column is a numerical array for the binary cache
+    """
+    return isinstance(val, np.ndarray) and (val.dtype.kind in 'biuf')
+
+#-- PURPOSE: restore nested dictionaries of parsed columns from the cache
+def unflatten(dinput):
+    """
+    Restores nested dictionaries of parsed columns from a single dictionary
+    """
+    output = {}
+    for key,val in dinput.items():
+        *groups,variable = key.split('/')
+        group = output
+        for g in groups:
+            group = group.setdefault(g, {})
+        group[variable] = val
+    return output
+
+#-- PURPOSE: create an index of GRACE/GRACE-FO months for lookups
+def month_index(months):
+    """
+    Creates a mapping from GRACE/GRACE-FO months to array indices
+
+    Arguments
+    ---------
+    months: GRACE/GRACE-FO months of the low degree coefficients
+
+    Returns
+    -------
+    python dictionary with the index of each GRACE/GRACE-FO month
+    """
+    return {int(m):k for k,m in enumerate(np.atleast_1d(months))}
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 ncdf_read.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads spatial data from COARDS-compliant netCDF4 files
 
@@ -16,6 +16,7 @@ OUTPUTS:
     lon: longitudinal array
     lat: latitudinal array
     time: time value of dataset (if specified by DATE)
+    month: GRACE/GRACE-FO months (if specified by DATE and within file)
     attributes: netCDF4 attributes (for variables and title)
 
 OPTIONS:
@@ -25,6 +26,12 @@ OPTIONS:
     LONNAME: longitude variable name in netCDF4 file
     LATNAME: latitude variable name in netCDF4 file
     TIMENAME: time variable name in netCDF4 file
+    MONTHSNAME: GRACE/GRACE-FO months variable name in netCDF4 file
+    INDICES: slices of the lat, lon and time dimensions to read
+        (default is to read the entire dataset)
+    LAZY: output data as the on-disk netCDF4 variable for reading hyperslabs
+        (file remains open and INDICES are not applied)
+        packed data is unpacked in memory and is not read lazily
     ATTRIBUTES: netCDF4 variables contain attribute parameters
     TITLE: netCDF4 file contains title attribute parameter
 
@@ -33,7 +40,16 @@ PYTHON DEPENDENCIES:
     netCDF4: Python interface to the netCDF C library
          (https://unidata.github.io/netcdf4-python/netCDF4/index.html)
 
+PROGRAM DEPENDENCIES:
+    pack_data.py: packs and quantizes floating point data
+
 UPDATE HISTORY:
+    Updated 08/2020: added option to read windows of lat, lon and time
+        read GRACE/GRACE-FO months variable if within the file
+        added option to lazily read data from the on-disk variable
+        read data without masking and output the fill value attribute
+        unpack data packed with a scale factor and offset
+        restore floating point fill value of packed data from missing_value
     Updated 07/2020: added function docstrings
     Updated 06/2020: output data as lat/lon following spatial module
         attempt to read fill value attribute and set to None if not present
@@ -65,9 +81,11 @@ from __future__ import print_function
 import netCDF4
 import numpy as np
 import re
+from gravity_toolkit.pack_data import unpack_data
 
 def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
-    LATNAME='lat', TIMENAME='time', ATTRIBUTES=True, TITLE=True):
+    LATNAME='lat', TIMENAME='time', MONTHSNAME='month', INDICES=None,
+    LAZY=False, ATTRIBUTES=True, TITLE=True):
     """
     Reads spatial data from COARDS-compliant netCDF4 files
 
@@ -83,6 +101,12 @@ def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     LONNAME: longitude variable name in netCDF4 file
     LATNAME: latitude variable name in netCDF4 file
     TIMENAME: time variable name in netCDF4 file
+    MONTHSNAME: GRACE/GRACE-FO months variable name in netCDF4 file
+    INDICES: slices of the lat, lon and time dimensions to read
+        (default is to read the entire dataset)
+    LAZY: output data as the on-disk netCDF4 variable for reading hyperslabs
+        (file remains open and INDICES are not applied)
+        packed data is unpacked in memory and is not read lazily
     ATTRIBUTES: netCDF4 variables contain attribute parameters
     TITLE: netCDF4 file contains a description attribute
 
@@ -92,6 +116,7 @@ def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     lon: longitudinal array
     lat: latitudinal array
     time: time value of dataset
+    month: GRACE/GRACE-FO months
     attributes: netCDF4 attributes
     """
 
@@ -112,14 +137,51 @@ def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
     NAMES['data'] = VARNAME
     if DATE:
         NAMES['time'] = TIMENAME
+    #-- GRACE/GRACE-FO months if within the file
+    if DATE and (MONTHSNAME in fileID.variables.keys()):
+        NAMES['month'] = MONTHSNAME
+    #-- read the data variable without masking so that invalid points
+    #-- contain the fill value for both eager and lazy reads
+    fileID.variables[VARNAME].set_auto_maskandscale(False)
+    attrs = fileID.variables[VARNAME].ncattrs()
+    FILL_VALUE = fileID.variables[VARNAME]._FillValue \
+        if ('_FillValue' in attrs) else None
+    #-- data packed into integers is unpacked in memory
+    PACKED = 'scale_factor' in attrs
+    LAZY &= not PACKED
+    #-- slices of the lat, lon and time dimensions
+    ndim = fileID.variables[VARNAME].ndim
+    if (INDICES is None) or LAZY:
+        INDICES = (slice(None),)*ndim
+    else:
+        INDICES = tuple(INDICES) + (slice(None),)*(ndim - len(INDICES))
+    DIMS = dict(lat=INDICES[0], lon=INDICES[1],
+        time=INDICES[2] if (ndim == 3) else slice(None))
+    DIMS['month'] = DIMS['time']
     #-- for each variable
     for key,nckey in NAMES.items():
         #-- Getting the data from each NetCDF variable
-        dinput[key] = fileID.variables[nckey][:]
+        #-- only reading the window of the spatial data
+        if (key == 'data') and LAZY:
+            dinput[key] = fileID.variables[nckey]
+        elif (key == 'data'):
+            dinput[key] = fileID.variables[nckey][INDICES]
+        else:
+            dinput[key] = fileID.variables[nckey][DIMS[key]]
+    #-- unpack data with the scale factor and offset
+    #-- and restore the floating point fill value of the data
+    if PACKED:
+        dinput['data'] = unpack_data(dinput['data'],
+            fileID.variables[VARNAME].scale_factor,
+            fileID.variables[VARNAME].add_offset,
+            FILL_VALUE=FILL_VALUE,
+            MISSING_VALUE=fileID.variables[VARNAME].missing_value
+                if ('missing_value' in attrs) else None)
 
     #-- switching data array to lat/lon if lon/lat
     sz = dinput['data'].shape
-    if (dinput['data'].ndim == 2) and (len(dinput['lon']) == sz[0]):
+    if (not LAZY) and (dinput['data'].ndim == 2) and \
+        (len(dinput['lon']) == sz[0]):
         dinput['data'] = dinput['data'].T
 
     #-- getting attributes of included variables
@@ -135,17 +197,19 @@ def ncdf_read(filename, DATE=False, VERBOSE=False, VARNAME='z', LONNAME='lon',
         #-- put attributes in output python dictionary
         dinput['attributes'] = attributes
     #-- missing data fill value
-    try:
-        dinput['attributes']['_FillValue'] = fileID[VARNAME].attrs['_FillValue']
-    except:
-        dinput['attributes']['_FillValue'] = None
+    dinput['attributes']['_FillValue'] = FILL_VALUE
+    #-- floating point fill value of packed data
+    if PACKED and ('missing_value' in attrs):
+        dinput['attributes']['_FillValue'] = \
+            fileID.variables[VARNAME].missing_value
     #-- Global attribute (title of dataset)
     if TITLE:
         rx = re.compile('TITLE',re.IGNORECASE)
         title, = [st for st in dir(fileID) if rx.match(st)]
         dinput['attributes']['title'] = getattr(fileID, title)
 
-    #-- Closing the NetCDF file
-    fileID.close()
+    #-- Closing the NetCDF file if not reading lazily
+    if not LAZY:
+        fileID.close()
     #-- return the output variable
     return dinput
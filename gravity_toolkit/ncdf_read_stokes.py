@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 ncdf_read_stokes.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads spherical harmonic data from netCDF4 files
 
@@ -25,13 +25,21 @@ OPTIONS:
     DATE: netCDF4 file has date information
     ATTRIBUTES: netCDF4 variables contain attribute parameters
     VERBOSE: will print to screen the netCDF4 structure parameters
+    LAZY: read the harmonics lazily from the on-disk datasets
+        (file remains open for reading the harmonics of each date)
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
     netCDF4: Python interface to the netCDF C library
          (https://unidata.github.io/netcdf4-python/netCDF4/index.html)
 
+PROGRAM DEPENDENCIES:
+    lazy_stokes.py: lazy view of packed spherical harmonic datasets
+
 UPDATE HISTORY:
+    Updated 08/2020: read files with an unlimited time dimension
+        restructure harmonics to matrix format without looping
+        added option to lazily read the harmonics from on-disk datasets
     Updated 07/2020: added function docstrings
     Updated 03/2020: added ATTRIBUTES option to check if file has attributes
     Updated 10/2019: changing Y/N flags to True/False
@@ -61,8 +69,10 @@ from __future__ import print_function
 import netCDF4
 import numpy as np
 import re
+from gravity_toolkit.lazy_stokes import lazy_stokes
 
-def ncdf_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
+def ncdf_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False,
+    LAZY=False):
     """
     Reads spherical harmonic data from netCDF4 files
 
@@ -75,6 +85,8 @@ def ncdf_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
     DATE: netCDF4 file has date information
     ATTRIBUTES: netCDF4 variables contain attribute parameters
     VERBOSE: will print to screen the netCDF4 structure parameters
+    LAZY: read the harmonics lazily from the on-disk datasets
+        (file remains open for reading the harmonics of each date)
 
     Returns
     -------
@@ -101,10 +113,14 @@ def ncdf_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
 
     #-- Getting the data from each NetCDF variable
     #-- converting NetCDF objects into numpy arrays
-    ll = fileID.variables['l'][:].copy()
-    mm = fileID.variables['m'][:].copy()
-    clm = fileID.variables['clm'][:].copy()
-    slm = fileID.variables['slm'][:].copy()
+    ll = np.array(fileID.variables['l'][:])
+    mm = np.array(fileID.variables['m'][:])
+    #-- read harmonics lazily if stored with multiple dates
+    LAZY &= (fileID.variables['clm'].ndim == 2) and \
+        (fileID.variables['clm'].shape[1] > 1)
+    if not LAZY:
+        clm = np.array(fileID.variables['clm'][:])
+        slm = np.array(fileID.variables['slm'][:])
     #-- save date variables if specified
     if DATE:
         dinput['time'] = fileID.variables['time'][:].copy()
@@ -120,23 +136,21 @@ def ncdf_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
     #-- LMAX+1 to include LMAX (LMAX+1 elements)
     dinput['l'] = np.arange(0,LMAX+1)
     dinput['m'] = np.arange(0,MMAX+1)
-    #-- number of harmonics
-    n_harm, = fileID.variables['l'].shape
-    #-- import spherical harmonic data
-    if (DATE and (n_time > 1)):
-        #-- contains multiple dates
-        dinput['clm'] = np.zeros((LMAX+1,MMAX+1,n_time))
-        dinput['slm'] = np.zeros((LMAX+1,MMAX+1,n_time))
-        for lm in range(n_harm):
-            dinput['clm'][ll[lm],mm[lm],:] = clm[lm,:]
-            dinput['slm'][ll[lm],mm[lm],:] = slm[lm,:]
+    if LAZY:
+        #-- harmonics are read from the on-disk variables for each date
+        dinput['clm'] = lazy_stokes(fileID.variables['clm'], ll, mm)
+        dinput['slm'] = lazy_stokes(fileID.variables['slm'], ll, mm)
     else:
-        #-- contains either no dates or a single date
-        dinput['clm'] = np.zeros((LMAX+1,MMAX+1))
-        dinput['slm'] = np.zeros((LMAX+1,MMAX+1))
-        for lm in range(n_harm):
-            dinput['clm'][ll[lm],mm[lm]] = clm[lm]
-            dinput['slm'][ll[lm],mm[lm]] = slm[lm]
+        #-- single dates can be stored along an unlimited time dimension
+        if (clm.ndim == 2) and (clm.shape[1] == 1) and (n_time <= 1):
+            clm = clm[:,0]
+            slm = slm[:,0]
+        #-- import spherical harmonic data
+        #-- contains either multiple dates, no dates or a single date
+        dinput['clm'] = np.zeros((LMAX+1,MMAX+1) + clm.shape[1:])
+        dinput['slm'] = np.zeros((LMAX+1,MMAX+1) + slm.shape[1:])
+        dinput['clm'][ll,mm,...] = clm
+        dinput['slm'][ll,mm,...] = slm
 
     #-- Getting attributes of clm/slm and included variables
     if ATTRIBUTES:
@@ -152,8 +166,9 @@ def ncdf_read_stokes(filename, DATE=True, ATTRIBUTES=True, VERBOSE=False):
         title, = [st for st in dir(fileID) if rx.match(st)]
         dinput['attributes']['title'] = getattr(fileID, title)
 
-    #-- Closing the NetCDF file
-    fileID.close()
+    #-- Closing the NetCDF file if not reading lazily
+    if not LAZY:
+        fileID.close()
 
     #-- return output variable
     return dinput
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 ncdf_stokes.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Writes spherical harmonic coefficients to netCDF4 files
 
@@ -26,15 +26,37 @@ OPTIONS:
     MONTHS_LONGNAME: months variable description
     TITLE: title attribute of dataset
     CLOBBER: will overwrite an existing netCDF4 file
+    APPEND: will append dates to an existing netCDF4 file
+        (packed harmonics must be within the range of the existing file)
+        (months already within the existing file are replaced)
     VERBOSE: will print to screen the netCDF4 structure parameters
     DATE: harmonics have date information
+    PACKING: pack harmonics into integers with a scale factor and offset
+        (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed harmonics
+        (default is to use the full range of the packed integers)
+    ADD_OFFSET: offset of the packed harmonics
+        (default is the center of the range of the harmonics)
+    LEAST_SIGNIFICANT_DIGIT: quantize harmonics to a number of decimal places
+    COMPRESSION_LEVEL: gzip compression level of harmonics
+        (default is no compression unless shuffling)
+    SHUFFLE: apply the byte shuffle filter to harmonics before compression
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
     netCDF4: Python interface to the netCDF C library
          (https://unidata.github.io/netcdf4-python/netCDF4/index.html)
 
+PROGRAM DEPENDENCIES:
+    pack_data.py: packs and quantizes floating point data
+
 UPDATE HISTORY:
+    Updated 08/2020: unlimited time dimension chunked along time
+        added APPEND option to write only new dates to an existing file
+        replace months already within the file when appending
+        restructure harmonics to array format without looping
+        added options for packing and quantizing the harmonics
+        added options for the compression level and shuffle filter
     Updated 07/2020: added function docstrings
     Updated 03/2020: only include title if not None
     Updated 10/2019: changing Y/N flags to True/False
@@ -65,14 +87,18 @@ UPDATE HISTORY:
 """
 from __future__ import print_function, division
 
+import os
 import time
 import netCDF4
 import numpy as np
+from gravity_toolkit.pack_data import pack_data, quantize_data
 
 def ncdf_stokes(clm1, slm1, linp, minp, tinp, month, FILENAME=None,
     UNITS='Geodesy_Normalization', TIME_UNITS=None, TIME_LONGNAME=None,
     MONTHS_NAME='month', MONTHS_UNITS='number', MONTHS_LONGNAME='GRACE_month',
-    TITLE=None, DATE=True, CLOBBER=True, VERBOSE=False):
+    TITLE=None, DATE=True, PACKING=None, SCALE_FACTOR=None, ADD_OFFSET=None,
+    LEAST_SIGNIFICANT_DIGIT=None, COMPRESSION_LEVEL=None, SHUFFLE=False,
+    CLOBBER=True, APPEND=False, VERBOSE=False):
     """
     Writes spherical harmonic coefficients to netCDF4 files
 
@@ -96,91 +122,166 @@ def ncdf_stokes(clm1, slm1, linp, minp, tinp, month, FILENAME=None,
     MONTHS_LONGNAME: months variable description
     TITLE: title attribute of dataset
     CLOBBER: will overwrite an existing netCDF4 file
+    APPEND: will append dates to an existing netCDF4 file
+        (packed harmonics must be within the range of the existing file)
+        (months already within the existing file are replaced)
     VERBOSE: will print to screen the netCDF4 structure parameters
     DATE: harmonics have date information
+    PACKING: pack harmonics into integers with a scale factor and offset
+        (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed harmonics
+        (default is to use the full range of the packed integers)
+    ADD_OFFSET: offset of the packed harmonics
+        (default is the center of the range of the harmonics)
+    LEAST_SIGNIFICANT_DIGIT: quantize harmonics to a number of decimal places
+    COMPRESSION_LEVEL: gzip compression level of harmonics
+        (default is no compression unless shuffling)
+    SHUFFLE: apply the byte shuffle filter to harmonics before compression
     """
 
-    #-- setting netCDF clobber attribute
-    if CLOBBER:
-        clobber = 'w'
-    else:
-        clobber = 'a'
-
-    #-- opening netCDF file for writing
-    fileID = netCDF4.Dataset(FILENAME, clobber, format="NETCDF4")
-
     #-- Maximum spherical harmonic degree (LMAX) and order (MMAX)
     LMAX = np.max(linp)
     MMAX = np.max(minp)
-    #-- Calculating the number of cos and sin harmonics up to LMAX
-    #-- taking into account MMAX (if MMAX == LMAX then LMAX-MMAX=0)
-    n_harm = (LMAX**2 + 3*LMAX - (LMAX-MMAX)**2 - (LMAX-MMAX))//2 + 1
+    #-- restructured degree and order for each order m (l from m to LMAX)
+    lout = np.concatenate([np.arange(m,LMAX+1,dtype=np.int32)
+        for m in range(0,MMAX+1)])
+    mout = np.concatenate([np.full((LMAX+1-m),m,dtype=np.int32)
+        for m in range(0,MMAX+1)])
+    #-- number of cos and sin harmonics up to LMAX and MMAX
+    n_harm = len(lout)
 
     #-- Restructuring output matrix to array format
     #-- will reduce matrix size and insure compatibility between platforms
+    clm = np.array(clm1)[lout,mout,...]
+    slm = np.array(slm1)[lout,mout,...]
     if DATE:
-        if (np.ndim(tinp) == 0):
-            n_time = 1
-            clm = np.zeros((n_harm))
-            slm = np.zeros((n_harm))
-        else:
-            n_time = len(tinp)
-            clm = np.zeros((n_harm,n_time))
-            slm = np.zeros((n_harm,n_time))
-    else:
-        n_time = 0
-        clm = np.zeros((n_harm))
-        slm = np.zeros((n_harm))
-
-    #-- restructured degree and order
-    lout = np.zeros((n_harm,), dtype=np.int32)
-    mout = np.zeros((n_harm,), dtype=np.int32)
-    #-- create counter variable lm
-    lm = 0
-    for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-        for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-            lout[lm] = np.int(l)
-            mout[lm] = np.int(m)
-            if (DATE and (n_time > 1)):
-                clm[lm,:] = clm1[l,m,:]
-                slm[lm,:] = slm1[l,m,:]
+        #-- harmonics with dates are stored as (lm,time)
+        tinp = np.atleast_1d(tinp)
+        month = np.atleast_1d(month)
+        n_time = len(tinp)
+        clm = np.reshape(clm, (n_harm,n_time))
+        slm = np.reshape(slm, (n_harm,n_time))
+    #-- quantize the harmonics to a number of decimal places
+    if LEAST_SIGNIFICANT_DIGIT is not None:
+        clm = quantize_data(clm, LEAST_SIGNIFICANT_DIGIT=LEAST_SIGNIFICANT_DIGIT)
+        slm = quantize_data(slm, LEAST_SIGNIFICANT_DIGIT=LEAST_SIGNIFICANT_DIGIT)
+
+    #-- append dates to an existing netCDF4 file
+    if DATE and APPEND and os.access(os.path.expanduser(FILENAME),os.F_OK):
+        #-- opening netCDF file for appending
+        fileID = netCDF4.Dataset(FILENAME, 'a')
+        #-- check that the harmonics match the existing file
+        if not (np.array_equal(fileID.variables['l'][:],lout) and
+            np.array_equal(fileID.variables['m'][:],mout)):
+            fileID.close()
+            raise ValueError('Degree and order do not match {0}'.format(
+                FILENAME))
+        #-- check that the file can be extended along time
+        if not fileID.dimensions['time'].isunlimited():
+            fileID.close()
+            raise ValueError('Time dimension is not unlimited {0}'.format(
+                FILENAME))
+        #-- pack the new dates with the attributes of the file
+        #-- before modifying the file (values must be within packed range)
+        output = {}
+        for key,val in [('clm',clm),('slm',slm)]:
+            var = fileID.variables[key]
+            if 'scale_factor' in var.ncattrs():
+                try:
+                    output[key] = pack_data(val, PACKING=var.dtype,
+                        SCALE_FACTOR=var.scale_factor,
+                        ADD_OFFSET=var.add_offset)['data']
+                except ValueError as e:
+                    fileID.close()
+                    raise ValueError(('Cannot append to {0}: {1}. Write the '
+                        'file with a SCALE_FACTOR and ADD_OFFSET with headroom '
+                        'for new dates').format(FILENAME,e))
+                var.set_auto_scale(False)
             else:
-                clm[lm] = clm1[l,m]
-                slm[lm] = slm1[l,m]
-            #-- add 1 to lm counter variable
-            lm += 1
+                output[key] = val
+        #-- months already within the file are replaced
+        #-- and new months are written along the time dimension
+        n_end = len(fileID.dimensions['time'])
+        indices = {int(m):i for i,m in enumerate(fileID.variables[MONTHS_NAME][:])}
+        for m in month:
+            if int(m) not in indices:
+                indices[int(m)] = n_end
+                n_end += 1
+        for t,m in enumerate(month):
+            i = indices[int(m)]
+            fileID.variables['time'][i] = tinp[t]
+            fileID.variables[MONTHS_NAME][i] = m
+            for key,val in output.items():
+                fileID.variables[key][:,i] = val[:,t]
+        #-- date modified
+        fileID.date_modified = time.strftime('%Y-%m-%d',time.localtime())
+        #-- Output netCDF structure information
+        if VERBOSE:
+            print(FILENAME)
+            print(list(fileID.variables.keys()))
+        #-- Closing the netCDF file
+        fileID.close()
+        return
+
+    #-- pack the harmonics into integers with a scale factor and offset
+    packed = {}
+    if PACKING is not None:
+        for key,val in [('clm',clm),('slm',slm)]:
+            packed[key] = pack_data(val, PACKING=PACKING,
+                SCALE_FACTOR=SCALE_FACTOR, ADD_OFFSET=ADD_OFFSET)
+        clm = packed['clm']['data']
+        slm = packed['slm']['data']
+
+    #-- setting netCDF clobber attribute
+    if CLOBBER:
+        clobber = 'w'
+    else:
+        clobber = 'a'
+
+    #-- opening netCDF file for writing
+    fileID = netCDF4.Dataset(FILENAME, clobber, format="NETCDF4")
 
     #-- Defining the netCDF dimensions
     fileID.createDimension('lm', n_harm)
     if DATE:
-        fileID.createDimension('time', n_time)
+        #-- unlimited time dimension
+        fileID.createDimension('time', None)
 
     #-- defining the netCDF variables
     nc = {}
     #-- degree and order
     nc['l'] = fileID.createVariable('l', 'i', ('lm',))
     nc['m'] = fileID.createVariable('m', 'i', ('lm',))
-    #-- spherical harmonics
-    if (DATE and (n_time > 1)):
-        nc['clm'] = fileID.createVariable('clm', 'd', ('lm','time',))
-        nc['slm'] = fileID.createVariable('slm', 'd', ('lm','time',))
-    else:
-        nc['clm'] = fileID.createVariable('clm', 'd', ('lm',))
-        nc['slm'] = fileID.createVariable('slm', 'd', ('lm',))
+    #-- spherical harmonics with compression filters
+    kwargs = dict(zlib=(COMPRESSION_LEVEL is not None) or SHUFFLE,
+        shuffle=SHUFFLE)
+    if COMPRESSION_LEVEL is not None:
+        kwargs['complevel'] = COMPRESSION_LEVEL
+    if PACKING is not None:
+        kwargs['fill_value'] = packed['clm']['_FillValue']
+    dtype = 'd' if (PACKING is None) else clm.dtype
     if DATE:
+        #-- chunked along time
+        nc['clm'] = fileID.createVariable('clm', dtype, ('lm','time',),
+            chunksizes=(n_harm,1), **kwargs)
+        nc['slm'] = fileID.createVariable('slm', dtype, ('lm','time',),
+            chunksizes=(n_harm,1), **kwargs)
         #-- time (in decimal form)
         nc['time'] = fileID.createVariable('time', 'd', ('time',))
         #-- GRACE/GRACE-FO month (or integer date)
         nc['month'] = fileID.createVariable(MONTHS_NAME, 'i', ('time',))
+    else:
+        nc['clm'] = fileID.createVariable('clm', dtype, ('lm',), **kwargs)
+        nc['slm'] = fileID.createVariable('slm', dtype, ('lm',), **kwargs)
 
     #-- filling netCDF variables
     nc['l'][:] = lout.copy()
     nc['m'][:] = mout.copy()
-    nc['clm'][:] = clm.copy()
-    nc['slm'][:] = slm.copy()
     if DATE:
         nc['time'][:] = tinp
         nc['month'][:] = month
+    nc['clm'][:] = clm.copy()
+    nc['slm'][:] = slm.copy()
 
     #-- Defining attributes for degree and order
     nc['l'].long_name = 'spherical_harmonic_degree'#-- SH degree long name
@@ -192,6 +293,13 @@ def ncdf_stokes(clm1, slm1, linp, minp, tinp, month, FILENAME=None,
     nc['clm'].units = UNITS
     nc['slm'].long_name = 'sine_spherical_harmonics'
     nc['slm'].units = UNITS
+    #-- Defining attributes for packed and quantized harmonics
+    for key in ['clm','slm']:
+        if PACKING is not None:
+            nc[key].scale_factor = packed[key]['scale_factor']
+            nc[key].add_offset = packed[key]['add_offset']
+        if LEAST_SIGNIFICANT_DIGIT is not None:
+            nc[key].least_significant_digit = LEAST_SIGNIFICANT_DIGIT
     if DATE:
         #-- Defining attributes for date and month
         nc['time'].long_name = TIME_LONGNAME
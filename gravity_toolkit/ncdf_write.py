@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 ncdf_write.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Writes spatial data to COARDS-compliant netCDF4 files
 
@@ -24,17 +24,41 @@ OPTIONS:
     FILL_VALUE: missing value for z variable
     TIME_UNITS: time variable units
     TIME_LONGNAME: time variable description
+    MONTH: GRACE/GRACE-FO months for each time
+    MONTHS_NAME: name of months variable within netCDF4 file
     TITLE: title attribute of dataset
     CLOBBER: will overwrite an existing netCDF4 file
     VERBOSE: will print to screen the netCDF4 structure parameters
     DATE: data has date information
+    DTYPE: data type of z variable (default is the data type of the input)
+    PACKING: pack z variable into integers with a scale factor and offset
+        (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed z variable
+        (default is to use the full range of the packed integers)
+    ADD_OFFSET: offset of the packed z variable
+        (default is the center of the range of the valid data)
+    LEAST_SIGNIFICANT_DIGIT: quantize z variable to a number of decimal places
+    CHUNKS: chunk shape of z variable (lat,lon) or (lat,lon,time)
+    COMPRESSION_LEVEL: gzip compression level of z variable (1-9)
+    SHUFFLE: apply the byte shuffle filter to z variable before compression
 
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
     netCDF4: Python interface to the netCDF C library
          (https://unidata.github.io/netcdf4-python/netCDF4/index.html)
 
+PROGRAM DEPENDENCIES:
+    pack_data.py: packs and quantizes floating point data
+
 UPDATE HISTORY:
+    Updated 08/2020: added options for chunk shape and compression level
+        added option for the data type of the z variable (e.g. float32)
+        added options for packing and quantizing the z variable
+        added option for the byte shuffle filter
+        added option to output GRACE/GRACE-FO months with the times
+        time dimension for three-dimensional data with a single date
+        reduce chunk shape to the dimensions of the data
+        retain floating point fill value of packed data as missing_value
     Updated 07/2020: added function docstrings
     Updated 04/2020: added option DATE if including time data
     Updated 03/2020: only include title if not None
@@ -62,11 +86,14 @@ from __future__ import print_function
 import time
 import netCDF4
 import numpy as np
+from gravity_toolkit.pack_data import pack_data, quantize_data
 
 def ncdf_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     LATNAME='lat', TIMENAME='time', UNITS=None, LONGNAME=None, FILL_VALUE=None,
-    TIME_UNITS=None, TIME_LONGNAME=None, TITLE=None, DATE=True, CLOBBER=True,
-    VERBOSE=False):
+    TIME_UNITS=None, TIME_LONGNAME=None, MONTH=None, MONTHS_NAME='month',
+    TITLE=None, DATE=True, DTYPE=None, PACKING=None, SCALE_FACTOR=None,
+    ADD_OFFSET=None, LEAST_SIGNIFICANT_DIGIT=None, CHUNKS=None,
+    COMPRESSION_LEVEL=None, SHUFFLE=False, CLOBBER=True, VERBOSE=False):
     """
     Writes spatial data to COARDS-compliant netCDF4 files
 
@@ -88,12 +115,48 @@ def ncdf_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     FILL_VALUE: missing value for z variable
     TIME_UNITS: time variable units
     TIME_LONGNAME: time variable description
+    MONTH: GRACE/GRACE-FO months for each time
+    MONTHS_NAME: name of months variable within netCDF4 file
     TITLE: title attribute of dataset
     CLOBBER: will overwrite an existing netCDF4 file
     VERBOSE: will print to screen the netCDF4 structure parameters
     DATE: data has date information
+    DTYPE: data type of z variable (default is the data type of the input)
+    PACKING: pack z variable into integers with a scale factor and offset
+        (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed z variable
+        (default is to use the full range of the packed integers)
+    ADD_OFFSET: offset of the packed z variable
+        (default is the center of the range of the valid data)
+    LEAST_SIGNIFICANT_DIGIT: quantize z variable to a number of decimal places
+    CHUNKS: chunk shape of z variable (lat,lon) or (lat,lon,time)
+    COMPRESSION_LEVEL: gzip compression level of z variable (1-9)
+    SHUFFLE: apply the byte shuffle filter to z variable before compression
     """
 
+    #-- convert data and fill value to output data type
+    if DTYPE is not None:
+        data = data.astype(DTYPE, copy=False)
+    if FILL_VALUE is not None:
+        FILL_VALUE = data.dtype.type(FILL_VALUE)
+    #-- quantize the data to a number of decimal places
+    if LEAST_SIGNIFICANT_DIGIT is not None:
+        data = quantize_data(data,
+            LEAST_SIGNIFICANT_DIGIT=LEAST_SIGNIFICANT_DIGIT)
+    #-- pack the data into integers with a scale factor and offset
+    #-- floating point fill value is retained as the missing value
+    MISSING_VALUE = None
+    if PACKING is not None:
+        packed = pack_data(data, PACKING=PACKING, SCALE_FACTOR=SCALE_FACTOR,
+            ADD_OFFSET=ADD_OFFSET, FILL_VALUE=FILL_VALUE)
+        data = packed['data']
+        MISSING_VALUE = FILL_VALUE
+        FILL_VALUE = packed['_FillValue']
+
+    #-- reduce chunk shape to the dimensions of the data
+    if CHUNKS is not None:
+        CHUNKS = tuple(CHUNKS)[:data.ndim]
+
     #-- setting NetCDF clobber attribute
     if CLOBBER:
         clobber = 'w'
@@ -115,16 +178,25 @@ def ncdf_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     #-- lat and lon
     nc[LONNAME] = fileID.createVariable(LONNAME, lon.dtype, (LONNAME,))
     nc[LATNAME] = fileID.createVariable(LATNAME, lat.dtype, (LATNAME,))
-    #-- spatial data
-    if (n_time > 1):
+    #-- spatial data with chunk shape and compression filters
+    kwargs = dict(fill_value=FILL_VALUE, zlib=True, shuffle=SHUFFLE,
+        chunksizes=CHUNKS)
+    if COMPRESSION_LEVEL is not None:
+        kwargs['complevel'] = COMPRESSION_LEVEL
+    #-- data has a time dimension if three-dimensional (even for 1 date)
+    if (data.ndim == 3):
         nc[VARNAME] = fileID.createVariable(VARNAME, data.dtype,
-            (LATNAME,LONNAME,TIMENAME,), fill_value=FILL_VALUE, zlib=True)
+            (LATNAME,LONNAME,TIMENAME,), **kwargs)
     else:
         nc[VARNAME] = fileID.createVariable(VARNAME, data.dtype,
-            (LATNAME,LONNAME,), fill_value=FILL_VALUE, zlib=True)
+            (LATNAME,LONNAME,), **kwargs)
     #-- time
     if DATE:
         nc[TIMENAME] = fileID.createVariable(TIMENAME, 'f8', (TIMENAME,))
+    #-- GRACE/GRACE-FO months
+    if DATE and (MONTH is not None):
+        nc[MONTHS_NAME] = fileID.createVariable(MONTHS_NAME, 'i',
+            (TIMENAME,))
 
     #-- filling NetCDF variables
     nc[LONNAME][:] = lon
@@ -132,6 +204,8 @@ def ncdf_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     nc[VARNAME][:,:] = data
     if DATE:
         nc[TIMENAME][:] = tim
+    if DATE and (MONTH is not None):
+        nc[MONTHS_NAME][:] = MONTH
 
     #-- Defining attributes for longitude and latitude
     nc[LONNAME].long_name = 'longitude'
@@ -141,10 +215,22 @@ def ncdf_write(data, lon, lat, tim, FILENAME=None, VARNAME='z', LONNAME='lon',
     #-- Defining attributes for dataset
     nc[VARNAME].long_name = LONGNAME
     nc[VARNAME].units = UNITS
+    #-- Defining attributes for packed and quantized data
+    if PACKING is not None:
+        nc[VARNAME].scale_factor = packed['scale_factor']
+        nc[VARNAME].add_offset = packed['add_offset']
+    if (PACKING is not None) and (MISSING_VALUE is not None):
+        #-- set directly to keep the floating point data type
+        nc[VARNAME].setncattr('missing_value', MISSING_VALUE)
+    if LEAST_SIGNIFICANT_DIGIT is not None:
+        nc[VARNAME].least_significant_digit = LEAST_SIGNIFICANT_DIGIT
     #-- Defining attributes for date if applicable
     if DATE:
         nc[TIMENAME].long_name = TIME_LONGNAME
         nc[TIMENAME].units = TIME_UNITS
+    if DATE and (MONTH is not None):
+        nc[MONTHS_NAME].long_name = 'GRACE_month'
+        nc[MONTHS_NAME].units = 'number'
     #-- global variable of NetCDF file
     if TITLE:
         fileID.TITLE = TITLE
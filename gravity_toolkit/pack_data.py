@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+u"""
+pack_data.py
+Written by Tyler Sutterley (08/2020)
+
+Packs floating point data into integers following the CF conventions
+    for scale_factor and add_offset attributes
+Unpacks integer data back into floating point values
+Quantizes floating point data to a number of decimal places
+    to improve the compression of the data
+
+CALLING SEQUENCE:
+    packed = pack_data(data, PACKING='int16')
+    data = unpack_data(packed['data'], packed['scale_factor'],
+        packed['add_offset'], FILL_VALUE=packed['_FillValue'])
+    data = quantize_data(data, LEAST_SIGNIFICANT_DIGIT=3)
+
+INPUTS:
+    data: floating point data to be packed or quantized
+
+OUTPUTS:
+    data: packed integer data
+    scale_factor: CF scale factor of the packed data
+    add_offset: CF offset of the packed data
+    _FillValue: fill value of the packed data
+
+OPTIONS:
+    PACKING: integer data type of the packed data (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed data
+        (default is to use the range of the valid data)
+    ADD_OFFSET: offset of the packed data
+        (default is the center of the range of the valid data)
+    FILL_VALUE: fill value of the input floating point data
+        or of the packed data when unpacking
+    MISSING_VALUE: value of fill points in the unpacked data
+    LEAST_SIGNIFICANT_DIGIT: number of decimal places to retain
+        in the quantized data
+    CLIP: clip values outside of the range of the packed integers
+        (default is to raise an exception)
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+
+UPDATE HISTORY:
+    Written 08/2020
+"""
+import numpy as np
+
+def pack_data(data, PACKING='int16', SCALE_FACTOR=None, ADD_OFFSET=None,
+    FILL_VALUE=None, CLIP=False):
+    """
+    Packs floating point data into integers with a scale factor and offset
+
+    Arguments
+    ---------
+    data: floating point data to be packed
+
+    Keyword arguments
+    -----------------
+    PACKING: integer data type of the packed data (int16 or int32)
+    SCALE_FACTOR: quantization step of the packed data
+    ADD_OFFSET: offset of the packed data
+    FILL_VALUE: fill value of the input floating point data
+    CLIP: clip values outside of the range of the packed integers
+        (default is to raise an exception)
+
+    Returns
+    -------
+    data: packed integer data
+    scale_factor: CF scale factor of the packed data
+    add_offset: CF offset of the packed data
+    _FillValue: fill value of the packed data
+    """
+    #-- integer data type and range of packed values
+    #-- the minimum integer is reserved for the fill value
+    dtype = np.dtype(PACKING)
+    imax = np.iinfo(dtype).max
+    fill_value = np.iinfo(dtype).min
+    #-- find valid points within the data
+    data = np.array(data, dtype=np.float64)
+    valid = np.isfinite(data)
+    if FILL_VALUE is not None:
+        valid &= (data != FILL_VALUE)
+    #-- range of the valid data
+    if np.any(valid):
+        vmin,vmax = (np.min(data[valid]),np.max(data[valid]))
+    else:
+        vmin,vmax = (0.0,0.0)
+    #-- offset and scale factor to use the full range of the integers
+    if ADD_OFFSET is None:
+        ADD_OFFSET = (vmax + vmin)/2.0
+    if SCALE_FACTOR is None:
+        SCALE_FACTOR = (vmax - vmin)/(2.0*imax) if (vmax > vmin) else 1.0
+    #-- pack the valid data and replace invalid points with the fill value
+    packed = np.full(data.shape, fill_value, dtype=dtype)
+    values = np.around((data[valid] - ADD_OFFSET)/SCALE_FACTOR)
+    #-- check that the values are within the range of the packed integers
+    if not CLIP and np.any(np.abs(values) > imax):
+        vmin = ADD_OFFSET - imax*SCALE_FACTOR
+        vmax = ADD_OFFSET + imax*SCALE_FACTOR
+        raise ValueError(('Values outside of packed range [{0:g}, {1:g}] '
+            'for scale_factor {2:g} and add_offset {3:g}').format(vmin,vmax,
+            SCALE_FACTOR,ADD_OFFSET))
+    packed[valid] = np.clip(values, -imax, imax)
+    #-- return the packed data and the packing attributes
+    return {'data':packed, 'scale_factor':np.float64(SCALE_FACTOR),
+        'add_offset':np.float64(ADD_OFFSET), '_FillValue':fill_value}
+
+def unpack_data(data, scale_factor, add_offset, FILL_VALUE=None,
+    MISSING_VALUE=None):
+    """
+    Unpacks integer data into floating point values
+
+    Arguments
+    ---------
+    data: packed integer data
+    scale_factor: CF scale factor of the packed data
+    add_offset: CF offset of the packed data
+
+    Keyword arguments
+    -----------------
+    FILL_VALUE: fill value of the packed data
+    MISSING_VALUE: value of fill points in the unpacked data
+        (default is to retain FILL_VALUE)
+
+    Returns
+    -------
+    data: unpacked floating point data
+    """
+    unpacked = scale_factor*np.array(data, dtype=np.float64) + add_offset
+    if FILL_VALUE is not None:
+        MISSING_VALUE = FILL_VALUE if (MISSING_VALUE is None) else MISSING_VALUE
+        unpacked[data == FILL_VALUE] = MISSING_VALUE
+    return unpacked
+
+def quantize_data(data, LEAST_SIGNIFICANT_DIGIT=None):
+    """
+    Quantizes floating point data to a number of decimal places
+
+    Arguments
+    ---------
+    data: floating point data to be quantized
+
+    Keyword arguments
+    -----------------
+    LEAST_SIGNIFICANT_DIGIT: number of decimal places to retain
+        in the quantized data
+
+    Returns
+    -------
+    data: quantized floating point data
+    """
+    if LEAST_SIGNIFICANT_DIGIT is None:
+        return data
+    #-- round to a power of two precision for lossless compression of
+    #-- the trailing bits (following netCDF4-python)
+    bits = np.ceil(np.log2(10.0**LEAST_SIGNIFICANT_DIGIT))
+    scale = 2.0**bits
+    return (np.around(scale*data)/scale).astype(np.asarray(data).dtype)
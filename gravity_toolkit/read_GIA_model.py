@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 read_GIA_model.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads GIA data files that can come in various formats depending on the group
 Outputs spherical harmonics for the GIA rates and the GIA model parameters
@@ -30,6 +30,7 @@ OPTIONS:
         netCDF4: output to netCDF4 format (.nc)
         HDF5: output to HDF5 format (.H5)
     MODE: permissions mode of output spherical harmonic files
+    CACHE: directory for binary cache of converted GIA harmonics
 
 OUTPUTS:
     clm: cosine spherical harmonic of GIA rate
@@ -50,6 +51,7 @@ PROGRAM DEPENDENCIES:
     hdf5_stokes.py: writes output spherical harmonic data to HDF5
     ncdf_read_stokes.py: reads spherical harmonic data from netcdf
     hdf5_read_stokes.py: reads spherical harmonic data from HDF5
+    write_cache_file.py: writes numerical arrays to a binary cache file
 
 REFERENCES:
     E. R. Ivins, T. S. James, J. Wahr, E. J. O. Schrama, F. W. Landerer, and
@@ -95,6 +97,8 @@ REFERENCES:
     https://doi.org/10.1002/2016JB013844
 
 UPDATE HISTORY:
+    UPDATED 08/2020: parse each GIA format in bulk in a single pass
+        added binary cache of converted harmonics keyed by the file hash
     UPDATED 04/2020: include spherical harmonic degree and order in output dict
         added option to truncate to spherical harmonic order
     UPDATED 03/2020: updated for public release.  added reformatted ascii option
@@ -125,14 +129,16 @@ from __future__ import print_function
 
 import os
 import re
+import hashlib
 import numpy as np
 from gravity_toolkit.ncdf_stokes import ncdf_stokes
 from gravity_toolkit.hdf5_stokes import hdf5_stokes
 from gravity_toolkit.ncdf_read_stokes import ncdf_read_stokes
 from gravity_toolkit.hdf5_read_stokes import hdf5_read_stokes
+from gravity_toolkit.write_cache_file import write_cache_file
 
 def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
-    DATAFORM=None, MODE=0o775):
+    DATAFORM=None, MODE=0o775, CACHE=None):
     """
     Reads Glacial Isostatic Adjustment (GIA) data files
 
@@ -161,6 +167,7 @@ def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
         netCDF4: output to netCDF4 format (.nc)
         HDF5: output to HDF5 format (.H5)
     MODE: permissions mode of output spherical harmonic files
+    CACHE: directory for binary cache of converted GIA harmonics
 
     Returns
     -------
@@ -231,8 +238,29 @@ def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
         scale = 1.0
 
 
+    #-- check if the GIA file was previously converted to binary
+    #-- reformatted netCDF4 and HDF5 files are not cached
+    cache_file,cached = (None,False)
+    if (CACHE is not None) and GIA not in ('netCDF4','HDF5'):
+        #-- unique key from the contents of the GIA file and parameters
+        h = hashlib.sha1()
+        with open(os.path.expanduser(input_file),'rb') as f:
+            for chunk in iter(lambda: f.read(1048576), b''):
+                h.update(chunk)
+        h.update('{0}:{1}:{2:d}'.format(GIA,os.path.basename(input_file),
+            LMAX).encode('utf8'))
+        cache_file = os.path.join(os.path.expanduser(CACHE),
+            'GIA_{0}.npz'.format(h.hexdigest()))
+        cached = os.access(cache_file, os.F_OK)
+
     #-- Reading GIA files (ICE-6G and Wu have more complex formats)
-    if GIA in ('IJ05-R2','W12a','SM09','AW13-ICE6G'):
+    if cached:
+        #-- reading GIA data from the binary cache of converted harmonics
+        with np.load(cache_file) as fileID:
+            gia_Ylms['clm'][:,:] = fileID['clm']
+            gia_Ylms['slm'][:,:] = fileID['slm']
+
+    elif GIA in ('IJ05-R2','W12a','SM09','AW13-ICE6G'):
         #-- AW13, IJ05, W12a, SM09
         #-- AW13 notes: file headers
         #-- IJ05 notes: need to scale by 1e-11 for geodesy-normalization
@@ -241,25 +269,10 @@ def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
         #-- opening gia data file and read contents
         with open(os.path.expanduser(input_file),'r') as f:
             gia_data = f.read().splitlines()
-        #-- number of lines in file
-        gia_lines = len(gia_data)
-
-        #-- Skipping file header for geruo files with header
-        for ii in range(start,gia_lines):
-            #-- check if contents in line
-            flag = bool(rx.search(gia_data[ii].replace('D','E')))
-            if flag:
-                #-- find numerical instances in line including exponents,
-                #-- decimal points and negatives
-                #-- Replacing Double Exponent with Standard Exponent
-                line = rx.findall(gia_data[ii].replace('D','E'))
-                l1 = np.int(line[0])
-                m1 = np.int(line[1])
-                #-- truncate to LMAX
-                if (l1 <= LMAX) and (m1 <= LMAX):
-                    #-- scaling to geodesy normalization
-                    gia_Ylms['clm'][l1,m1] = np.float(line[2])*scale
-                    gia_Ylms['slm'][l1,m1] = np.float(line[3])*scale
+        #-- parse all degrees and orders in the file in a single pass
+        ll,mm,clm,slm = parse_GIA_columns(gia_data[start:], LMAX, SCALE=scale)
+        gia_Ylms['clm'][ll,mm] = clm
+        gia_Ylms['slm'][ll,mm] = slm
 
     elif (GIA == 'ICE6G'):
         #-- ICE-6G VM5 notes
@@ -271,30 +284,32 @@ def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
         with open(os.path.expanduser(input_file),'r') as f:
             gia_data = f.read().splitlines()
 
-        #-- counter variable
-        ii = 0
-        for l in range(0, LMAX+1):
-            for m in range(0, l+1):
-                if ((m % 2) == 0):
-                    #-- reading gia line if the order is even
-                    #-- find numerical instances in line including exponents,
-                    #-- decimal points and negatives
-                    line = rx.findall(gia_data[ii])
-                    #-- counter to next line
-                    ii += 1
-                    #-- if m is even: clm column = 1, slm column = 2
-                    c = 0
-                else: #-- if m is odd: clm column = 3, slm column = 4
-                    c = 2
-                if ((m == 0) or (m == 1)):
-                    #-- l is column 1 if m == 0 or 1
-                    #-- degree is not listed for other SHd: column 1 = clm
-                    c += 1
-                if (len(line) > 0):
-                    #-- no empty lines
-                    #-- convert to float and scale
-                    gia_Ylms['clm'][l,m] = np.float(line[0+c])*scale
-                    gia_Ylms['slm'][l,m] = np.float(line[1+c])*scale
+        #-- degree and order of each coefficient in the file
+        ll,mm = np.tril_indices(LMAX+1)
+        #-- each line contains an even order and the following odd order
+        #-- line number of the first order for each degree
+        nlines = np.arange(LMAX+1)//2 + 1
+        offset = np.concatenate(([0],np.cumsum(nlines)))
+        ii = offset[ll] + mm//2
+        #-- if m is even: clm column = 1, slm column = 2
+        #-- if m is odd: clm column = 3, slm column = 4
+        #-- l is column 1 if m == 0 or 1
+        #-- degree is not listed for other SHd: column 1 = clm
+        c = np.where((mm % 2) == 0, 0, 2) + (mm <= 1)
+        #-- find numerical instances in each line including exponents,
+        #-- decimal points and negatives
+        lines = [rx.findall(line) for line in gia_data[:offset[-1]]]
+        #-- pad lines into a single array of values (empty lines are zero)
+        counts = np.array([len(line) for line in lines], dtype=np.int64)
+        values = np.zeros((offset[-1],np.max(counts)))
+        row = np.repeat(np.arange(offset[-1]), counts)
+        col = np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts)-counts,
+            counts)
+        values[row,col] = np.array([v for line in lines for v in line],
+            dtype=np.float64)
+        #-- convert to float and scale
+        gia_Ylms['clm'][ll,mm] = values[ii,0+c]*scale
+        gia_Ylms['slm'][ll,mm] = values[ii,1+c]*scale
 
     elif (GIA == 'Wu10'):
         #-- Wu (2010) notes:
@@ -305,27 +320,21 @@ def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
         gia_data = np.loadtxt(os.path.expanduser(input_file), \
             skiprows=1, dtype='f8')
 
-        #-- counter variable to upwrap gia file
-        ii = 0
-
         #-- Order of harmonics in the file:
         #--    1    0   c
         #--    1    1   c
         #--    1    1   s
         #--    2    0   c
         #--    2    1   c
-        for l in range(1, LMAX+1):
-            for m in range(0, l+1):
-                for cs in range(0, 2):
-                    #-- unwrapping GIA file and converting to geoid
-                    #-- Clm
-                    if (cs == 0):
-                        gia_Ylms['clm'][l,m] = gia_data[ii]/rad_e
-                        ii += 1
-                    #-- Slm
-                    if (m != 0) and (cs == 1):
-                        gia_Ylms['slm'][l,m] = gia_data[ii]/rad_e
-                        ii += 1
+        ll,mm = np.tril_indices(LMAX+1)
+        ll,mm = (ll[1:],mm[1:])
+        #-- position of each Clm within the file (Slm follows for m != 0)
+        count = 1 + (mm != 0)
+        ii = np.cumsum(count) - count
+        #-- unwrapping GIA file and converting to geoid
+        gia_Ylms['clm'][ll,mm] = gia_data[ii]/rad_e
+        s = (mm != 0)
+        gia_Ylms['slm'][ll[s],mm[s]] = gia_data[ii[s]+1]/rad_e
 
     elif (GIA == 'Caron'):
         #-- Caron et al. (2018)
@@ -343,68 +352,39 @@ def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
         #--    2    0   c
         #--    2    1   c
         #--    2    2   c
-        for l,m,Ylm in zip(gia_data['l'],gia_data['m'],gia_data['Ylms']):
-            #-- unwrapping GIA file
-            if (m >= 0) and (l <= LMAX) and (m <= LMAX):#-- Clm
-                gia_Ylms['clm'][l,m] = Ylm.copy()
-            elif (m < 0) and (l <= LMAX) and (m <= LMAX):#-- Slm
-                gia_Ylms['slm'][l,np.abs(m)] = Ylm.copy()
+        ll,mm,Ylms = (gia_data['l'],gia_data['m'],gia_data['Ylms'])
+        #-- unwrapping GIA file within the spherical harmonic range
+        c = (ll <= LMAX) & (mm >= 0) & (mm <= LMAX)#-- Clm
+        s = (ll <= LMAX) & (mm < 0) & (np.abs(mm) <= LMAX)#-- Slm
+        gia_Ylms['clm'][ll[c],mm[c]] = Ylms[c]
+        gia_Ylms['slm'][ll[s],np.abs(mm[s])] = Ylms[s]
 
     #-- Reading ICE-6G Version-D  GIA files
     elif (GIA == 'ICE6G-D'):
         #-- opening gia data file and read contents
         with open(os.path.expanduser(input_file),'r') as f:
             gia_data = f.read().splitlines()
-        #-- number of lines in file
-        gia_lines = len(gia_data)
 
         #-- Calculating number of cos and sin harmonics to read from header
         n_harm = (2**2 + 3*2)//2 + 1
         #-- extract header for GRACE approximation
-        for ii in range(header,header+n_harm):
-            #-- check if contents in line
-            flag = bool(rx.search(gia_data[ii].replace('D','E')))
-            if flag:
-                #-- find numerical instances in line including exponents,
-                #-- decimal points and negatives
-                #-- Replacing Double Exponent with Standard Exponent
-                line = rx.findall(gia_data[ii].replace('D','E'))
-                l1 = np.int(line[0])
-                m1 = np.int(line[1])
-                #-- truncate to LMAX
-                if (l1 <= LMAX) and (m1 <= LMAX):
-                    #-- scaling to geodesy normalization
-                    gia_Ylms['clm'][l1,m1] = np.float(line[2])*scale
-                    gia_Ylms['slm'][l1,m1] = np.float(line[3])*scale
-
+        ll,mm,clm,slm = parse_GIA_columns(gia_data[header:header+n_harm],
+            LMAX, SCALE=scale)
+        gia_Ylms['clm'][ll,mm] = clm
+        gia_Ylms['slm'][ll,mm] = slm
         #-- Skipping rest of file header
-        for ii in range(start,gia_lines):
-            #-- check if contents in line
-            flag = bool(rx.search(gia_data[ii].replace('D','E')))
-            if flag:
-                #-- find numerical instances in line including exponents,
-                #-- decimal points and negatives
-                #-- Replacing Double Exponent with Standard Exponent
-                line = rx.findall(gia_data[ii].replace('D','E'))
-                l1 = np.int(line[0])
-                m1 = np.int(line[1])
-                #-- truncate to LMAX
-                if (l1 <= LMAX) and (m1 <= LMAX):
-                    #-- scaling to geodesy normalization
-                    gia_Ylms['clm'][l1,m1] = np.float(line[2])*scale
-                    gia_Ylms['slm'][l1,m1] = np.float(line[3])*scale
+        ll,mm,clm,slm = parse_GIA_columns(gia_data[start:], LMAX, SCALE=scale)
+        gia_Ylms['clm'][ll,mm] = clm
+        gia_Ylms['slm'][ll,mm] = slm
 
     elif (GIA == 'ascii'):
         #-- reading GIA data from reformatted (simplified) ascii files
         dtype = {'names':('l','m','clm','slm'), 'formats':('i','i','f8','f8')}
         Ylms = np.loadtxt(os.path.expanduser(input_file), dtype=dtype)
-        for ll,mm,clm,slm in zip(Ylms['l'],Ylms['m'],Ylms['clm'],Ylms['slm']):
-            #-- only using coefficients within the spherical harmonic range
-            if ((ll <= LMAX) and (mm <= LMAX)):
-                gia_Ylms['clm'][ll,mm] = clm.copy()
-                gia_Ylms['slm'][ll,mm] = slm.copy()
-        #-- copy filename (without extension) for parameters
-        gia_Ylms['title'] = os.path.basename(os.path.splitext(input_file)[0])
+        #-- only using coefficients within the spherical harmonic range
+        ii = (Ylms['l'] <= LMAX) & (Ylms['m'] <= LMAX)
+        gia_Ylms['clm'][Ylms['l'][ii],Ylms['m'][ii]] = Ylms['clm'][ii]
+        gia_Ylms['slm'][Ylms['l'][ii],Ylms['m'][ii]] = Ylms['slm'][ii]
 
     elif (GIA == 'netCDF4'):
         #-- reading GIA data from reformatted netCDF4 files
@@ -424,6 +404,15 @@ def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
         #-- copy title for parameters
         gia_Ylms['title'] = Ylms['attributes']['title']
 
+    #-- write converted harmonics to the binary cache
+    if (cache_file is not None) and not cached:
+        if not os.access(os.path.expanduser(CACHE), os.F_OK):
+            os.makedirs(os.path.expanduser(CACHE))
+        write_cache_file(cache_file, clm=gia_Ylms['clm'], slm=gia_Ylms['slm'])
+
+    #-- copy filename (without extension) for parameters of ascii files
+    if (GIA == 'ascii'):
+        gia_Ylms['title'] = os.path.basename(os.path.splitext(input_file)[0])
 
     #-- extract rheology from the file name
     if GIA in ('IJ05-R2','ICE6G'):
@@ -484,3 +473,39 @@ def read_GIA_model(input_file, GIA=None, LMAX=60, MMAX=None,
 
     #-- return the harmonics and the parameters
     return gia_Ylms
+
+#-- PURPOSE: parse GIA files with degree, order, clm and slm columns
+def parse_GIA_columns(gia_data, LMAX, SCALE=1.0):
+    """
+    Parses the degree, order and harmonics of GIA files in a single pass
+
+    Arguments
+    ---------
+    gia_data: lines of the GIA file
+    LMAX: maximum degree of spherical harmonics
+
+    Keyword arguments
+    -----------------
+    SCALE: scale factor for geodesy normalization
+
+    Returns
+    -------
+    l: spherical harmonic degree
+    m: spherical harmonic order
+    clm: cosine spherical harmonic coefficients
+    slm: sine spherical harmonic coefficients
+    """
+    #-- compile numerical expression operator
+    rx = re.compile(r'[-+]?(?:(?:\d*\.\d+)|(?:\d+\.?))(?:[Ee][+-]?\d+)?')
+    #-- find numerical instances in each line including exponents,
+    #-- decimal points and negatives (Replacing Double Exponent)
+    lines = [rx.findall(line.replace('D','E')) for line in gia_data]
+    #-- read the first four columns of each line with numerical instances
+    values = np.array([line[:4] for line in lines if line], dtype=np.float64)
+    values = values.reshape(-1,4)
+    #-- truncate to LMAX
+    l1 = values[:,0].astype(np.int64)
+    m1 = values[:,1].astype(np.int64)
+    ii = (l1 <= LMAX) & (m1 <= LMAX)
+    #-- scaling to geodesy normalization
+    return (l1[ii],m1[ii],values[ii,2]*SCALE,values[ii,3]*SCALE)
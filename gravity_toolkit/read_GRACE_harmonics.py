@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 read_GRACE_harmonics.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads GRACE files and extracts spherical harmonic data and drift rates (RL04)
 Adds drift rates to clm and slm for release 4 harmonics
@@ -31,6 +31,7 @@ PYTHON DEPENDENCIES:
     PyYAML: YAML parser and emitter for Python (https://github.com/yaml/pyyaml)
 
 UPDATE HISTORY:
+    Updated 08/2020: find header boundary once and convert data records in bulk
     Updated 07/2020: added function docstrings
     Updated 08/2019: specify yaml loader (PyYAML yaml.load(input) Deprecation)
     Updated 07/2019: replace colons in yaml header if within quotations
@@ -153,10 +154,15 @@ def read_GRACE_harmonics(input_file, LMAX, MMAX=None, POLE_TIDE=False):
         with open(os.path.expanduser(input_file),'r') as f:
             file_contents = f.read().splitlines()
 
+    #-- find the boundary between the file header and the data records
+    #-- (first line starting with the data marker or the drift rate flag)
+    nhead = next((i for i,l in enumerate(file_contents)
+        if l.startswith((FLAG,'GRDOTA'))), len(file_contents))
+
     #-- extract GRACE and GRACE-FO file headers
     #-- replace colons in header if within quotations
-    head = [re.sub(r'\"(.*?)\:\s(.*?)\"',r'"\1, \2"',l) for l in file_contents
-        if not re.match('{0}|GRDOTA'.format(FLAG),l)]
+    head = [re.sub(r'\"(.*?)\:\s(.*?)\"',r'"\1, \2"',l)
+        for l in file_contents[:nhead]]
     if ((N == 'GRAC') and (DREL >= 6)) or (N == 'GRFO'):
         #-- parse the YAML header for RL06 or GRACE-FO (specifying yaml loader)
         grace_L2_input.update(yaml.load('\n'.join(head),Loader=yaml.BaseLoader))
@@ -164,30 +170,33 @@ def read_GRACE_harmonics(input_file, LMAX, MMAX=None, POLE_TIDE=False):
         #-- save lines of the GRACE file header removing empty lines
         grace_L2_input['header'] = [l.rstrip() for l in head if l]
 
-    #-- for each line in the GRACE/GRACE-FO file
-    for line in file_contents:
-        #-- find if line starts with data marker flag (e.g. GRCOF2)
-        if bool(re.match(FLAG,line)):
-            #-- split the line into individual components
-            line_contents = line.split()
-            #-- degree and order for the line
-            l1 = np.int(line_contents[1])
-            m1 = np.int(line_contents[2])
-            #-- if degree and order are below the truncation limits
-            if ((l1 <= LMAX) and (m1 <= MMAX)):
-                grace_L2_input['clm'][l1,m1] = np.float(line_contents[3])
-                grace_L2_input['slm'][l1,m1] = np.float(line_contents[4])
-                grace_L2_input['eclm'][l1,m1] = np.float(line_contents[5])
-                grace_L2_input['eslm'][l1,m1] = np.float(line_contents[6])
-        #-- find if line starts with drift rate flag
-        elif bool(re.match('GRDOTA',line)):
-            #-- split the line into individual components
-            line_contents = line.split()
-            l1 = np.int(line_contents[1])
-            m1 = np.int(line_contents[2])
-            #-- Reading Drift rates for low degree harmonics
-            drift_c[l1,m1] = np.float(line_contents[3])
-            drift_s[l1,m1] = np.float(line_contents[4])
+    #-- extract all data records marked with the data flag (e.g. GRCOF2)
+    #-- columns: degree, order, clm, slm, eclm, eslm
+    records = [l.split()[1:7] for l in file_contents[nhead:]
+        if l.startswith(FLAG)]
+    #-- convert all coefficient records in a single pass
+    coef = np.array(records, dtype=np.float64).reshape(-1,6)
+    l1 = coef[:,0].astype(np.int64)
+    m1 = coef[:,1].astype(np.int64)
+    #-- if degree and order are below the truncation limits
+    valid, = np.nonzero((l1 <= LMAX) & (m1 <= MMAX))
+    #-- scatter coefficients into the spherical harmonic matrices
+    grace_L2_input['clm'][l1[valid],m1[valid]] = coef[valid,2]
+    grace_L2_input['slm'][l1[valid],m1[valid]] = coef[valid,3]
+    grace_L2_input['eclm'][l1[valid],m1[valid]] = coef[valid,4]
+    grace_L2_input['eslm'][l1[valid],m1[valid]] = coef[valid,5]
+
+    #-- extract drift rates for low degree harmonics for RL04
+    if ((DREL == 4) and (DSET == 'GSM')):
+        records = [l.split()[1:5] for l in file_contents[nhead:]
+            if l.startswith('GRDOTA')]
+        #-- convert all drift rate records in a single pass
+        drift = np.array(records, dtype=np.float64).reshape(-1,4)
+        l1 = drift[:,0].astype(np.int64)
+        m1 = drift[:,1].astype(np.int64)
+        valid, = np.nonzero((l1 <= LMAX) & (m1 <= MMAX))
+        drift_c[l1[valid],m1[valid]] = drift[valid,2]
+        drift_s[l1[valid],m1[valid]] = drift[valid,3]
 
     #-- Adding drift rates to clm and slm for RL04
     #-- if drift rates exist at any time, will add to harmonics
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 read_SLR_geocenter.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads monthly geocenter files from satellite laser ranging provided by CSR
     ftp://ftp.csr.utexas.edu/pub/slr/geocenter/
@@ -13,9 +13,12 @@ New CF-CM geocenter dataset to reflect the true degree-1 mass variations
 
 CALLING SEQUENCE:
     geocenter = read_SLR_geocenter(geocenter_file)
+    geocenter = aod_corrected_SLR_geocenter(geocenter_file, DREL)
 
 INPUTS:
     geocenter_file: degree 1 file
+    DREL: GRACE/GRACE-FO data release for AOD1b geocenter files
+        (aod_corrected_SLR_geocenter)
 
 OPTIONS:
     RADIUS: Earth's radius for calculating spherical harmonics from SLR data
@@ -34,7 +37,13 @@ OUTPUTS:
 PYTHON DEPENDENCIES:
     numpy: Scientific Computing Tools For Python (https://numpy.org)
 
+PROGRAM DEPENDENCIES:
+    geocenter.py: converts between spherical harmonics and geocenter variations
+    convert_julian.py: returns the calendar date and time given a Julian date
+
 UPDATE HISTORY:
+    Updated 08/2020: convert geocenter variations and dates without looping
+        read all monthly AOD1b geocenter files for AOD corrections in one pass
     Updated 07/2020: added function docstrings
     Updated 08/2019: add catch to verify input geocenter file exists
     Updated 06/2019: added option RADIUS for setting the Earth's radius
@@ -89,133 +98,233 @@ def read_SLR_geocenter(geocenter_file, RADIUS=None, skiprows=0):
 
     #-- Input degree 1 file and skip header text (if skiprows)
     file_contents = np.loadtxt(os.path.expanduser(geocenter_file),
-        skiprows=skiprows)
-    ndate = np.shape(file_contents)[0]
+        skiprows=skiprows, ndmin=2)
 
     #-- first column of data = date
     date = file_contents[:,0]
-    #-- initializing output data
-    #-- Degree 1 Stokes Coefficients
-    C10 = np.zeros((ndate))
-    C11 = np.zeros((ndate))
-    S11 = np.zeros((ndate))
-    #-- Degree 1 Stokes Coefficient Errors
-    eC10 = np.zeros((ndate))
-    eC11 = np.zeros((ndate))
-    eS11 = np.zeros((ndate))
-    #-- Date information
-    JD = np.zeros((ndate))
-    mon = np.zeros((ndate), dtype=np.int32)
-
-    #-- for each date
-    for t,tdec in enumerate(date):
-        #-- converting from geocenter into spherical harmonics
-        CS1 = geocenter(X=file_contents[t,1], Y=file_contents[t,2],
-            Z=file_contents[t,3], RADIUS=RADIUS, INVERSE=True)
-        dCS1 = geocenter(X=file_contents[t,4], Y=file_contents[t,5],
-            Z=file_contents[t,6], RADIUS=RADIUS, INVERSE=True)
-        #-- output harmonics
-        C10[t],C11[t],S11[t] = (CS1['C10'], CS1['C11'], CS1['S11'])
-        eC10[t],eC11[t],eS11[t] = (dCS1['C10'], dCS1['C11'], dCS1['S11'])
-
-        #-- calendar year of date
-        year = np.floor(tdec)
-        #-- check if year is a leap year
-        if ((year % 4) == 0):
-            #-- Leap Year
-            dpy = 366.0
-        else:
-            #-- Standard Year
-            dpy = 365.0
-        #-- calculation of day of the year (with decimals for fraction of day)
-        DofY = dpy*(tdec % 1)
-        #-- Calculation of the Julian date from year and DofY
-        JD[t] = np.float(367.0*year - \
-            np.floor(7.0*(year + np.floor(10.0/12.0))/4.0) - \
-            np.floor(3.0*(np.floor((year - 8.0/7.0)/100.0) + 1.0)/4.0) + \
-            np.floor(275.0/9.0) + DofY + 1721028.5)
-        #-- convert the julian date into calendar dates (hour, day, month, year)
-        cal_date = convert_julian(JD[t])
-        #-- calculate the GRACE/GRACE-FO month (Apr02 == 004)
-        #-- https://grace.jpl.nasa.gov/data/grace-months/
-        mon[t] = 12*(cal_date['year']-2002) + cal_date['month']
+    #-- converting from geocenter into spherical harmonics
+    CS1 = geocenter(X=file_contents[:,1], Y=file_contents[:,2],
+        Z=file_contents[:,3], RADIUS=RADIUS, INVERSE=True)
+    dCS1 = geocenter(X=file_contents[:,4], Y=file_contents[:,5],
+        Z=file_contents[:,6], RADIUS=RADIUS, INVERSE=True)
+    #-- output harmonics
+    C10,C11,S11 = (CS1['C10'], CS1['C11'], CS1['S11'])
+    eC10,eC11,eS11 = (dCS1['C10'], dCS1['C11'], dCS1['S11'])
+    #-- convert the dates into calendar dates (hour, day, month, year)
+    cal_date = convert_julian(decimal_julian(date), ASTYPE=np.int64)
+    #-- calculate the GRACE/GRACE-FO month (Apr02 == 004)
+    #-- https://grace.jpl.nasa.gov/data/grace-months/
+    mon = 12*(cal_date['year']-2002) + cal_date['month']
 
     return {'C10':C10, 'C11':C11, 'S11':S11, 'eC10':eC10, 'eC11':eC11,
         'eS11':eS11, 'month':mon, 'time':date}
 
+#-- PURPOSE: calculate the Julian dates of year-decimal SLR dates
+def decimal_julian(date):
+    """
+    Calculates the Julian dates of year-decimal dates
+
+    Arguments
+    ---------
+    date: date in year-decimal
+
+    Returns
+    -------
+    JD: Julian Day of each date
+    """
+    #-- calendar year of date
+    year = np.floor(date)
+    #-- check if year is a leap year
+    dpy = np.where((year % 4) == 0, 366.0, 365.0)
+    #-- calculation of day of the year (with decimals for fraction of day)
+    DofY = dpy*(date % 1)
+    #-- Calculation of the Julian date from year and DofY
+    return np.array(367.0*year - \
+        np.floor(7.0*(year + np.floor(10.0/12.0))/4.0) - \
+        np.floor(3.0*(np.floor((year - 8.0/7.0)/100.0) + 1.0)/4.0) + \
+        np.floor(275.0/9.0) + DofY + 1721028.5, dtype=np.float64)
+
 #-- special function for outputting AOD corrected SLR geocenter values
 #-- need to run aod1b_geocenter.py to calculate the monthly geocenter dealiasing
 def aod_corrected_SLR_geocenter(geocenter_file, DREL, RADIUS=None, skiprows=0):
+    """
+    Reads monthly geocenter files from satellite laser ranging and
+    removes the monthly mean of the AOD1b geocenter
+
+    Arguments
+    ---------
+    geocenter_file: Satellite Laser Ranging file
+    DREL: GRACE/GRACE-FO data release for AOD1b geocenter files
+
+    Keyword arguments
+    -----------------
+    RADIUS: Earth's radius for calculating spherical harmonics from SLR data
+    skiprows: rows of data to skip when importing data
+
+    Returns
+    -------
+    C10: cosine d1/o0 spherical harmonic coefficients
+    C11: cosine d1/o1 spherical harmonic coefficients
+    S11: sine d1/o1 spherical harmonic coefficients
+    eC10: cosine d1/o0 spherical harmonic coefficient error
+    eC11: cosine d1/o1 spherical harmonic coefficient error
+    eS11: sine d1/o1 spherical harmonic coefficient error
+    month: GRACE/GRACE-FO month
+    time: date of each month in year-decimal
+    """
     #-- directory setup for AOD1b data starting with input degree 1 file
     #-- this will verify that the input paths work
-    AOD1B_dir = os.path.abspath(os.path.join(geocenter_file,os.path.pardir,
-        os.path.pardir,'AOD1B',DREL,'geocenter'))
+    AOD1B_dir = aod1b_geocenter_directory(geocenter_file, DREL)
 
     #-- Input degree 1 file and skip header text (if skiprows)
     file_contents = np.loadtxt(os.path.expanduser(geocenter_file),
-        skiprows=skiprows)
-    ndate = np.shape(file_contents)[0]
+        skiprows=skiprows, ndmin=2)
 
     #-- first column of data = date
     date = file_contents[:,0]
-    #-- initializing output data
-    #-- Degree 1 Stokes Coefficients
-    C10 = np.zeros((ndate))
-    C11 = np.zeros((ndate))
-    S11 = np.zeros((ndate))
-    #-- Degree 1 Stokes Coefficient Errors
-    eC10 = np.zeros((ndate))
-    eC11 = np.zeros((ndate))
-    eS11 = np.zeros((ndate))
-    #-- Date information
-    JD = np.zeros((ndate))
-    mon = np.zeros((ndate), dtype=np.int32)
-
-    #-- for each date
-    for t,tdec in enumerate(date):
-        #-- converting from geocenter into spherical harmonics
-        CS1 = geocenter(X=file_contents[t,1], Y=file_contents[t,2],
-            Z=file_contents[t,3], RADIUS=RADIUS, INVERSE=True)
-        dCS1 = geocenter(X=file_contents[t,4], Y=file_contents[t,5],
-            Z=file_contents[t,6], RADIUS=RADIUS, INVERSE=True)
-
-        #-- calendar year of date
-        year = np.floor(tdec)
-        #-- check if year is a leap year
-        if ((year % 4) == 0):
-            #-- Leap Year
-            dpy = 366.0
-        else:
-            #-- Standard Year
-            dpy = 365.0
-        #-- calculation of day of the year (with decimals for fraction of day)
-        DofY = dpy*(tdec % 1)
-        #-- Calculation of the Julian date from year and DofY
-        JD[t] =np.float(367.*year - np.floor(7.*(year + np.floor(10./12.))/4.) -
-            np.floor(3.0*(np.floor((year - 8.0/7.0)/100.0) + 1.0)/4.0) +
-            np.floor(275.0/9.0) + DofY + 1721028.5)
-        #-- convert the julian date into calendar dates (hour, day, month, year)
-        cal_date = convert_julian(JD[t], ASTYPE=np.int)
-        #-- full path to AOD geocenter for month (using glo coefficients)
-        args = (DREL, 'glo', cal_date['year'], cal_date['month'])
-        AOD1B_file = 'AOD1B_{0}_{1}_{2:4d}_{3:02d}.txt'.format(*args)
-        Ylms = read_AOD1b_geocenter(os.path.join(AOD1B_dir,AOD1B_file),
-            cal_date['month'])
-        #-- remove AOD from output harmonics
-        C10[t] = CS1['C10'] - Ylms['C10']
-        C11[t] = CS1['C11'] - Ylms['C11']
-        S11[t] = CS1['S11'] - Ylms['S11']
-        eC10[t],eC11[t],eS11[t] = (dCS1['C10'], dCS1['C11'], dCS1['S11'])
-        #-- calculate the GRACE/GRACE-FO month (Apr02 == 004)
-        #-- https://grace.jpl.nasa.gov/data/grace-months/
-        mon[t] = 12*(cal_date['year']-2002) + cal_date['month']
+    #-- converting from geocenter into spherical harmonics
+    CS1 = geocenter(X=file_contents[:,1], Y=file_contents[:,2],
+        Z=file_contents[:,3], RADIUS=RADIUS, INVERSE=True)
+    dCS1 = geocenter(X=file_contents[:,4], Y=file_contents[:,5],
+        Z=file_contents[:,6], RADIUS=RADIUS, INVERSE=True)
+    #-- convert the dates into calendar dates (hour, day, month, year)
+    cal_date = convert_julian(decimal_julian(date), ASTYPE=np.int64)
+
+    #-- read the monthly AOD1b geocenter files in a single pass
+    #-- and find the AOD1b geocenter for each calendar month
+    Ylms = read_AOD1b_geocenter_files(aod1b_geocenter_files(AOD1B_dir,DREL))
+    AOD1B_index = {(y,m):i for i,(y,m) in enumerate(zip(Ylms['year'],
+        Ylms['month']))}
+    indices = np.zeros_like(date, dtype=np.int64)
+    for t,(y,m) in enumerate(zip(cal_date['year'],cal_date['month'])):
+        try:
+            indices[t] = AOD1B_index[(y,m)]
+        except KeyError:
+            #-- full path to AOD geocenter for month (using glo coefficients)
+            AOD1B_file = 'AOD1B_{0}_glo_{1:4d}_{2:02d}.txt'.format(DREL,y,m)
+            raise IOError('AOD1b File {0} not in File System'.format(
+                os.path.join(AOD1B_dir,AOD1B_file)))
+    #-- remove AOD from output harmonics
+    C10 = CS1['C10'] - Ylms['C10'][indices]
+    C11 = CS1['C11'] - Ylms['C11'][indices]
+    S11 = CS1['S11'] - Ylms['S11'][indices]
+    eC10,eC11,eS11 = (dCS1['C10'], dCS1['C11'], dCS1['S11'])
+    #-- calculate the GRACE/GRACE-FO month (Apr02 == 004)
+    #-- https://grace.jpl.nasa.gov/data/grace-months/
+    mon = 12*(cal_date['year']-2002) + cal_date['month']
 
     return {'C10':C10, 'C11':C11, 'S11':S11, 'eC10':eC10, 'eC11':eC11,
         'eS11':eS11, 'month':mon, 'time':date}
 
+#-- PURPOSE: directory of AOD1b geocenter files for a SLR geocenter file
+def aod1b_geocenter_directory(geocenter_file, DREL):
+    """
+    Finds the directory of monthly AOD1b geocenter files relative to
+    an input Satellite Laser Ranging geocenter file
+
+    Arguments
+    ---------
+    geocenter_file: Satellite Laser Ranging file
+    DREL: GRACE/GRACE-FO data release for AOD1b geocenter files
+
+    Returns
+    -------
+    AOD1B_dir: directory of AOD1b geocenter files
+    """
+    return os.path.abspath(os.path.join(os.path.expanduser(geocenter_file),
+        os.path.pardir,os.path.pardir,'AOD1B',DREL,'geocenter'))
+
+#-- PURPOSE: find the monthly AOD1b geocenter files within a directory
+def aod1b_geocenter_files(AOD1B_dir, DREL):
+    """
+    Finds the monthly AOD1b geocenter files (glo coefficients)
+
+    Arguments
+    ---------
+    AOD1B_dir: directory of AOD1b geocenter files
+    DREL: GRACE/GRACE-FO data release for AOD1b geocenter files
+
+    Returns
+    -------
+    sorted list of AOD1b geocenter files
+    """
+    #-- return an empty list if the directory does not exist
+    if not os.access(AOD1B_dir, os.F_OK):
+        return []
+    rx = re.compile(r'AOD1B_{0}_glo_(\d{{4}})_(\d{{2}}).txt$'.format(DREL))
+    return [os.path.join(AOD1B_dir,f) for f in sorted(os.listdir(AOD1B_dir))
+        if rx.match(f)]
+
+#-- PURPOSE: read a set of monthly AOD1b geocenter files in a single pass
+#-- and calculate the mean harmonics for each month
+#-- need to run aod1b_geocenter.py to write these monthly geocenter files
+def read_AOD1b_geocenter_files(AOD1B_files):
+    """
+    Reads monthly AOD1b geocenter files and calculates the mean harmonics
+
+    Arguments
+    ---------
+    AOD1B_files: list of monthly AOD1b geocenter files
+
+    Returns
+    -------
+    C10: mean cosine d1/o0 spherical harmonic coefficients
+    C11: mean cosine d1/o1 spherical harmonic coefficients
+    S11: mean sine d1/o1 spherical harmonic coefficients
+    year: calendar year of each file
+    month: calendar month of each file
+    """
+    #-- calendar year and month of each file from the file names
+    rx = re.compile(r'AOD1B_(.*?)_glo_(\d{4})_(\d{2}).txt$')
+    n_files = len(AOD1B_files)
+    year = np.zeros((n_files), dtype=np.int64)
+    month = np.zeros((n_files), dtype=np.int64)
+    #-- first column: ISO-formatted date and time
+    #-- second-fourth columns: X, Y and Z geocenter variations
+    #-- commented header text does not start with a date and won't be read
+    rx_line = re.compile(r'^\d{4}-(\d{2})-\S+\s+(\S+)\s+(\S+)\s+(\S+)',
+        re.MULTILINE)
+    file_contents = []
+    file_index = []
+    for i,AOD1B_file in enumerate(AOD1B_files):
+        Y,M = rx.search(os.path.basename(AOD1B_file)).groups()[1:]
+        year[i],month[i] = (np.int64(Y),np.int64(M))
+        with open(AOD1B_file, 'r') as f:
+            lines = rx_line.findall(f.read())
+        file_contents.extend(lines)
+        file_index.extend([i]*len(lines))
+    #-- extract month and X,Y,Z from all lines of all files
+    file_contents = np.array(file_contents, dtype=np.float64).reshape(-1,4)
+    file_index = np.array(file_index, dtype=np.int64)
+    #-- use only dates within month (should be all)
+    ii, = np.nonzero(file_contents[:,0] == month[file_index])
+    #-- calculate the mean X,Y,Z for each month
+    count = np.bincount(file_index[ii], minlength=n_files)
+    X,Y,Z = [np.bincount(file_index[ii], weights=file_contents[ii,c],
+        minlength=n_files)/count for c in (1,2,3)]
+    #-- convert mean X,Y,Z into spherical harmonics
+    Ylms = geocenter(X=X, Y=Y, Z=Z, INVERSE=True)
+    Ylms['year'] = year
+    Ylms['month'] = month
+    return Ylms
+
 #-- PURPOSE: read AOD1b geocenter for month and calculate the mean harmonics
 #-- need to run aod1b_geocenter.py to write these monthly geocenter files
 def read_AOD1b_geocenter(AOD1B_file, calendar_month):
+    """
+    Reads a monthly AOD1b geocenter file and calculates the mean harmonics
+
+    Arguments
+    ---------
+    AOD1B_file: monthly AOD1b geocenter file
+    calendar_month: calendar month of the AOD1b geocenter file
+
+    Returns
+    -------
+    C10: mean cosine d1/o0 spherical harmonic coefficients
+    C11: mean cosine d1/o1 spherical harmonic coefficients
+    S11: mean sine d1/o1 spherical harmonic coefficients
+    """
     #-- check that file exists
     if not os.access(AOD1B_file, os.F_OK):
         raise IOError('AOD1b File {0} not in File System'.format(AOD1B_file))
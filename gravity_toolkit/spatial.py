@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 spatial.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Data class for reading, writing and processing spatial data
 
@@ -19,6 +19,18 @@ PROGRAM DEPENDENCIES:
     hdf5_read.py: reads spatial data from HDF5
 
 UPDATE HISTORY:
+    Updated 08/2020: read windows of lat, lon and time from netCDF4 and HDF5
+        read and write GRACE/GRACE-FO months with the times if available
+        fix latitude output when reading from HDF5 files
+        lazily read data from netCDF4 and HDF5 variables with hyperslabs
+            read for index and subset and chunked means and summations
+        only subset filenames if merged from a list of files
+        read files from an index in parallel into preallocated arrays
+        vectorized ascii parser reading all values in one pass
+        preserve the data type of spatial fields (e.g. float32)
+        unpack HDF5 data packed with a scale factor and offset in memory
+        unpack netCDF4 data in memory and close files of lazily-loaded data
+        read lazily-loaded data into memory before modifying or copying
     Updated 07/2020: added class docstring and using kwargs for output to file
         added case_insensitive_filename function to search directories
     Updated 06/2020: added zeros_like() for creating an empty spatial object
@@ -26,6 +38,9 @@ UPDATE HISTORY:
 """
 import os
 import re
+import functools
+import multiprocessing
+import multiprocessing.pool
 import numpy as np
 from gravity_toolkit.ncdf_write import ncdf_write
 from gravity_toolkit.hdf5_write import hdf5_write
@@ -50,6 +65,7 @@ class spatial(object):
         self.shape=[nlat,nlon,None]
         self.ndim=None
         self.filename=None
+        self.lazy=False
 
     def case_insensitive_filename(self,filename):
         """
@@ -77,37 +93,39 @@ class spatial(object):
         #-- set filename
         self.case_insensitive_filename(filename)
         print(self.filename) if verbose else None
-        #-- read input ascii file (.txt) and split lines
+        #-- read input ascii file (.txt) and convert fortran exponentials
         with open(self.filename,'r') as f:
-            file_contents = f.read().splitlines()
+            file_contents = f.read().translate(str.maketrans('Dd','Ee'))
         #-- compile regular expression operator for extracting numerical values
         #-- from input ascii files of spatial data
-        regex_pattern = '[-+]?(?:(?:\d*\.\d+)|(?:\d+\.?))(?:[EeD][+-]?\d+)?'
+        regex_pattern = r'[-+]?(?:(?:\d*\.\d+)|(?:\d+\.?))(?:[EeD][+-]?\d+)?'
         rx = re.compile(regex_pattern, re.VERBOSE)
+        #-- number of columns in the ascii file from the first line
+        ncols = len(rx.findall(file_contents.lstrip().split('\n',1)[0]))
+        #-- convert all numerical values within the file in a single pass
+        file_values = np.array(rx.findall(file_contents), dtype=np.float64)
+        file_values = file_values.reshape(-1,ncols)
+        #-- remove time from list of column names if not date
+        columns = [c for c in columns if date or (c != 'time')]
+        #-- extract columns of interest and assign to dict
+        d = {c:file_values[:,i] for i,c in enumerate(columns[:ncols])}
         #-- output spatial data
         self.lat = np.zeros((self.shape[0]))
         self.lon = np.zeros((self.shape[1]))
         self.data = np.zeros((self.shape[0],self.shape[1]))
-        self.mask = np.zeros((self.shape[0],self.shape[1]),dtype=np.bool)
-        #-- remove time from list of column names if not date
-        columns = [c for c in columns if (c != 'time')]
+        self.mask = np.zeros((self.shape[0],self.shape[1]),dtype=bool)
+        #-- convert coordinates to grid indices
+        ilon = (d['lon']/self.spacing[0]).astype(np.int64)
+        ilat = ((90.0-d['lat'])//self.spacing[1]).astype(np.int64)
         #-- extract spatial data array and convert to matrix
-        #-- for each line in the file
-        for line in file_contents:
-            #-- extract columns of interest and assign to dict
-            d = {c:r for c,r in zip(columns,rx.findall(line))}
-            #-- convert line coordinates to integers
-            ilon = np.int(np.float(d['lon'])/self.spacing[0])
-            ilat = np.int((90.0-np.float(d['lat']))//self.spacing[1])
-            #-- convert fortran exponentials if applicable
-            self.data[ilat,ilon] = np.float(d['data'].replace('D','E'))
-            self.mask[ilat,ilon] = False
-            self.lon[ilon] = np.float(d['lon'])
-            self.lat[ilat] = np.float(d['lat'])
-            #-- if the ascii file contains date variables
-            if date:
-                self.time = np.array(d['time'],dtype='f')
-                self.month = np.array(12.0*(self.time-2002.0)+1,dtype='i')
+        self.data[ilat,ilon] = d['data']
+        self.mask[ilat,ilon] = False
+        self.lon[ilon] = d['lon']
+        self.lat[ilat] = d['lat']
+        #-- if the ascii file contains date variables
+        if date:
+            self.time = np.array(d['time'][-1],dtype='f')
+            self.month = np.array(12.0*(self.time-2002.0)+1,dtype='i')
         #-- get spacing and dimensions
         self.update_spacing()
         self.update_extents()
@@ -116,26 +134,41 @@ class spatial(object):
         return self
 
     def from_netCDF4(self, filename, date=True, verbose=False,
-        varname='z', lonname='lon', latname='lat'):
+        varname='z', lonname='lon', latname='lat', indices=None, lazy=False):
         """
         Read a spatial object from a netCDF4 file
         Inputs: full path of input netCDF4 file
-        Options: netCDF4 file contains date information
+        Options:
+            netCDF4 file contains date information
+            verbose output of file information
+            variable names for the data, longitude and latitude
+            slices of the lat, lon and time dimensions to read
+            lazily read data from the netCDF4 file
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- read data from netCDF4 file
         data = ncdf_read(self.filename, VERBOSE=verbose,
             ATTRIBUTES=False, DATE=date, VARNAME=varname,
-            LONNAME=lonname, LATNAME=latname, TIMENAME='time')
-        self.data = data['data'].copy()
+            LONNAME=lonname, LATNAME=latname, TIMENAME='time',
+            INDICES=indices, LAZY=lazy)
         self.fill_value = data['attributes']['_FillValue']
-        self.mask = np.zeros_like(self.data, dtype=np.bool)
+        #-- data is lazily read from the on-disk variable
+        self.lazy = lazy and not isinstance(data['data'], np.ndarray)
+        if self.lazy:
+            self.data = data['data']
+        else:
+            self.data = data['data'].copy()
+            self.mask = np.zeros_like(self.data, dtype=np.bool)
         self.lon = data['lon'].copy()
         self.lat = data['lat'].copy()
         if date:
             self.time = data['time'].copy()
-            self.month = np.array(12.0*(self.time-2002.0)+1,dtype='i')
+            #-- GRACE/GRACE-FO months if within the file
+            if 'month' in data.keys():
+                self.month = np.array(data['month'],dtype='i')
+            else:
+                self.month = np.array(12.0*(self.time-2002.0)+1,dtype='i')
         #-- get spacing and dimensions
         self.update_spacing()
         self.update_extents()
@@ -144,26 +177,42 @@ class spatial(object):
         return self
 
     def from_HDF5(self, filename, date=True, verbose=False,
-        varname='z', lonname='lon', latname='lat'):
+        varname='z', lonname='lon', latname='lat', indices=None, lazy=False):
         """
         Read a spatial object from a HDF5 file
         Inputs: full path of input HDF5 file
-        Options: HDF5 file contains date information
+        Options:
+            HDF5 file contains date information
+            verbose output of file information
+            variable names for the data, longitude and latitude
+            slices of the lat, lon and time dimensions to read
+            lazily read data from the HDF5 file
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- read data from HDF5 file
         data = hdf5_read(self.filename, VERBOSE=verbose,
             ATTRIBUTES=False, DATE=date, VARNAME=varname,
-            LONNAME=lonname, LATNAME=latname, TIMENAME='time')
-        self.data = data['data'].copy()
+            LONNAME=lonname, LATNAME=latname, TIMENAME='time',
+            INDICES=indices, LAZY=lazy)
         self.fill_value = data['attributes']['_FillValue']
-        self.mask = np.zeros_like(self.data, dtype=np.bool)
+        #-- data is lazily read from the on-disk variable
+        #-- packed data is unpacked in memory
+        self.lazy = lazy and not isinstance(data['data'], np.ndarray)
+        if self.lazy:
+            self.data = data['data']
+        else:
+            self.data = data['data'].copy()
+            self.mask = np.zeros_like(self.data, dtype=np.bool)
         self.lon = data['lon'].copy()
-        self.m = data['lat'].copy()
+        self.lat = data['lat'].copy()
         if date:
             self.time = data['time'].copy()
-            self.month = np.array(12.0*(self.time-2002.0)+1,dtype='i')
+            #-- GRACE/GRACE-FO months if within the file
+            if 'month' in data.keys():
+                self.month = np.array(data['month'],dtype='i')
+            else:
+                self.month = np.array(12.0*(self.time-2002.0)+1,dtype='i')
         #-- get spacing and dimensions
         self.update_spacing()
         self.update_extents()
@@ -171,35 +220,100 @@ class spatial(object):
         self.update_mask()
         return self
 
-    def from_index(self, filename, format=None, date=True, sort=True):
+    def from_index(self, filename, format=None, date=True, sort=True,
+        processes=0, threads=False):
         """
-        Read a spatial object from an index of netCDF4 or HDF5 files
+        Read a spatial object from an index of ascii, netCDF4 or HDF5 files
         Inputs: full path of index file to be read into a spatial object
         Options:
-            format of files in index ( netCDF4 or HDF5)
-            netCDF4, or HDF5 contains date information
+            format of files in index (ascii, netCDF4 or HDF5)
+            ascii, netCDF4, or HDF5 contains date information
             sort spatial objects by date information
+            processes: number of workers for reading files in parallel
+                (0 to read the files sequentially)
+            threads: read files with a pool of threads instead of processes
+                (netCDF4 files are always read with processes)
         """
         #-- set filename
         self.case_insensitive_filename(filename)
         #-- Read index file of input spatial data
         with open(self.filename,'r') as f:
-            file_list = f.read().splitlines()
-        #-- create a list of spatial objects
-        h = []
-        #-- for each file in the index
-        for i,f in enumerate(file_list):
-            if (format == 'ascii'):
-                #-- netcdf (.nc)
-                h.append(spatial().from_ascii(os.path.expanduser(f),date=date))
-            elif (format == 'netCDF4'):
-                #-- netcdf (.nc)
-                h.append(spatial().from_netCDF4(os.path.expanduser(f),date=date))
-            elif (format == 'HDF5'):
-                #-- HDF5 (.H5)
-                h.append(spatial().from_HDF5(os.path.expanduser(f),date=date))
-        #-- create a single spatial object from the list
-        return self.from_list(h,date=date,sort=sort)
+            file_list = [os.path.expanduser(i) for i in f.read().splitlines()]
+        #-- number of files in the index
+        n = len(file_list)
+        if (n == 0):
+            raise ValueError('No files found in index {0}'.format(self.filename))
+        #-- reader for the format of the files in the index
+        #-- ascii (.txt), netcdf (.nc) or HDF5 (.H5)
+        readers = dict(ascii=spatial.from_ascii,
+            netCDF4=spatial.from_netCDF4, HDF5=spatial.from_HDF5)
+        reader = functools.partial(readers[format], date=date)
+        #-- ascii files are read using the grid spacing and dimensions
+        spacing = list(self.spacing)
+        nlat,nlon = self.shape[0:2]
+        #-- pool of workers for reading files in parallel
+        #-- files are read in blocks to bound the number of objects in memory
+        #-- netCDF4 files are read with processes as netCDF-C is not thread-safe
+        threads &= (format != 'netCDF4')
+        pool = None
+        if (processes > 0) and threads:
+            pool = multiprocessing.pool.ThreadPool(processes=processes)
+        elif (processes > 0):
+            pool = multiprocessing.Pool(processes=processes)
+        nblock = 4*processes if (processes > 0) else 1
+        try:
+            #-- for each block of files in the index
+            for b in range(0,n,nblock):
+                args = [(spatial(spacing=spacing,nlat=nlat,nlon=nlon),f)
+                    for f in file_list[b:b+nblock]]
+                if (processes > 0):
+                    h = pool.starmap(reader, args)
+                else:
+                    h = [reader(*a) for a in args]
+                #-- fill the output spatial grid and mask in place
+                for t,grid in enumerate(h, start=b):
+                    #-- allocate for all files using the first file in the index
+                    if (t == 0):
+                        self.spacing = grid.spacing
+                        self.extent = grid.extent
+                        self.shape = grid.shape
+                        self.data = np.zeros((self.shape[0],self.shape[1],n),
+                            dtype=grid.data.dtype)
+                        self.mask = np.zeros((self.shape[0],self.shape[1],n),
+                            dtype=bool)
+                        self.fill_value = grid.fill_value
+                        self.lon = grid.lon.copy()
+                        self.lat = grid.lat.copy()
+                        #-- create list of files
+                        self.filename = []
+                        #-- output dates
+                        if date:
+                            self.time = np.zeros((n))
+                            self.month = np.zeros((n),dtype=np.int64)
+                    self.data[:,:,t] = grid.data[:,:]
+                    self.mask[:,:,t] |= grid.mask[:,:]
+                    if date:
+                        self.time[t] = np.squeeze(grid.time)
+                        self.month[t] = np.squeeze(grid.month)
+                    #-- append filename to list
+                    self.filename.append(grid.filename)
+        finally:
+            #-- close the pool of workers
+            if pool is not None:
+                pool.close()
+                pool.join()
+        #-- sort spatial data by date information
+        if date and sort:
+            isort = np.argsort(self.time)
+            self.data = self.data[:,:,isort]
+            self.mask = self.mask[:,:,isort]
+            self.time = self.time[isort]
+            self.month = self.month[isort]
+            self.filename = [self.filename[i] for i in isort]
+        #-- update the dimensions
+        self.update_dimensions()
+        self.update_mask()
+        return self
 
     def from_list(self, object_list, date=True, sort=True):
         """
@@ -221,7 +335,8 @@ class spatial(object):
         self.extent = object_list[0].extent
         self.shape = object_list[0].shape
         #-- create output spatial grid and mask
-        self.data = np.zeros((self.shape[0],self.shape[1],n))
+        self.data = np.zeros((self.shape[0],self.shape[1],n),
+            dtype=object_list[0].data.dtype)
         self.mask = np.zeros((self.shape[0],self.shape[1],n),dtype=np.bool)
         self.fill_value = object_list[0].fill_value
         self.lon = object_list[0].lon.copy()
@@ -273,6 +388,8 @@ class spatial(object):
         Inputs: full path of output ascii file
         Options: spatial objects contain date information
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         self.filename = os.path.expanduser(filename)
         print(self.filename) if verbose else None
         #-- open the output file
@@ -295,6 +412,8 @@ class spatial(object):
         Options: spatial objects contain date information
         **kwargs: keyword arguments for ncdf_write
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         self.filename = os.path.expanduser(filename)
         KWARGS = {}
         for key,val in kwargs.items():
@@ -303,6 +422,8 @@ class spatial(object):
             KWARGS['TIME_UNITS'] = 'years'
         if 'TIME_LONGNAME' not in KWARGS.keys():
             KWARGS['TIME_LONGNAME'] = 'Date_in_Decimal_Years'
+        if date and ('MONTH' not in KWARGS.keys()):
+            KWARGS['MONTH'] = self.month
         ncdf_write(self.data, self.lon, self.lat, self.time,
             FILENAME=self.filename, DATE=date,
             FILL_VALUE=self.fill_value, **KWARGS)
@@ -314,6 +435,8 @@ class spatial(object):
         Options: spatial objects contain date information
         **kwargs: keyword arguments for hdf5_write
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         self.filename = filename
         KWARGS = {}
         for key,val in kwargs.items():
@@ -322,10 +445,61 @@ class spatial(object):
             KWARGS['TIME_UNITS'] = 'years'
         if 'TIME_LONGNAME' not in KWARGS.keys():
             KWARGS['TIME_LONGNAME'] = 'Date_in_Decimal_Years'
+        if date and ('MONTH' not in KWARGS.keys()):
+            KWARGS['MONTH'] = self.month
         hdf5_write(self.data, self.lon, self.lat, self.time,
             FILENAME=self.filename, DATE=date,
             FILL_VALUE=self.fill_value, **KWARGS)
 
+    def load(self):
+        """
+        Read lazily-loaded data from the on-disk variable into memory
+            and close the file of the on-disk variable
+        """
+        if self.lazy:
+            data = self.data[:].copy()
+            #-- close the file of the on-disk variable
+            self.close()
+            self.data = data
+            self.mask = np.zeros_like(self.data, dtype=np.bool)
+            #-- update mask
+            self.update_mask()
+        return self
+
+    def close(self):
+        """
+        Close the file of lazily-loaded data
+        """
+        if self.lazy:
+            #-- netCDF4 variables or HDF5 datasets
+            if hasattr(self.data, 'group'):
+                self.data.group().close()
+            else:
+                self.data.file.close()
+            self.data = None
+            self.lazy = False
+        return self
+
+    def blocks(self):
+        """
+        Slices of the on-disk variable for reading chunk by chunk
+        Returns: axis of the slices, slices along the axis
+        """
+        #-- chunk shape of netCDF4 variables or HDF5 datasets
+        if hasattr(self.data, 'chunking'):
+            chunks = self.data.chunking()
+        else:
+            chunks = self.data.chunks
+        #-- contiguous variables are read by latitude
+        if not isinstance(chunks, (list,tuple)):
+            chunks = (1,) + tuple(self.shape[1:])
+        #-- read by date if chunks are contiguous in map
+        #-- read by latitude if chunks are contiguous in time
+        axis = 2 if (chunks[2] < self.shape[2]) else 0
+        n = chunks[axis]
+        return (axis,[slice(i,np.min([i+n,self.shape[axis]]))
+            for i in range(0,self.shape[axis],n)])
+
     def update_spacing(self):
         """
         Calculate the step size of spatial object
@@ -357,6 +531,9 @@ class spatial(object):
         """
         Update the mask of the spatial object
         """
+        #-- mask is calculated when reading lazily-loaded data
+        if self.lazy:
+            return self
         self.mask |= (self.data == self.fill_value)
         self.data[self.mask] = self.fill_value
         return self
@@ -365,6 +542,8 @@ class spatial(object):
         """
         Copy a spatial object to a new spatial object
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         temp = spatial(fill_value=self.fill_value)
         #-- assign variables to self
         var = ['lon','lat','data','mask','error','time','month']
@@ -385,6 +564,8 @@ class spatial(object):
         """
         Create a spatial object using the dimensions of another
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         temp = spatial(fill_value=self.fill_value)
         #-- assign variables to self
         temp.lon = self.lon.copy()
@@ -407,6 +588,8 @@ class spatial(object):
         """
         Add a singleton dimension to a spatial object if non-existent
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         #-- change time dimensions to be iterable
         if (np.ndim(self.time) == 0):
             self.time = np.array([self.time])
@@ -426,6 +609,8 @@ class spatial(object):
         """
         Remove singleton dimensions from a spatial object
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         #-- squeeze singleton dimensions
         self.time = np.squeeze(self.time)
         self.month = np.squeeze(self.month)
@@ -448,7 +633,11 @@ class spatial(object):
         temp = spatial(fill_value=self.fill_value)
         #-- subset output spatial field
         temp.data = self.data[:,:,indice].copy()
-        temp.mask = self.mask[:,:,indice].copy()
+        if self.lazy:
+            #-- mask invalid points in the hyperslab
+            temp.mask = (temp.data == self.fill_value)
+        else:
+            temp.mask = self.mask[:,:,indice].copy()
         #-- subset output spatial error
         try:
             temp.error = self.error[:,:,indice].copy()
@@ -462,7 +651,7 @@ class spatial(object):
             temp.time = self.time[indice].copy()
             temp.month = self.month[indice].copy()
         #-- subset filenames
-        if getattr(self, 'filename'):
+        if isinstance(self.filename, list):
             temp.filename = self.filename[indice]
         #-- get spacing and dimensions
         temp.update_spacing()
@@ -488,15 +677,17 @@ class spatial(object):
         #-- indices to sort data objects
         months_list = [i for i,m in enumerate(self.month) if m in months]
         #-- output spatial object
-        temp = spatial(nlon=self.shape[0],nlat=self.shape[1],
+        temp = spatial(nlat=self.shape[0],nlon=self.shape[1],
             fill_value=self.fill_value)
         #-- create output spatial object
-        temp.data = np.zeros((temp.shape[0],temp.shape[1],n))
-        temp.mask = np.zeros((temp.shape[0],temp.shape[1],n))
+        temp.data = np.zeros((temp.shape[0],temp.shape[1],n),
+            dtype=self.data.dtype)
+        temp.mask = np.zeros((temp.shape[0],temp.shape[1],n),dtype=np.bool)
         #-- create output spatial error
         try:
             getattr(self, 'error')
-            temp.error = np.zeros((temp.shape[0],temp.shape[1],n))
+            temp.error = np.zeros((temp.shape[0],temp.shape[1],n),
+                dtype=self.error.dtype)
         except:
             pass
         #-- copy dimensions
@@ -508,7 +699,11 @@ class spatial(object):
         #-- for each indice
         for t,i in enumerate(months_list):
             temp.data[:,:,t] = self.data[:,:,i].copy()
-            temp.mask[:,:,t] = self.mask[:,:,i].copy()
+            if self.lazy:
+                #-- mask invalid points in the hyperslab
+                temp.mask[:,:,t] = (temp.data[:,:,t] == self.fill_value)
+            else:
+                temp.mask[:,:,t] = self.mask[:,:,i].copy()
             try:
                 temp.error[:,:,t] = self.error[:,:,i].copy()
             except:
@@ -517,7 +712,7 @@ class spatial(object):
             temp.time[t] = self.time[i].copy()
             temp.month[t] = self.month[i].copy()
             #-- subset filenmaes
-            if getattr(self, 'filename'):
+            if isinstance(self.filename, list):
                 temp.filename.append(self.filename[i])
         #-- remove singleton dimensions if importing a single value
         return temp.squeeze()
@@ -527,13 +722,16 @@ class spatial(object):
         Multiply a spatial object by a constant
         Inputs: scalar value to which the spatial object will be multiplied
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         temp = self.copy()
         #-- multiply by a single constant or a time-variable scalar
         if (np.ndim(var) == 0):
             temp.data = var*self.data
         elif (np.ndim(var) == 1) and (self.ndim == 2):
             n = len(var)
-            temp.data = np.zeros((temp.shape[0],temp.shape[1],n))
+            temp.data = np.zeros((temp.shape[0],temp.shape[1],n),
+                dtype=self.data.dtype)
             temp.mask = np.zeros((temp.shape[0],temp.shape[1],n),dtype=np.bool)
             for i,v in enumerate(var):
                 temp.data[:,:,i] = v*self.data[:,:]
@@ -561,12 +759,20 @@ class spatial(object):
         temp.lon = self.lon.copy()
         temp.lat = self.lat.copy()
         #-- create output mean spatial object
-        temp.data = np.mean(self.data,axis=2)
-        temp.mask = np.any(self.mask,axis=2)
-        if getattr(self, 'time'):
+        if self.lazy:
+            #-- compute the mean chunk by chunk from the on-disk variable
+            total = self.sum()
+            temp.data = total.data/self.shape[2]
+            temp.mask = total.mask.copy()
+        else:
+            temp.data = np.mean(self.data,axis=2)
+            temp.mask = np.any(self.mask,axis=2)
+        if self.time is not None:
             temp.time = np.mean(self.time)
         #-- calculate the spatial anomalies by removing the mean field
         if apply:
+            #-- read data into memory to remove the mean field
+            self.load()
             for i,t in enumerate(self.time):
                 self.data[:,:,i] -= temp.data[:,:]
         #-- get spacing and dimensions
@@ -589,8 +795,25 @@ class spatial(object):
         temp.lon = self.lon.copy()
         temp.lat = self.lat.copy()
         #-- create output summation spatial object
-        temp.data = np.sum(np.power(self.data,power),axis=2)
-        temp.mask = np.any(self.mask,axis=2)
+        if self.lazy:
+            #-- compute the summation chunk by chunk from the on-disk variable
+            temp.data = np.zeros((self.shape[0],self.shape[1]))
+            temp.mask = np.zeros((self.shape[0],self.shape[1]),dtype=np.bool)
+            axis,blocks = self.blocks()
+            for s in blocks:
+                if (axis == 0):
+                    #-- blocks of latitudes for chunks contiguous in time
+                    d = self.data[s,:,:]
+                    temp.data[s,:] = np.sum(np.power(d,power),axis=2)
+                    temp.mask[s,:] = np.any(d == self.fill_value,axis=2)
+                else:
+                    #-- blocks of dates for chunks contiguous in map
+                    d = self.data[:,:,s]
+                    temp.data += np.sum(np.power(d,power),axis=2)
+                    temp.mask |= np.any(d == self.fill_value,axis=2)
+        else:
+            temp.data = np.sum(np.power(self.data,power),axis=2)
+            temp.mask = np.any(self.mask,axis=2)
         #-- get spacing and dimensions
         temp.update_spacing()
         temp.update_extents()
@@ -604,6 +827,8 @@ class spatial(object):
         Raise a spatial object to a power
         Inputs: power to which the spatial object will be raised
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         temp = self.copy()
         temp.data = np.power(self.data,power)
         #-- assign ndim and shape attributes
@@ -614,6 +839,8 @@ class spatial(object):
         """
         Compute maximum value of spatial field
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         #-- output spatial object
         temp = spatial(nlon=self.shape[0],nlat=self.shape[1],
             fill_value=self.fill_value)
@@ -635,6 +862,8 @@ class spatial(object):
         """
         Compute minimum value of spatial field
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         #-- output spatial object
         temp = spatial(nlon=self.shape[0],nlat=self.shape[1],
             fill_value=self.fill_value)
@@ -656,6 +885,8 @@ class spatial(object):
         """
         Replace the masked values with a new fill_value
         """
+        #-- read lazily-loaded data into memory
+        self.load()
         #-- validate current mask
         self.update_mask()
         #-- update the mask if specified
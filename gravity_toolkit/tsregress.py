@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 tsregress.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Fits a synthetic signal to the data over the time period by least-squares
     or weighted least-squares
@@ -54,6 +54,8 @@ PYTHON DEPENDENCIES:
     scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
 
 UPDATE HISTORY:
+    Updated 08/2020: weighted least-squares using row scaling of the design
+        matrix and a single QR factorization shared with the covariance matrix
     Updated 07/2020: added function docstrings
     Updated 10/2019: changing Y/N flags to True/False
     Updated 12/2018: put transpose of design matrix within FIT_TYPE if statement
@@ -178,20 +180,21 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
         if (np.ndim(DATA_ERR) == 0):
             raise ValueError('Input DATA_ERR for Weighted Least-Squares')
         #-- check if any error values are 0 (prevent infinite weights)
-        if np.count_nonzero(DATA_ERR == 0.0):
-            #-- change to minimum floating point value
-            DATA_ERR[DATA_ERR == 0.0] = np.finfo(np.float).eps
+        #-- change to minimum floating point value
+        DATA_ERR = np.squeeze(DATA_ERR).astype(np.float64)
+        DATA_ERR = np.where(DATA_ERR == 0.0, np.finfo(np.float64).eps, DATA_ERR)
         #--- Weight Precision
-        wi = np.squeeze(DATA_ERR**(-2))
-        #-- If uncorrelated weights are the diagonal
-        W = np.diag(wi)
-        #-- Least-Squares fitting
-        #-- Temporary Matrix: Inv(X'.W.X)
-        TM1 = np.linalg.inv(np.dot(np.transpose(DMAT),np.dot(W,DMAT)))
-        #-- Temporary Matrix: (X'.W.Y)
-        TM2 = np.dot(np.transpose(DMAT),np.dot(W,d_in))
-        #-- Least Squares Solutions: Inv(X'.W.X).(X'.W.Y)
-        beta_mat = np.dot(TM1,TM2)
+        wi = DATA_ERR**(-2)
+        #-- uncorrelated weights: scale rows of design matrix and data
+        #-- by the square root of the weights: sqrt(W).X and sqrt(W).Y
+        WDMAT = DMAT/DATA_ERR[:,None]
+        #-- factor the weighted design matrix: sqrt(W).X = Q.R
+        Q,R = np.linalg.qr(WDMAT)
+        Rinv = np.linalg.inv(R)
+        #-- Covariance Matrix: Inv(X'.W.X) = Inv(R).Inv(R)'
+        Hinv = np.dot(Rinv,np.transpose(Rinv))
+        #-- Least Squares Solutions: Inv(R).Q'.sqrt(W).Y
+        beta_mat = np.dot(Rinv,np.dot(np.transpose(Q),d_in/DATA_ERR))
     else:#-- Standard Least-Squares fitting (the [0] denotes coefficients output)
         beta_mat = np.linalg.lstsq(DMAT,d_in,rcond=-1)[0]
         #-- Weights are equal
@@ -245,14 +248,10 @@ def tsregress(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
     #--- Error Analysis
     if WEIGHT:
         #-- WEIGHTED LEAST-SQUARES CASE (unequal error)
-        #-- Covariance Matrix
-        Hinv = np.linalg.inv(np.dot(np.transpose(DMAT),np.dot(W,DMAT)))
-        #-- Normal Equations
-        NORMEQ = np.dot(Hinv,np.transpose(np.dot(W,DMAT)))
-        beta_err = np.zeros((n_terms))
-        #-- Propagating RMS errors
-        for i in range(0,n_terms):
-            beta_err[i] = np.sqrt(np.sum((NORMEQ[i,:]*DATA_ERR)**2))
+        #-- Propagating RMS errors through the Normal Equations
+        #-- Inv(X'.W.X).X'.W.diag(DATA_ERR) = Inv(R).Q'
+        #-- sum of squares of each row is the diagonal of the covariance
+        beta_err = np.sqrt(np.diag(Hinv))
         #-- Weighted sum of squares Error
         WSSE = np.dot(np.transpose(wi*(d_in[0:nmax] - np.dot(DMAT,beta_mat))),
             wi*(d_in[0:nmax] - np.dot(DMAT,beta_mat)))/np.float(nu)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+u"""
+tsregress_batch.py
+Written by Tyler Sutterley (08/2020)
+
+Fits a synthetic signal to a batch of time series sharing the same dates
+    by least-squares or weighted least-squares
+Default fits constant, trend, annual sin and cos, semi-annual sin and cos
+The design matrix is factored once and all series are solved simultaneously
+Series with missing data are grouped by their pattern of missing data with
+    each group solved using a single shared factorization
+Fit significance derivations are based on Burnham and Anderson (2002)
+    Model Selection and Multimodel Inference
+
+CALLING SEQUENCE:
+    tsbeta = tsregress_batch(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], CONF=0.95)
+
+INPUTS:
+    t_in: input time array (nt)
+    d_in: input data array (npts,nt)
+
+OUTPUTS:
+    beta: regressed coefficients array (npts,N)
+    error: regression fit error for each coefficient for an input deviation
+        STDEV: standard deviation of output error
+        CONF: confidence interval of output error
+    std_err: standard error for each coefficient
+    R2: coefficient of determination (r**2).
+        Proportion of variability accounted by the model
+    R2Adj: adjusted r**2. adjusts the r**2 for the number of terms in the model
+    MSE: mean square error
+    WSSE: Weighted sum of squares error
+    NRMSE: normalized root mean square error
+    AIC: Akaike information criterion (Second-Order, AICc)
+    BIC: Bayesian information criterion (Schwarz criterion)
+    model: modeled timeseries (npts,nt)
+    simple: modeled timeseries without oscillating components
+    residual: model residual
+    DOF: degrees of freedom
+    N: number of terms used in fit
+    cov_mat: covariance matrix (shared for all series)
+    mask: series without a valid fit
+    if any data is missing: DOF (npts) and cov_mat (npts,N,N) for each series
+
+OPTIONS:
+    DATA_ERR: data precision (shared for all series)
+        single value if equal
+        array (nt) if unequal for weighted least squares
+    WEIGHT: Set if measurement errors for use in weighted least squares
+    MASK: mask of invalid data points (npts,nt)
+    RELATIVE: relative period
+    ORDER: maximum polynomial order in fit (0=constant, 1=linear, 2=quadratic)
+    CYCLES: list of cyclical terms (0.5=semi-annual, 1=annual)
+    STDEV: standard deviation of output error
+    CONF: confidence interval of output error
+    AICc: use second order AIC
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
+
+UPDATE HISTORY:
+    Updated 08/2020: added weighted least-squares for shared measurement errors
+    Updated 08/2020: group series with missing data by pattern of missing data
+        skip series that are entirely invalid.  added MASK option
+    Written 08/2020
+"""
+import numpy as np
+import scipy.stats
+import scipy.special
+
+def tsregress_batch(t_in, d_in, ORDER=1, CYCLES=[0.5,1.0], DATA_ERR=0,
+    WEIGHT=False, RELATIVE=-1, STDEV=0, CONF=0, AICc=True, MASK=None):
+    """
+    Fits a synthetic signal to a batch of time series sharing the same
+        dates by least-squares
+
+    Arguments
+    ---------
+    t_in: input time array (nt)
+    d_in: input data array (npts,nt)
+
+    Keyword arguments
+    -----------------
+    DATA_ERR: data precision (shared for all series)
+        single value if equal
+        array (nt) if unequal for weighted least squares
+    WEIGHT: Set if measurement errors for use in weighted least squares
+    RELATIVE: relative period
+    ORDER: maximum polynomial order in fit
+    CYCLES: list of cyclical terms
+    STDEV: standard deviation of output error
+    CONF: confidence interval of output error
+    AICc: use second order AIC
+    MASK: mask of invalid data points (npts,nt)
+
+    Returns
+    -------
+    beta: regressed coefficients array (npts,N)
+    error: regression fit error for each coefficient for an input deviation
+        STDEV: standard deviation of output error
+        CONF: confidence interval of output error
+    std_err: standard error for each coefficient
+    R2: coefficient of determination (r**2)
+    R2Adj: r**2 adjusted for the number of terms in the model
+    MSE: mean square error
+    WSSE: Weighted sum of squares error
+    NRMSE: normalized root mean square error
+    AIC: Akaike information criterion
+    BIC: Bayesian information criterion
+    model: modeled timeseries (npts,nt)
+    simple: modeled timeseries without oscillating components
+    residual: model residual
+    DOF: degrees of freedom
+    N: number of terms used in fit
+    cov_mat: covariance matrix (shared for all series)
+    mask: series without a valid fit
+    """
+
+    #-- remove singleton time dimensions and verify data is 2-dimensional
+    t_in = np.squeeze(t_in)
+    #-- find invalid data points (masked or non-finite values)
+    if np.ma.isMaskedArray(d_in):
+        invalid = np.atleast_2d(np.ma.getmaskarray(d_in))
+        d_in = np.atleast_2d(d_in.data)
+    else:
+        d_in = np.atleast_2d(d_in)
+        invalid = np.zeros(d_in.shape, dtype=bool)
+    invalid = invalid | np.logical_not(np.isfinite(d_in))
+    if MASK is not None:
+        invalid = invalid | np.broadcast_to(MASK, d_in.shape)
+    nmax = len(t_in)
+    t_rel = t_in[0:nmax].mean() if (RELATIVE == -1) else RELATIVE
+
+    #-- create design matrix based on polynomial order and harmonics
+    DMAT = []
+    #-- add polynomial orders (0=constant, 1=linear, 2=quadratic)
+    for o in range(ORDER+1):
+        DMAT.append((t_in-t_rel)**o)
+    #-- add cyclical terms (0.5=semi-annual, 1=annual)
+    for c in CYCLES:
+        DMAT.append(np.sin(2.0*np.pi*t_in/np.float64(c)))
+        DMAT.append(np.cos(2.0*np.pi*t_in/np.float64(c)))
+    #-- take the transpose of the design matrix
+    DMAT = np.transpose(DMAT)
+    #-- number of terms in least-squares solution
+    n_terms = DMAT.shape[1]
+    #-- check weighted least-squares errors
+    if WEIGHT:
+        if (np.ndim(DATA_ERR) == 0):
+            raise ValueError('Input DATA_ERR for Weighted Least-Squares')
+        #-- check if any error values are 0 (prevent infinite weights)
+        #-- change to minimum floating point value
+        DATA_ERR = np.squeeze(DATA_ERR).astype(np.float64)
+        DATA_ERR = np.where(DATA_ERR == 0.0, np.finfo(np.float64).eps, DATA_ERR)
+
+    #-- fit series with missing data in groups of matching missing data
+    if np.any(invalid):
+        npts = d_in.shape[0]
+        #-- allocate for output variables (invalid fits are NaN)
+        tsbeta = {}
+        for key in ('R2','R2Adj','MSE','WSSE','NRMSE','AIC','BIC','LOGLIK'):
+            tsbeta[key] = np.full((npts), np.nan)
+        for key in ('beta','error','std_err'):
+            tsbeta[key] = np.full((npts,n_terms), np.nan)
+        for key in ('model','residual','simple','season'):
+            tsbeta[key] = np.full((npts,nmax), np.nan)
+        tsbeta['cov_mat'] = np.full((npts,n_terms,n_terms), np.nan)
+        tsbeta['DOF'] = np.zeros((npts), dtype=np.int64)
+        tsbeta['N'] = n_terms
+        tsbeta['mask'] = np.ones((npts), dtype=bool)
+        #-- skip series that are entirely invalid
+        valid_series, = np.nonzero(np.logical_not(np.all(invalid,axis=1)))
+        #-- group series by their pattern of missing data
+        pattern = np.packbits(invalid[valid_series,:], axis=1)
+        _,group = np.unique(pattern, axis=0, return_inverse=True)
+        group = np.reshape(group, (-1))
+        for g in np.unique(group):
+            #-- indices of series and valid dates within group
+            idx = valid_series[group == g]
+            valid, = np.nonzero(np.logical_not(invalid[idx[0],:]))
+            #-- skip groups without enough valid dates for a fit
+            if (len(valid) <= n_terms):
+                continue
+            #-- fit all series in group with a shared factorization
+            ERR = DATA_ERR[valid] if WEIGHT else DATA_ERR
+            fit = tsregress_batch(t_in[valid], d_in[idx,:][:,valid],
+                ORDER=ORDER, CYCLES=CYCLES, DATA_ERR=ERR, WEIGHT=WEIGHT,
+                RELATIVE=t_rel, STDEV=STDEV, CONF=CONF, AICc=AICc)
+            for key in ('beta','error','std_err','R2','R2Adj','MSE','WSSE',
+                'NRMSE','AIC','BIC','LOGLIK','cov_mat','DOF'):
+                if key in fit.keys():
+                    tsbeta[key][idx,...] = fit[key]
+            tsbeta['mask'][idx] = False
+            #-- modelled time-series for all dates
+            tsbeta['model'][idx,:] = np.dot(fit['beta'], np.transpose(DMAT))
+            tsbeta['simple'][idx,:] = np.dot(fit['beta'][:,0:(ORDER+1)],
+                np.transpose(DMAT[:,0:(ORDER+1)]))
+            tsbeta['season'][idx,:] = tsbeta['model'][idx,:] - \
+                tsbeta['simple'][idx,:]
+            #-- residual for valid dates
+            tsbeta['residual'][idx[:,None],valid[None,:]] = fit['residual']
+        #-- remove keys that are not output for case
+        if WEIGHT:
+            for key in ('std_err','MSE','NRMSE'):
+                tsbeta.pop(key)
+        elif (DATA_ERR != 0):
+            for key in ('std_err','WSSE','NRMSE'):
+                tsbeta.pop(key)
+        else:
+            tsbeta.pop('WSSE')
+        return tsbeta
+
+    if WEIGHT:
+        #--- Weight Precision
+        wi = DATA_ERR**(-2)
+        #-- uncorrelated weights: scale rows of design matrix and data
+        #-- by the square root of the weights: sqrt(W).X and sqrt(W).Y
+        #-- factor the shared weighted design matrix once: sqrt(W).X = Q.R
+        Q,R = np.linalg.qr(DMAT/DATA_ERR[:,None])
+        Rinv = np.linalg.inv(R)
+        #-- Least-Squares Solutions for all series: Inv(R).Q'.sqrt(W).Y
+        beta_mat = np.dot(d_in/DATA_ERR[None,:], np.dot(Q, np.transpose(Rinv)))
+    else:
+        #-- Weights are equal
+        wi = np.ones((nmax))
+        #-- factor the shared design matrix once: X = Q.R
+        Q,R = np.linalg.qr(DMAT)
+        #-- inverse of the upper triangular matrix
+        Rinv = np.linalg.inv(R)
+        #-- Least-Squares Solutions for all series: Inv(R).Q'.Y
+        beta_mat = np.dot(d_in, np.dot(Q, np.transpose(Rinv)))
+    #-- Covariance Matrix: Inv(X'.W.X) = Inv(R).Inv(R)'
+    Hinv = np.dot(Rinv, np.transpose(Rinv))
+
+    #-- modelled time-series
+    mod = np.dot(beta_mat, np.transpose(DMAT))
+    #-- residual
+    res = d_in[:,0:nmax] - mod
+    #-- Fitted Values without (and with) climate oscillations
+    simple = np.dot(beta_mat[:,0:(ORDER+1)], np.transpose(DMAT[:,0:(ORDER+1)]))
+    season = mod - simple
+
+    #-- nu = Degrees of Freedom
+    nu = nmax - n_terms
+
+    #-- calculating R^2 values
+    #-- SStotal = sum((Y-mean(Y))**2)
+    anomaly = d_in[:,0:nmax] - np.mean(d_in[:,0:nmax], axis=1, keepdims=True)
+    SStotal = np.sum(anomaly**2, axis=1)
+    #-- SSerror = sum((Y-X*B)**2)
+    SSerror = np.sum(res**2, axis=1)
+    #-- R**2 term = 1- SSerror/SStotal
+    rsquare = 1.0 - (SSerror/SStotal)
+    #-- Adjusted R**2 term: weighted by degrees of freedom
+    rsq_adj = 1.0 - (SSerror/SStotal)*np.float64((nmax-1.0)/nu)
+    #-- Fit Criterion
+    #-- number of parameters including the intercept and the variance
+    K = np.float64(n_terms + 1)
+    #-- Log-Likelihood with weights (if unweighted, weight portions == 0)
+    log_lik = 0.5*(np.sum(np.log(wi)) - nmax*(np.log(2.0 * np.pi) + 1.0 -
+        np.log(nmax) + np.log(np.sum(wi[None,:]*(res**2), axis=1))))
+
+    #-- Aikaike's Information Criterion
+    AIC = -2.0*log_lik + 2.0*K
+    if AICc:
+        #-- Second-Order AIC correcting for small sample sizes (restricted)
+        AIC += (2.0*K*(K+1.0))/(nmax - K - 1.0)
+
+    #-- Bayesian Information Criterion (Schwarz Criterion)
+    BIC = -2.0*log_lik + np.log(nmax)*K
+
+    #-- Mean square error
+    MSE = SSerror/np.float64(nu)
+    #--- Error Analysis
+    if WEIGHT:
+        #-- WEIGHTED LEAST-SQUARES CASE (unequal error)
+        #-- Propagating RMS errors through the Normal Equations
+        #-- sum of squares of Inv(R).Q' is the diagonal of the covariance
+        beta_err = np.sqrt(np.diag(Hinv))
+        beta_err = np.broadcast_to(beta_err, beta_mat.shape).copy()
+        #-- Weighted sum of squares Error
+        WSSE = np.sum((wi[None,:]*res)**2, axis=1)/np.float64(nu)
+
+        return {'beta':beta_mat, 'error':beta_err, 'R2':rsquare,
+            'R2Adj':rsq_adj, 'WSSE':WSSE, 'AIC':AIC, 'BIC':BIC,
+            'LOGLIK':log_lik, 'model':mod, 'residual':res, 'simple':simple,
+            'season':season, 'N':n_terms, 'DOF':nu, 'cov_mat':Hinv,
+            'mask':np.zeros((d_in.shape[0]),dtype=bool)}
+    elif (DATA_ERR != 0):
+        #-- LEAST-SQUARES CASE WITH KNOWN AND EQUAL ERROR
+        #-- Normal Equations
+        NORMEQ = np.dot(Hinv,np.transpose(DMAT))
+        #-- Propagating RMS errors (equal for all series)
+        beta_err = DATA_ERR*np.sqrt(np.sum(NORMEQ**2, axis=1))
+        beta_err = np.broadcast_to(beta_err, beta_mat.shape).copy()
+
+        return {'beta':beta_mat, 'error':beta_err, 'R2':rsquare,
+            'R2Adj':rsq_adj, 'MSE':MSE, 'AIC':AIC, 'BIC':BIC,
+            'LOGLIK':log_lik, 'model':mod, 'residual':res, 'simple':simple,
+            'season':season,'N':n_terms, 'DOF':nu, 'cov_mat':Hinv,
+            'mask':np.zeros((d_in.shape[0]),dtype=bool)}
+    else:
+        #-- STANDARD LEAST-SQUARES CASE
+        #-- Regression with Errors with Unknown Standard Deviations
+        #-- Normalized root mean square error
+        NRMSE = np.sqrt(MSE)/(np.max(d_in[:,0:nmax],axis=1) -
+            np.min(d_in[:,0:nmax],axis=1))
+        #-- Taking the diagonal components of the cov matrix
+        hdiag = np.diag(Hinv)
+        #-- set either the standard deviation or the confidence interval
+        if (STDEV != 0):
+            #-- Setting the standard deviation of the output error
+            alpha = 1.0 - scipy.special.erf(STDEV/np.sqrt(2.0))
+        elif (CONF != 0):
+            #-- Setting the confidence interval of the output error
+            alpha = 1.0 - CONF
+        else:
+            #-- Default is 95% confidence interval
+            alpha = 1.0 - (0.95)
+        #-- Student T-Distribution with D.O.F. nu
+        tstar = scipy.stats.t.ppf(1.0-(alpha/2.0),nu)
+        #-- beta_err = t(nu,1-alpha/2)*standard error
+        st_err = np.sqrt(MSE[:,None]*hdiag[None,:])
+        beta_err = tstar*st_err
+
+        return {'beta':beta_mat, 'error':beta_err, 'std_err':st_err, 'R2':rsquare,
+            'R2Adj':rsq_adj, 'MSE':MSE, 'NRMSE':NRMSE, 'AIC':AIC, 'BIC':BIC,
+            'LOGLIK':log_lik, 'model':mod, 'residual':res, 'simple':simple,
+            'season':season, 'N':n_terms, 'DOF':nu, 'cov_mat':Hinv,
+            'mask':np.zeros((d_in.shape[0]),dtype=bool)}
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+u"""
+tssmooth_batch.py
+Written by Tyler Sutterley (08/2020)
+
+Computes a moving average of a batch of time series sharing the same dates
+    using three possible routines:
+    1) centered moving average
+    2) 13-month Loess filter (default)
+    3) 13-month Loess filter weighted and outputs for all dates
+The least-squares operator for each window is computed once and applied
+    to all series simultaneously
+
+Note: due to the missing months in the GRACE/GRACE-FO time series,
+    a standard moving average will have problems if the
+    missing months are not interpolated.
+
+CALLING SEQUENCE:
+    smth = tssmooth_batch(t_in, d_in, HFWTH=6)
+
+INPUTS:
+    t_in: input time array (nt)
+    d_in: input data array (npts,nt)
+
+OUTPUTS:
+    time: time after removing start and end half-windows
+    data: smoothed time-series (npts,nsmth)
+    seasonal: seasonal component calculated by the Loess filter
+    annual: annual component calculated by the Loess filter
+    semiann: semi-annual component calculated by the Loess filter
+    trend: instantaneous trend calculated by the Loess filter
+    error: estimated error of the instantaneous trend
+    noise: noise component after removing the Loess trend and seasonal components
+    reduce: original time series after removing start and end half-windows
+
+OPTIONS:
+    MOVING: calculates centered moving average using mean of window
+        mean of: (January up to December) and (February up to January)
+    WEIGHT: smoothing algorithm that backward models dates before
+        half-width and forward models dates after half-width
+        0: use unweighted Loess filter
+        1: use linear weights with Loess filter
+        2: use gaussian weights with Loess filter
+    HFWTH: half-width of the moving average (default = 6 for 13-month Loess)
+    DATA_ERR: input error for known and equal errors (single value)
+    STDEV: standard deviation of output error
+    CONF: confidence interval of output error (default is for 95%)
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+    scipy: Scientific Tools for Python (https://docs.scipy.org/doc/)
+
+UPDATE HISTORY:
+    Written 08/2020
+"""
+import numpy as np
+import scipy.stats
+import scipy.special
+
+def tssmooth_batch(t_in, d_in, HFWTH=6, MOVING=False, DATA_ERR=0, WEIGHT=0,
+    STDEV=0, CONF=0):
+    """
+    Computes a moving average of a batch of time series sharing the same dates
+
+    Arguments
+    ---------
+    t_in: input time array (nt)
+    d_in: input data array (npts,nt)
+
+    Keyword arguments
+    -----------------
+    MOVING: calculates centered moving average using mean of window
+    WEIGHT: smoothing algorithm that backward models dates before
+        half-width and forward models dates after half-width
+        0: use unweighted Loess filter
+        1: use linear weights with Loess filter
+        2: use gaussian weights with Loess filter
+    HFWTH: half-width of the moving average
+    DATA_ERR: input error for known and equal errors
+    STDEV: standard deviation of output error
+    CONF: confidence interval of output error
+
+    Returns
+    -------
+    time: time after removing start and end half-windows
+    data: smoothed time-series (npts,nsmth)
+    seasonal: seasonal component calculated by the Loess filter
+    annual: annual component calculated by the Loess filter
+    semiann: semi-annual component calculated by the Loess filter
+    trend: instantaneous trend calculated by the Loess filter
+    error: estimated error of the instantaneous trend
+    noise: noise component after removing the Loess trend and seasonal components
+    reduce: original time series after removing start and end half-windows
+    """
+
+    #-- remove singleton time dimensions and verify data is 2-dimensional
+    t_in = np.squeeze(t_in)
+    d_in = np.atleast_2d(d_in)
+    nmax = len(t_in)
+    #-- number of points within each window and number of windows
+    nwin = 2*HFWTH + 1
+    nsmth = nmax - 2*HFWTH
+
+    #-- Indice with start of seasonal terms:
+    SEAS = 2
+
+    #-- set either the standard deviation or the confidence interval
+    if (STDEV != 0):
+        #-- Setting the standard deviation of the output error
+        alpha = 1.0 - scipy.special.erf(STDEV/np.sqrt(2.0))
+    elif (CONF != 0):
+        #-- Setting the confidence interval of the output error
+        alpha = 1.0 - CONF
+    else:
+        #-- Default is 95% confidence interval
+        alpha = 1.0 - (0.95)
+
+    #-- moving average algorithm
+    if MOVING:
+        #-- Centered moving average using the mean of each window
+        #-- equal to mean of Jan:Dec and Feb:Jan+1 for HFWTH 6
+        #-- problematic with GRACE due to missing months within time-series
+        #-- output time
+        tout = t_in[HFWTH:nmax-HFWTH]
+        #-- centered moving average sum[2:i-1] + 0.5[1] + 0.5[i]
+        csum = np.cumsum(d_in, axis=1)
+        smth = csum[:,2*HFWTH-1:nmax-1] - csum[:,0:nsmth]
+        smth += 0.5*(d_in[:,0:nsmth] + d_in[:,2*HFWTH:nmax])
+        dsmth = smth/(2*HFWTH)
+        return {'data':dsmth, 'time':tout}
+
+    #-- design matrices for all windows (nsmth,nwin,6)
+    ran = np.arange(nsmth)[:,None] + np.arange(nwin)[None,:]
+    #-- x0,x1,AS,AC,SS,SC
+    TMAT = np.zeros((nsmth,nwin,6))
+    TMAT[:,:,0] = 1.0#-- Constant Term
+    TMAT[:,:,1] = t_in[ran]#-- Linear Term
+    #-- Annual term = 2*pi*t*harmonic
+    TMAT[:,:,2] = np.sin(2*np.pi*t_in[ran])
+    TMAT[:,:,3] = np.cos(2*np.pi*t_in[ran])
+    #--Semi-Annual = 4*pi*t*harmonic
+    TMAT[:,:,4] = np.sin(4*np.pi*t_in[ran])
+    TMAT[:,:,5] = np.cos(4*np.pi*t_in[ran])
+    n_terms = TMAT.shape[2]
+    #-- Least-Squares operator for each window: pseudo-inverse of TMAT
+    PINV = np.linalg.pinv(TMAT)
+    #-- Least-Squares coefficients for all series and windows (npts,nsmth,6)
+    #-- summing the contribution of each date within the windows
+    beta_mat = np.zeros((d_in.shape[0],nsmth,n_terms))
+    for j in range(nwin):
+        beta_mat += PINV[None,:,:,j]*d_in[:,j:j+nsmth,None]
+    #-- annual and semi-annual amplitudes and phases
+    AS,AC = (beta_mat[:,:,SEAS],beta_mat[:,:,SEAS+1])
+    SS,SC = (beta_mat[:,:,SEAS+2],beta_mat[:,:,SEAS+3])
+    annamp = np.sqrt(AS**2 + AC**2)
+    annphase = np.arctan2(AC,AS)*180.0/np.pi
+    semiamp = np.sqrt(SS**2 + SC**2)
+    semiphase = np.arctan2(SC,SS)*180.0/np.pi
+
+    if WEIGHT in (1,2):
+        #-- weighted moving average calculated from the least-squares of window
+        #-- and removing An/SAn signal.  models entire range of dates
+        #-- output time = input time
+        tout = np.copy(t_in)
+        if (WEIGHT == 1):
+            #-- linear weights (range from 1:HFWTH+1:-1)
+            wi = np.concatenate((np.arange(1,HFWTH+2,dtype=np.float64),
+                np.arange(HFWTH,0,-1,dtype=np.float64)),axis=0)
+        elif (WEIGHT == 2):
+            #-- gaussian weights
+            #-- default standard deviation of 2
+            stdev = 2.0
+            #-- gaussian function over range 2*HFWTH
+            #-- centered on HFWTH
+            xi=np.arange(0, 2*HFWTH+1)
+            wi=np.exp(-(xi-HFWTH)**2/(2.0*stdev**2))/(stdev*np.sqrt(2.0*np.pi))
+
+        dsmth = np.zeros((d_in.shape[0],nmax))
+        dseason = np.zeros((d_in.shape[0],nmax))
+        dannual = np.zeros((d_in.shape[0],nmax))
+        dsemian = np.zeros((d_in.shape[0],nmax))
+        weight = np.zeros((nmax))
+        #-- add weighted components of each window to the dates in the window
+        for j in range(nwin):
+            T = TMAT[None,:,j,:]
+            dsmth[:,j:j+nsmth] += wi[j]*np.sum(T[:,:,0:SEAS]*
+                beta_mat[:,:,0:SEAS],axis=2)
+            dseason[:,j:j+nsmth] += wi[j]*np.sum(T[:,:,SEAS:]*
+                beta_mat[:,:,SEAS:],axis=2)
+            dannual[:,j:j+nsmth] += wi[j]*np.sum(T[:,:,SEAS:SEAS+2]*
+                beta_mat[:,:,SEAS:SEAS+2],axis=2)
+            dsemian[:,j:j+nsmth] += wi[j]*np.sum(T[:,:,SEAS+2:SEAS+4]*
+                beta_mat[:,:,SEAS+2:SEAS+4],axis=2)
+            weight[j:j+nsmth] += wi[j]
+        #-- weighted amplitudes and phases (constant within each window)
+        wamp = {}
+        for key,val in [('annamp',annamp),('annphase',annphase),
+            ('semiamp',semiamp),('semiphase',semiphase)]:
+            wamp[key] = np.zeros((d_in.shape[0],nmax))
+            for j in range(nwin):
+                wamp[key][:,j:j+nsmth] += wi[j]*val
+            wamp[key] /= weight
+        #-- divide weighted smoothed time-series by weights
+        #-- to get output smoothed time-series
+        dsmth /= weight
+        dseason /= weight
+        dannual /= weight
+        dsemian /= weight
+        #-- noise = data - smoothed - seasonal
+        dnoise = d_in - dsmth - dseason
+        return {'data':dsmth, 'seasonal':dseason, 'annual':dannual,
+            'annamp':wamp['annamp'], 'annphase':wamp['annphase'],
+            'semiann':dsemian, 'semiamp':wamp['semiamp'],
+            'semiphase':wamp['semiphase'], 'noise':dnoise,
+            'time':tout, 'weight':weight}
+    else:
+        #-- Moving average calculated from least-squares of window
+        #-- and removing An/SAn signal
+        #-- output time
+        tout = t_in[HFWTH:nmax-HFWTH]
+        #-- diagonal of the covariance matrix for each window
+        #-- Inv(X'.X) = PINV.PINV'
+        hdiag = np.sum(PINV**2, axis=2)
+        if (DATA_ERR != 0):
+            #-- LEAST-SQUARES CASE WITH KNOWN AND EQUAL ERROR
+            beta_err = DATA_ERR*np.sqrt(hdiag[None,:,:])
+        else:
+            #-- Error Analysis
+            #-- Degrees of Freedom
+            nu = nwin - n_terms
+            #-- sum of squares error of each window
+            SSE = np.zeros((d_in.shape[0],nsmth))
+            for j in range(nwin):
+                mod = np.sum(TMAT[None,:,j,:]*beta_mat, axis=2)
+                SSE += (d_in[:,j:j+nsmth] - mod)**2
+            #-- Mean square error
+            MSE = SSE/nu
+            #-- STANDARD LEAST-SQUARES CASE
+            #-- Regression with Errors with Unknown Standard Deviations
+            #-- Student T-Distribution with D.O.F. nu
+            tstar = scipy.stats.t.ppf(1.0-(alpha/2.0),nu)
+            #-- beta_err = t(nu,1-alpha/2)*standard error
+            st_err = np.sqrt(MSE[:,:,None]*hdiag[None,:,:])
+            beta_err = tstar*st_err
+
+        #-- Calculating the output components at the center of each window
+        TC = TMAT[None,:,HFWTH,:]
+        #-- smoothed time series
+        dsmth = np.sum(TC[:,:,0:SEAS]*beta_mat[:,:,0:SEAS], axis=2)
+        dtrend = np.copy(beta_mat[:,:,1])#-- Instantaneous data trend
+        derror = np.broadcast_to(beta_err[:,:,1], dsmth.shape).copy()
+        #-- seasonal component
+        dseason = np.sum(TC[:,:,SEAS:]*beta_mat[:,:,SEAS:], axis=2)
+        #-- annual component
+        dannual = np.sum(TC[:,:,SEAS:SEAS+2]*beta_mat[:,:,SEAS:SEAS+2], axis=2)
+        #-- semi-annual component
+        dsemian = np.sum(TC[:,:,SEAS+2:SEAS+4]*beta_mat[:,:,SEAS+2:SEAS+4],
+            axis=2)
+        #-- reduced time-series
+        dreduce = d_in[:,HFWTH:nmax-HFWTH]
+        #-- noise component
+        dnoise = dreduce - dsmth - dseason
+
+        return {'data':dsmth, 'trend':dtrend, 'error':derror,
+            'seasonal':dseason, 'annual':dannual, 'annphase':annphase,
+            'annamp':annamp, 'semiann':dsemian, 'semiamp':semiamp,
+            'semiphase':semiphase, 'noise':dnoise, 'time':tout,
+            'reduce':dreduce.copy()}
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+u"""
+write_cache_file.py
+Written by Tyler Sutterley (08/2020)
+
+Writes numerical arrays to a binary cache file
+Arrays are written to a temporary file that is moved to the cache file
+    so that concurrent readers never see a partially written file
+
+CALLING SEQUENCE:
+    write_cache_file(cache_file, clm=clm, slm=slm)
+
+INPUTS:
+    cache_file: binary cache file (.npz)
+
+OPTIONS:
+    **kwargs: numerical arrays to write to the cache file
+
+PYTHON DEPENDENCIES:
+    numpy: Scientific Computing Tools For Python (https://numpy.org)
+
+UPDATE HISTORY:
+    Written 08/2020
+"""
+import os
+import tempfile
+import numpy as np
+
+#-- PURPOSE: write numerical arrays to a binary cache file
+def write_cache_file(cache_file, **kwargs):
+    """
+    Writes numerical arrays to a binary cache file
+
+    Arguments
+    ---------
+    cache_file: binary cache file (.npz)
+
+    Keyword arguments
+    -----------------
+    **kwargs: numerical arrays to write to the cache file
+    """
+    #-- write to a temporary file and then move to the cache file
+    #-- so that concurrent readers never see a partially written file
+    fd,temp_file = tempfile.mkstemp(suffix='.npz',
+        dir=os.path.dirname(cache_file))
+    try:
+        with os.fdopen(fd, 'wb') as fileID:
+            np.savez(fileID, **kwargs)
+        os.replace(temp_file, cache_file)
+    except:
+        #-- remove the temporary file if the cache file was not written
+        os.remove(temp_file)
+        raise
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 convert_harmonics.py
-Written by Tyler Sutterley (04/2020)
+Written by Tyler Sutterley (08/2020)
 Converts a file from the spatial domain into the spherical harmonic domain
 
 CALLING SEQUENCE:
@@ -59,6 +59,7 @@ PROGRAM DEPENDENCIES:
     units.py: class for converting GRACE/GRACE-FO Level-2 data to specific units
 
 UPDATE HISTORY:
+    Updated 08/2020: convert ascii input files to grids without looping
     Updated 04/2020: updates to reading load love numbers
     Written 10/2019
 """
@@ -138,17 +139,14 @@ def convert_harmonics(INPUT_FILE, OUTPUT_FILE, LMAX=None, MMAX=None, UNITS=None,
 
     #-- read input spherical harmonic coefficients from file in DATAFORM
     if (DATAFORM == 1):
-        file_input = np.loadtxt(input_file,skiprows=HEADER,delimiter=DELIMITER)
+        file_input = np.loadtxt(INPUT_FILE,skiprows=HEADER,delimiter=DELIMITER,
+            ndmin=2)
         input_spatial['data'] = np.zeros((1,nlat,nlon))
-        input_spatial['time'] = 1.0
-        #-- number of files
-        file_lines = len(file_input)
-        #-- for each file line
-        for j,line in enumerate(file_input):
-            #-- calculating the lon/lat indice
-            ilon = np.int(line[0]/dlon)
-            ilat = np.int((90.0-line[1])/dlat)
-            input_spatial['data'][0,ilat,ilon] = line[2]
+        input_spatial['time'] = np.ones((1))
+        #-- calculating the lon/lat indices of all file lines
+        ilon = (file_input[:,0]/dlon).astype(np.int64)
+        ilat = ((90.0-file_input[:,1])/dlat).astype(np.int64)
+        input_spatial['data'][0,ilat,ilon] = file_input[:,2]
         #-- value for missing data points
         missing = FILL_VALUE if FILL_VALUE else 0.0
     elif DATAFORM in (2,3):
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_spatial_error.py
-Written by Tyler Sutterley (03/2018)
+Written by Tyler Sutterley (08/2020)
 
 Calculates the GRACE/GRACE-FO errors following Wahr et al. (2006)
 
@@ -70,9 +70,11 @@ PROGRAM DEPENDENCIES:
     read_love_numbers.py: reads Load Love Numbers from Han and Wahr (1995)
     gauss_weights.py: Computes the Gaussian weights as a function of degree
     plm_holmes.py: Computes fully normalized associated Legendre polynomials
+    harmonic_variance_summation.py: calculates a spatial variance field
+        from the errors of spherical harmonic coefficients
     units.py: class for converting spherical harmonic data to specific units
-    tssmooth.py: smoothes a time-series for seasonal effects
     harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
+        calculates the delta coefficients of the smoothed time series
     destripe_harmonics.py: calculates the decorrelation (destriping) filter
         and filters the GRACE/GRACE-FO coefficients for striping errors
     ncdf_read_stokes.py: reads spherical harmonic netcdf files
@@ -91,6 +93,9 @@ REFERENCES:
         http://dx.doi.org/10.1029/2005GL025305
 
 UPDATE HISTORY:
+    Updated 08/2020: smooth all spherical harmonic time series at once
+        using the delta method of the harmonics class
+        propagate errors to the spatial domain with harmonic_variance_summation
     Updated 06/2020: using spatial data class for output operations
     Updated 04/2020: updates to reading load love numbers
         using the units class for converting normalized spherical harmonics
@@ -122,10 +127,11 @@ import traceback
 from gravity_toolkit.grace_input_months import grace_input_months
 from gravity_toolkit.read_love_numbers import read_love_numbers
 from gravity_toolkit.plm_holmes import plm_holmes
+from gravity_toolkit.harmonic_variance_summation import \
+    harmonic_variance_summation
 from gravity_toolkit.gauss_weights import gauss_weights
 from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.spatial import spatial
-from gravity_toolkit.tssmooth import tssmooth
 from gravity_toolkit.units import units
 
 #-- PURPOSE: keep track of multiprocessing threads
@@ -292,10 +298,6 @@ def grace_spatial_error(base_dir, parameters, VERBOSE, MODE):
         #-- add output delta file to list object
         output_files.append(os.path.join(grace_dir,DELTA_FILE))
 
-        #-- Delta coefficients of GRACE time series (Error components)
-        delta_Ylms = harmonics(lmax=LMAX,mmax=MMAX)
-        delta_Ylms.clm = np.zeros((LMAX+1,MMAX+1))
-        delta_Ylms.slm = np.zeros((LMAX+1,MMAX+1))
         #-- Smoothing Half-Width (CNES is a 10-day solution)
         #-- 365/10/2 = 18.25 (next highest is 19)
         #-- All other solutions are monthly solutions (HFWTH for annual = 6)
@@ -303,27 +305,14 @@ def grace_spatial_error(base_dir, parameters, VERBOSE, MODE):
             HFWTH = 19
         else:
             HFWTH = 6
+        #-- Delta coefficients of GRACE time series (Error components)
         #-- Equal to the noise of the smoothed time-series
-        #-- for each spherical harmonic order
-        for m in range(0,MMAX+1):#-- MMAX+1 to include MMAX
-            #-- for each spherical harmonic degree
-            for l in range(m,LMAX+1):#-- LMAX+1 to include LMAX
-                #-- Delta coefficients of GRACE time series
-                for cs,csharm in enumerate(['clm','slm']):
-                    #-- Constrained GRACE Error (Noise of smoothed time-series)
-                    #-- With Annual and Semi-Annual Terms
-                    val1 = getattr(GRACE_Ylms, csharm)
-                    smth = tssmooth(GRACE_Ylms.time, val1[l,m,:], HFWTH=HFWTH)
-                    #-- number of smoothed points
-                    nsmth = len(smth['data'])
-                    #-- GRACE delta Ylms
-                    #-- variance of data-(smoothed+annual+semi)
-                    val2 = getattr(delta_Ylms, csharm)
-                    val2[l,m] = np.sqrt(np.sum(smth['noise']**2)/nsmth)
+        #-- Constrained GRACE Error (Noise of smoothed time-series)
+        #-- With Annual and Semi-Annual Terms
+        delta_Ylms = GRACE_Ylms.delta(hfwth=HFWTH)
+        nsmth = np.int(delta_Ylms.time)
 
         #-- save GRACE DELTA to file
-        delta_Ylms.time = np.copy(nsmth)
-        delta_Ylms.month = np.copy(nsmth)
         if (DATAFORM == 1):
             #-- ascii (.txt)
             delta_Ylms.to_ascii(os.path.join(grace_dir,DELTA_FILE))
@@ -403,34 +392,18 @@ def grace_spatial_error(base_dir, parameters, VERBOSE, MODE):
         dfactor = units(lmax=LMAX).harmonic(hl,kl,ll).mbar
 
     #-- Computing plms for converting to spatial domain
-    phi = delta.lon[np.newaxis,:]*np.pi/180.0
     theta = (90.0-delta.lat)*np.pi/180.0
     PLM,dPLM = plm_holmes(LMAX,np.cos(theta))
-    #-- square of legendre polynomials truncated to order MMAX
-    mm = np.arange(0,MMAX+1)
-    PLM2 = PLM[:,mm,:]**2
-
-    #-- Calculating cos(m*phi)^2 and sin(m*phi)^2
-    m = delta_Ylms.m[:,np.newaxis]
-    ccos = np.cos(np.dot(m,phi))**2
-    ssin = np.sin(np.dot(m,phi))**2
 
     #-- truncate delta harmonics to spherical harmonic range
     Ylms = delta_Ylms.truncate(LMAX,lmin=LMIN,mmax=MMAX)
     #-- convolve delta harmonics with degree dependent factors
     #-- smooth harmonics and convert to output units
     Ylms = Ylms.convolve(dfactor*wt).power(2.0).scale(1.0/nsmth)
-    #-- Calculate fourier coefficients
-    d_cos = np.zeros((MMAX+1,nlat))#-- [m,th]
-    d_sin = np.zeros((MMAX+1,nlat))#-- [m,th]
-    #-- Calculating delta spatial values
-    for k in range(0,nlat):
-        #-- summation over all spherical harmonic degrees
-        d_cos[:,k] = np.sum(PLM2[:,:,k]*Ylms.clm, axis=0)
-        d_sin[:,k] = np.sum(PLM2[:,:,k]*Ylms.slm, axis=0)
-
-    #-- Multiplying by c/s(phi#m) to get spatial maps (lon,lat)
-    delta.data=np.sqrt(np.dot(ccos.T,d_cos) + np.dot(ssin.T,d_sin)).T
+    #-- Calculating delta spatial values from the variance of the harmonics
+    variance = harmonic_variance_summation(Ylms.clm, Ylms.slm,
+        delta.lon, delta.lat, LMIN=LMIN, LMAX=LMAX, MMAX=MMAX, PLM=PLM)
+    delta.data = np.sqrt(variance).T
 
     #-- output file format
     file_format = '{0}{1}_L{2:d}{3}{4}{5}_ERR_{6:03d}-{7:03d}.{8}'
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 grace_spatial_maps.py
-Written by Tyler Sutterley (06/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads in GRACE/GRACE-FO spherical harmonic coefficients and exports
     monthly spatial fields
@@ -22,6 +22,20 @@ CALLING SEQUENCE:
     python grace_spatial_maps.py --np=2 parameter_file1 parameter_file2
     python grace_spatial_maps.py -P 2 parameter_file1 parameter_file2
 
+    Can output all months to a single netCDF4 or HDF5 file with the
+        CUBE parameter, with chunks contiguous in time (CHUNKS time) or in
+        map (CHUNKS map) and an optional compression level (COMPRESSION)
+
+    Can output spatial fields as single precision with DTYPE float32
+        (summations are calculated in double precision)
+
+    Can evaluate an ensemble of GIA models in a single run with a list of
+        GIA files separated by commas (GIA_FILE file1,file2,file3)
+        each GIA model in the ensemble must have a unique title
+        GIA_ENSEMBLE data: output GIA-corrected fields for each model
+        GIA_ENSEMBLE correction: output only the GIA rate maps for each model
+        GIA_CACHE: directory for binary cache of converted GIA harmonics
+
     Can output a log file listing the input parameters and output files:
     python grace_spatial_maps.py --log parameter_file
     python grace_spatial_maps.py -l parameter_file
@@ -79,6 +93,8 @@ PROGRAM DEPENDENCIES:
     gen_stokes.py: converts a spatial field into a series of spherical harmonics
     geocenter.py: converts between spherical harmonics and geocenter variations
     harmonic_summation.py: calculates a spatial field from spherical harmonics
+    harmonic_variance_summation.py: calculates spatial fields and errors
+        from spherical harmonics and their calibrated errors
     units.py: class for converting GRACE/GRACE-FO Level-2 data to specific units
     harmonics.py: spherical harmonic data class for processing GRACE/GRACE-FO
     destripe_harmonics.py: calculates the decorrelation (destriping) filter
@@ -94,6 +110,14 @@ PROGRAM DEPENDENCIES:
     hdf5_write.py: writes output spatial data to HDF5
 
 UPDATE HISTORY:
+    Updated 08/2020: output calibrated error fields with the spatial fields
+        destripe the total of the removed coefficients in a single pass
+        output spatial time series as a single chunked and compressed cube
+        added option for single precision output spatial fields
+        added GIA ensemble mode synthesizing the GIA rate maps of all models
+            in a single batched summation and correcting by broadcasting
+            (raise an error for ensemble members with duplicate titles)
+        GIA_ENSEMBLE and GIA_CACHE parameters can be set to None
     Updated 06/2020: using spatial data class for output operations
     Updated 05/2020: for public release
 """
@@ -115,6 +139,8 @@ from gravity_toolkit.plm_holmes import plm_holmes
 from gravity_toolkit.gauss_weights import gauss_weights
 from gravity_toolkit.ocean_stokes import ocean_stokes
 from gravity_toolkit.harmonic_summation import harmonic_summation
+from gravity_toolkit.harmonic_variance_summation import \
+    harmonic_signal_error_summation
 from gravity_toolkit.harmonics import harmonics
 from gravity_toolkit.spatial import spatial
 from gravity_toolkit.units import units
@@ -188,7 +214,22 @@ def grace_spatial_maps(base_dir, parameters, VERBOSE, MODE):
     POLE_TIDE = parameters['POLE_TIDE'] in ('Y','y')
     #-- Glacial Isostatic Adjustment file to read
     GIA = parameters['GIA'] if (parameters['GIA'].title() != 'None') else None
-    GIA_FILE = os.path.expanduser(parameters['GIA_FILE'])
+    #-- multiple GIA files (separated by commas) are evaluated as an ensemble
+    GIA_FILES = [os.path.expanduser(f) for f in
+        parameters['GIA_FILE'].split(',')]
+    #-- GIA ensemble output: GIA-corrected fields (data) or GIA rates (correction)
+    #-- ensembles output GIA-corrected fields if unset (or set to None)
+    if (parameters.get('GIA_ENSEMBLE','None').title() != 'None'):
+        GIA_ENSEMBLE = parameters['GIA_ENSEMBLE']
+    else:
+        GIA_ENSEMBLE = 'data' if (len(GIA_FILES) > 1) else None
+    if GIA_ENSEMBLE not in (None,'data','correction'):
+        raise ValueError('Unknown GIA ensemble output {0}'.format(GIA_ENSEMBLE))
+    #-- directory for binary cache of converted GIA harmonics
+    if (parameters.get('GIA_CACHE','None').title() != 'None'):
+        GIA_CACHE = os.path.expanduser(parameters['GIA_CACHE'])
+    else:
+        GIA_CACHE = None
     #-- remove a set of spherical harmonics from the GRACE data
     REMOVE_INDEX = parameters['REMOVE_INDEX']
     REDISTRIBUTE_REMOVED = parameters['REDISTRIBUTE_REMOVED'] in ('Y','y')
@@ -196,6 +237,19 @@ def grace_spatial_maps(base_dir, parameters, VERBOSE, MODE):
     RAD = np.int(parameters['RAD'])
     #-- destriped coefficients
     DESTRIPE = parameters['DESTRIPE'] in ('Y','y')
+    #-- output spatial fields of the calibrated errors
+    ERROR = ('ERROR' in parameters.keys()) and (parameters['ERROR'] in ('Y','y'))
+    #-- output all months to a single spatial time-series cube
+    CUBE = ('CUBE' in parameters.keys()) and (parameters['CUBE'] in ('Y','y'))
+    #-- chunk shape of the cube: contiguous in time (time) or in map (map)
+    CHUNKS = parameters['CHUNKS'] if ('CHUNKS' in parameters.keys()) else 'map'
+    #-- compression level of the output netCDF4 and HDF5 files
+    if ('COMPRESSION' in parameters.keys()):
+        COMPRESSION = np.int(parameters['COMPRESSION'])
+    else:
+        COMPRESSION = None
+    #-- data type of the output spatial fields (float32 or float64)
+    DTYPE = parameters['DTYPE'] if ('DTYPE' in parameters.keys()) else 'float64'
     #-- output spatial units
     UNITS = np.int(parameters['UNITS'])
     #-- output degree spacing
@@ -218,6 +272,9 @@ def grace_spatial_maps(base_dir, parameters, VERBOSE, MODE):
 
     #-- file information
     suffix = ['txt', 'nc', 'H5'][DATAFORM-1]
+    #-- spatial time-series cubes are only output to netCDF4 or HDF5
+    if CUBE and (DATAFORM == 1):
+        raise ValueError('Spatial cubes must be output to netCDF4 or HDF5')
     format_str = ['ascii','netCDF4','HDF5'][DATAFORM-1]
 
     #-- read arrays of kl, hl, and ll Love Numbers
@@ -275,16 +332,33 @@ def grace_spatial_maps(base_dir, parameters, VERBOSE, MODE):
         ds_str = ''
 
     #-- input GIA spherical harmonic datafiles
-    GIA_Ylms_rate = read_GIA_model(GIA_FILE,GIA=GIA,LMAX=LMAX,MMAX=MMAX)
-    #-- calculate the monthly mass change from GIA
     GIA_Ylms = GRACE_Ylms.zeros_like()
     GIA_Ylms.time[:] = np.copy(GRACE_Ylms.time)
     GIA_Ylms.month[:] = np.copy(GRACE_Ylms.month)
-    #-- monthly GIA calculated by gia_rate*time elapsed
-    #-- finding change in GIA each month
-    for t in range(nfiles):
-        GIA_Ylms.clm[:,:,t] = GIA_Ylms_rate['clm']*(GIA_Ylms.time[t]-2003.3)
-        GIA_Ylms.slm[:,:,t] = GIA_Ylms_rate['slm']*(GIA_Ylms.time[t]-2003.3)
+    if GIA_ENSEMBLE:
+        #-- stack the GIA rates of each ensemble member (l,m,N)
+        #-- the GIA corrections are applied to the spatial fields
+        gia_list = []
+        for f in GIA_FILES:
+            Ylms = read_GIA_model(f,GIA=GIA,LMAX=LMAX,MMAX=MMAX,CACHE=GIA_CACHE)
+            gia_list.append(harmonics().from_dict(Ylms))
+            gia_list[-1].title = Ylms['title']
+        GIA_Ylms_rate = harmonics().from_list(gia_list, date=False)
+        GIA_Ylms_rate.title = [Ylms.title for Ylms in gia_list]
+        #-- output files are named by GIA title and would be overwritten
+        duplicates = sorted(set(t for t in GIA_Ylms_rate.title
+            if (GIA_Ylms_rate.title.count(t) > 1)))
+        if duplicates:
+            raise ValueError('Duplicate GIA ensemble titles: {0}'.format(
+                ','.join(duplicates)))
+    else:
+        GIA_Ylms_rate = read_GIA_model(GIA_FILES[0],GIA=GIA,LMAX=LMAX,
+            MMAX=MMAX,CACHE=GIA_CACHE)
+        #-- monthly GIA calculated by gia_rate*time elapsed
+        #-- finding change in GIA each month
+        for t in range(nfiles):
+            GIA_Ylms.clm[:,:,t] = GIA_Ylms_rate['clm']*(GIA_Ylms.time[t]-2003.3)
+            GIA_Ylms.slm[:,:,t] = GIA_Ylms_rate['slm']*(GIA_Ylms.time[t]-2003.3)
 
     #-- Read Ocean function and convert to Ylms for redistribution
     if REDISTRIBUTE_REMOVED:
@@ -318,13 +392,14 @@ def grace_spatial_maps(base_dir, parameters, VERBOSE, MODE):
                         #-- note: x -= y is equivalent to x = x - y
                         Ylms.clm[l,m,:] -= ratio*ocean_Ylms['clm'][l,m]
                         Ylms.slm[l,m,:] -= ratio*ocean_Ylms['slm'][l,m]
-            #-- filter removed coefficients
-            if DESTRIPE:
-                Ylms = Ylms.destripe()
             #-- add data for month t and INDEX_FILE to the total
             #-- remove_clm and remove_slm matrices
             #-- redistributing the mass over the ocean if specified
             remove_Ylms.add(Ylms)
+        #-- filter removed coefficients
+        #-- destriping is linear: filter the total of all removed datasets
+        if DESTRIPE:
+            remove_Ylms = remove_Ylms.destripe()
 
     #-- Output spatial data object
     grid = spatial()
@@ -382,6 +457,76 @@ def grace_spatial_maps(base_dir, parameters, VERBOSE, MODE):
 
     #-- output file format
     file_format = '{0}{1}_L{2:d}{3}{4}{5}_{6:03d}.{7}'
+    error_format = '{0}{1}_L{2:d}{3}{4}{5}_ERR_{6:03d}.{7}'
+    cube_format = '{0}{1}_L{2:d}{3}{4}{5}_CUBE.{6}'
+    cube_error_format = '{0}{1}_L{2:d}{3}{4}{5}_ERR_CUBE.{6}'
+    #-- output file formats for each GIA ensemble member
+    ensemble_format = '{0}{1}_L{2:d}{3}{4}{5}_{6}_{7:03d}.{8}'
+    ensemble_cube_format = '{0}{1}_L{2:d}{3}{4}{5}_{6}_CUBE.{7}'
+    ensemble_rate_format = '{0}{1}_L{2:d}{3}{4}{5}_{6}_RATE.{7}'
+
+    #-- GIA rate maps of each ensemble member in a single batched summation
+    #-- sharing the Legendre polynomials with the GRACE/GRACE-FO fields
+    if GIA_ENSEMBLE:
+        GIA_Ylms_rate.convolve(dfactor*wt)
+        Ygrid = harmonic_signal_error_summation(GIA_Ylms_rate.clm,
+            GIA_Ylms_rate.slm, None, None, grid.lon, grid.lat, LMAX=LMAX,
+            MMAX=MMAX, PLM=PLM)
+        #-- GIA rate maps (nlat,nlon,N)
+        gia_rate = np.transpose(Ygrid['data'], axes=(1,0,2))
+
+    #-- output only the GIA rate maps of each ensemble member
+    if (GIA_ENSEMBLE == 'correction'):
+        for n,gia_title in enumerate(GIA_Ylms_rate.title):
+            rate = spatial()
+            rate.lon = np.copy(grid.lon)
+            rate.lat = np.copy(grid.lat)
+            rate.data = gia_rate[:,:,n].astype(DTYPE)
+            args = (FILENAME,unit_list[UNITS-1],LMAX,order_str,gw_str,
+                ds_str,gia_title,suffix)
+            FILE = os.path.join(DIRECTORY,ensemble_rate_format.format(*args))
+            if (DATAFORM == 1):
+                #-- ascii (.txt)
+                rate.to_ascii(FILE, date=False, verbose=VERBOSE)
+            elif (DATAFORM == 2):
+                #-- netCDF4
+                rate.to_netCDF4(FILE, date=False, verbose=VERBOSE,
+                    units='{0}/yr'.format(unit_list[UNITS-1]),
+                    longname=unit_name[UNITS-1], title=gia_title,
+                    compression_level=COMPRESSION)
+            elif (DATAFORM == 3):
+                #-- HDF5
+                rate.to_HDF5(FILE, date=False, verbose=VERBOSE,
+                    units='{0}/yr'.format(unit_list[UNITS-1]),
+                    longname=unit_name[UNITS-1], title=gia_title,
+                    compression_level=COMPRESSION)
+            #-- set the permissions mode of the output files
+            os.chmod(FILE, MODE)
+            #-- add file to list
+            output_files.append(FILE)
+        #-- return the list of output files
+        return output_files
+
+    #-- calibrated errors are not available for destriped coefficients
+    if ERROR and (GRACE_Ylms.eclm is None):
+        raise ValueError('Calibrated errors not available for output')
+    #-- allocate for spatial time-series cubes
+    nt = len(GRACE_Ylms.month)
+    if CUBE:
+        cube = spatial()
+        cube.lon = np.copy(grid.lon)
+        cube.lat = np.copy(grid.lat)
+        cube.time = np.copy(GRACE_Ylms.time)
+        cube.month = np.copy(GRACE_Ylms.month)
+        cube.data = np.zeros((nlat,nlon,nt),dtype=DTYPE)
+        #-- spatial time-series cube for the calibrated errors
+        if ERROR:
+            cube_error = spatial()
+            cube_error.lon = np.copy(grid.lon)
+            cube_error.lat = np.copy(grid.lat)
+            cube_error.time = np.copy(GRACE_Ylms.time)
+            cube_error.month = np.copy(GRACE_Ylms.month)
+            cube_error.data = np.zeros((nlat,nlon,nt),dtype=DTYPE)
     #-- converting harmonics to truncated, smoothed coefficients in units
     #-- combining harmonics to calculate output spatial fields
     for i,grace_month in enumerate(GRACE_Ylms.month):
@@ -394,33 +539,150 @@ def grace_spatial_maps(base_dir, parameters, VERBOSE, MODE):
         #-- smooth harmonics and convert to output units
         Ylms.convolve(dfactor*wt)
         #-- convert spherical harmonics to output spatial grid
-        grid.data = harmonic_summation(Ylms.clm, Ylms.slm,
-            grid.lon, grid.lat, LMAX=LMAX, MMAX=MMAX, PLM=PLM).T
+        if ERROR:
+            #-- calculate spatial field and error in the same pass
+            Ygrid = harmonic_signal_error_summation(Ylms.clm, Ylms.slm,
+                Ylms.eclm, Ylms.eslm, grid.lon, grid.lat, LMAX=LMAX,
+                MMAX=MMAX, PLM=PLM, DTYPE=DTYPE)
+            grid.data = Ygrid['data'].T
+            grid.error = Ygrid['error'].T
+        else:
+            grid.data = harmonic_summation(Ylms.clm, Ylms.slm,
+                grid.lon, grid.lat, LMAX=LMAX, MMAX=MMAX, PLM=PLM,
+                DTYPE=DTYPE).T
         #-- copy time variables for month
         grid.time = np.copy(Ylms.time)
         grid.month = np.copy(Ylms.month)
+        #-- add spatial fields to the time-series cubes
+        if CUBE:
+            cube.data[:,:,i] = grid.data[:,:]
+            if ERROR:
+                cube_error.data[:,:,i] = grid.error[:,:]
+            continue
 
         #-- output monthly files to ascii, netCDF4 or HDF5
         args=(FILENAME,unit_list[UNITS-1],LMAX,order_str,gw_str,
             ds_str,grace_month,suffix)
-        FILE=os.path.join(DIRECTORY,file_format.format(*args))
-        if (DATAFORM == 1):
-            #-- ascii (.txt)
-            grid.to_ascii(FILE, date=True, verbose=VERBOSE)
-        elif (DATAFORM == 2):
-            #-- netCDF4
-            grid.to_netCDF4(FILE, date=True, verbose=VERBOSE,
-                units=unit_list[UNITS-1], longname=unit_name[UNITS-1],
-                title='GRACE/GRACE-FO Spatial Data')
-        elif (DATAFORM == 3):
-            #-- HDF5
-            grid.to_HDF5(FILE, date=True, verbose=VERBOSE,
-                units=unit_list[UNITS-1], longname=unit_name[UNITS-1],
-                title='GRACE/GRACE-FO Spatial Data')
-        #-- set the permissions mode of the output files
-        os.chmod(FILE, MODE)
-        #-- add file to list
-        output_files.append(FILE)
+        outputs = []
+        if GIA_ENSEMBLE:
+            #-- correct for the GIA of each ensemble member by broadcasting
+            #-- the GIA rate maps to the time of the month
+            for n,gia_title in enumerate(GIA_Ylms_rate.title):
+                member = spatial()
+                member.lon = np.copy(grid.lon)
+                member.lat = np.copy(grid.lat)
+                member.time = np.copy(grid.time)
+                member.month = np.copy(grid.month)
+                member.data = (grid.data -
+                    gia_rate[:,:,n]*(grid.time-2003.3)).astype(DTYPE)
+                FILE = os.path.join(DIRECTORY,ensemble_format.format(
+                    *args[:6],gia_title,*args[6:]))
+                outputs.append((member,FILE))
+        else:
+            FILE = os.path.join(DIRECTORY,file_format.format(*args))
+            outputs.append((grid,FILE))
+        for output,FILE in outputs:
+            if (DATAFORM == 1):
+                #-- ascii (.txt)
+                output.to_ascii(FILE, date=True, verbose=VERBOSE)
+            elif (DATAFORM == 2):
+                #-- netCDF4
+                output.to_netCDF4(FILE, date=True, verbose=VERBOSE,
+                    units=unit_list[UNITS-1], longname=unit_name[UNITS-1],
+                    title='GRACE/GRACE-FO Spatial Data',
+                    compression_level=COMPRESSION)
+            elif (DATAFORM == 3):
+                #-- HDF5
+                output.to_HDF5(FILE, date=True, verbose=VERBOSE,
+                    units=unit_list[UNITS-1], longname=unit_name[UNITS-1],
+                    title='GRACE/GRACE-FO Spatial Data',
+                    compression_level=COMPRESSION)
+            #-- set the permissions mode of the output files
+            os.chmod(FILE, MODE)
+            #-- add file to list
+            output_files.append(FILE)
+
+        #-- output monthly calibrated error files
+        if ERROR:
+            error = spatial()
+            error.lon = np.copy(grid.lon)
+            error.lat = np.copy(grid.lat)
+            error.time = np.copy(grid.time)
+            error.month = np.copy(grid.month)
+            error.data = np.copy(grid.error)
+            FILE=os.path.join(DIRECTORY,error_format.format(*args))
+            if (DATAFORM == 1):
+                #-- ascii (.txt)
+                error.to_ascii(FILE, date=True, verbose=VERBOSE)
+            elif (DATAFORM == 2):
+                #-- netCDF4
+                error.to_netCDF4(FILE, date=True, verbose=VERBOSE,
+                    units=unit_list[UNITS-1], longname=unit_name[UNITS-1],
+                    title='GRACE/GRACE-FO Spatial Error',
+                    compression_level=COMPRESSION)
+            elif (DATAFORM == 3):
+                #-- HDF5
+                error.to_HDF5(FILE, date=True, verbose=VERBOSE,
+                    units=unit_list[UNITS-1], longname=unit_name[UNITS-1],
+                    title='GRACE/GRACE-FO Spatial Error',
+                    compression_level=COMPRESSION)
+            #-- set the permissions mode of the output files
+            os.chmod(FILE, MODE)
+            #-- add file to list
+            output_files.append(FILE)
+
+    #-- output spatial time-series cubes to netCDF4 or HDF5
+    if CUBE:
+        #-- chunk shape contiguous in time for extracting time series
+        #-- or contiguous in map for extracting monthly fields
+        if (CHUNKS == 'time'):
+            chunks = (np.min([16,nlat]),np.min([16,nlon]),nt)
+        else:
+            chunks = (nlat,nlon,1)
+        args = (FILENAME,unit_list[UNITS-1],LMAX,order_str,gw_str,
+            ds_str,suffix)
+        cubes = []
+        if GIA_ENSEMBLE:
+            #-- cubes of each ensemble member are corrected when written
+            #-- so that only a single member is held in memory
+            for n,gia_title in enumerate(GIA_Ylms_rate.title):
+                FILE = os.path.join(DIRECTORY,ensemble_cube_format.format(
+                    *args[:6],gia_title,*args[6:]))
+                cubes.append((cube,FILE,'GRACE/GRACE-FO Spatial Data',n))
+        else:
+            FILE = os.path.join(DIRECTORY,cube_format.format(*args))
+            cubes.append((cube,FILE,'GRACE/GRACE-FO Spatial Data',None))
+        if ERROR:
+            FILE = os.path.join(DIRECTORY,cube_error_format.format(*args))
+            cubes.append((cube_error,FILE,'GRACE/GRACE-FO Spatial Error',None))
+        for c,FILE,title,n in cubes:
+            if n is not None:
+                #-- correct for the GIA of the ensemble member by broadcasting
+                #-- the GIA rate map to the time of each month
+                member = spatial()
+                member.lon = np.copy(c.lon)
+                member.lat = np.copy(c.lat)
+                member.time = np.copy(c.time)
+                member.month = np.copy(c.month)
+                member.data = (c.data - gia_rate[:,:,n,None] *
+                    (c.time[None,None,:]-2003.3)).astype(DTYPE)
+                c = member
+            if (DATAFORM == 2):
+                #-- netCDF4
+                c.to_netCDF4(FILE, date=True, verbose=VERBOSE,
+                    units=unit_list[UNITS-1], longname=unit_name[UNITS-1],
+                    title=title, chunks=chunks,
+                    compression_level=COMPRESSION)
+            elif (DATAFORM == 3):
+                #-- HDF5
+                c.to_HDF5(FILE, date=True, verbose=VERBOSE,
+                    units=unit_list[UNITS-1], longname=unit_name[UNITS-1],
+                    title=title, chunks=chunks,
+                    compression_level=COMPRESSION)
+            #-- set the permissions mode of the output files
+            os.chmod(FILE, MODE)
+            #-- add file to list
+            output_files.append(FILE)
 
     #-- return the list of output files
     return output_files
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 u"""
 podaac_grace_sync.py
-Written by Tyler Sutterley (07/2020)
+Written by Tyler Sutterley (08/2020)
 
 Syncs GRACE/GRACE-FO and auxiliary data from the NASA JPL PO.DAAC Drive Server
 Syncs CSR/GFZ/JPL files for RL04/RL05/RL06 GAA/GAB/GAC/GAD/GSM
@@ -50,6 +50,7 @@ COMMAND LINE OPTIONS:
     -l, --log: output log of files downloaded
     --clobber: Overwrite existing data in transfer
     --checksum: compare hashes to check if overwriting existing data
+    --cube=X: create or update HDF5 cubes of each product truncated to degree X
     -M X, --mode=X: Local permissions mode of the directories and files synced
 
 PYTHON DEPENDENCIES:
@@ -58,8 +59,14 @@ PYTHON DEPENDENCIES:
         https://github.com/lxml/lxml
     future: Compatibility layer between Python 2 and Python 3
         https://python-future.org/
+    h5py: Python interface for Hierarchal Data Format 5 (HDF5)
+        (https://www.h5py.org)
+
+PROGRAM DEPENDENCIES:
+    grace_harmonics_cube.py: consolidates a product into a single HDF5 cube
 
 UPDATE HISTORY:
+    Updated 08/2020: added option to incrementally update HDF5 cubes of products
     Updated 07/2020: add back snippets to sync Level-1b dealiasing products
     Updated 06/2020: increased timeout to 2 minutes
     Updated 05/2020: simplified PO.DAAC Drive login
@@ -152,6 +159,7 @@ import builtins
 import posixpath
 import lxml.etree
 import calendar, time
+from gravity_toolkit.grace_harmonics_cube import grace_harmonics_cube
 if sys.version_info[0] == 2:
     from cookielib import CookieJar
     import urllib2
@@ -216,7 +224,7 @@ def compile_regex_pattern(PROC, DREL, DSET):
 #-- PURPOSE: sync local GRACE/GRACE-FO files with JPL PO.DAAC drive server
 def podaac_grace_sync(DIRECTORY, PROC, USER=None, PASSWORD=None, DREL=[],
     AOD1B=False, NEWSLETTERS=False, LOG=False, LIST=False, CLOBBER=False,
-    CHECKSUM=False, MODE=None):
+    CHECKSUM=False, CUBE=None, MODE=None):
 
     #-- check if directory exists and recursively create if not
     os.makedirs(DIRECTORY,MODE) if not os.path.exists(DIRECTORY) else None
@@ -559,6 +567,9 @@ def podaac_grace_sync(DIRECTORY, PROC, USER=None, PASSWORD=None, DREL=[],
                         print('{0}'.format(fi), file=fid)
                 #-- change permissions of index file
                 os.chmod(os.path.join(local_dir,'index.txt'), MODE)
+                #-- append new months to the HDF5 cube of the product
+                if CUBE and not LIST:
+                    grace_harmonics_cube(DIRECTORY, pr, rl, ds, CUBE, MODE=MODE)
 
     #-- close log file and set permissions level to MODE
     if LOG:
@@ -649,6 +660,7 @@ def usage():
     print(' -L, --list\t\tOnly print files that are to be transferred')
     print(' --clobber\t\tOverwrite existing data in transfer')
     print(' --checksum\t\tCompare hashes to check if overwriting existing data')
+    print(' --cube=X\t\tUpdate HDF5 cubes of each product truncated to degree X')
     print(' -M X, --mode=X\t\tPermission mode of directories and files synced')
     print(' -l, --log\t\tOutput log file')
     today = time.strftime('%Y-%m-%d',time.localtime())
@@ -659,7 +671,8 @@ def usage():
 def main():
     #-- Read the system arguments listed after the program
     long_options = ['help','user=','netrc=','directory=','list','log',
-        'center=','release=','aod1b','newsletters','clobber','checksum','mode=']
+        'center=','release=','aod1b','newsletters','clobber','checksum','cube=',
+        'mode=']
     optlist,arglist = getopt.getopt(sys.argv[1:],'hU:N:D:lLC:R:M:',long_options)
 
     #-- command line parameters
@@ -680,6 +693,8 @@ def main():
     NEWSLETTERS = False
     #-- Use hash for determining whether or not to overwrite
     CHECKSUM = False
+    #-- maximum degree of HDF5 cubes of each product (None for no cubes)
+    CUBE = None
     #-- permissions mode of the local directories and files (number in octal)
     MODE = 0o775
     for opt, arg in optlist:
@@ -708,6 +723,8 @@ def main():
             NEWSLETTERS = True
         elif opt in ("--checksum",):
             CHECKSUM = True
+        elif opt in ("--cube",):
+            CUBE = int(arg)
         elif opt in ("-M","--mode"):
             MODE = int(arg, 8)
 
@@ -729,7 +746,8 @@ def main():
     if check_connection():
         podaac_grace_sync(DIRECTORY, PROC, USER=USER, PASSWORD=PASSWORD,
             DREL=DREL, NEWSLETTERS=NEWSLETTERS, AOD1B=AOD1B, LIST=LIST,
-            LOG=LOG, CLOBBER=CLOBBER, CHECKSUM=CHECKSUM, MODE=MODE)
+            LOG=LOG, CLOBBER=CLOBBER, CHECKSUM=CHECKSUM, CUBE=CUBE,
+            MODE=MODE)
 
 #-- run main program
 if __name__ == '__main__':
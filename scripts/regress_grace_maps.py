@@ -1,11 +1,14 @@
 #!/usr/bin/env python
 u"""
 regress_grace_maps.py
-Written by Tyler Sutterley (06/2020)
+Written by Tyler Sutterley (08/2020)
 
 Reads in GRACE/GRACE-FO spatial files from grace_spatial_maps.py and
     fits a regression model at each grid point
 
+Can read all months from a single netCDF4 or HDF5 spatial time-series cube
+    with the CUBE parameter (only reading the window of months to be fit)
+
 CALLING SEQUENCE:
     python regress_grace_maps.py --start=4 --end=175 --order=2 parameter_file
 
@@ -45,7 +48,7 @@ PYTHON DEPENDENCIES:
         (https://h5py.org)
 
 PROGRAM DEPENDENCIES:
-    tsregress.py: calculates trend coefficients using least-squares
+    tsregress_batch.py: calculates trend coefficients for all grid points
     tsamplitude.py: calculates the amplitude and phase of a harmonic function
     spatial.py: spatial data class for reading, writing and processing data
         ncdf_read.py: reads input spatial data from netCDF4 files
@@ -54,6 +57,9 @@ PROGRAM DEPENDENCIES:
         hdf5_write.py: writes output spatial data to HDF5
 
 UPDATE HISTORY:
+    Updated 08/2020: fit all grid points at once with a shared design matrix
+        mask grid points without a valid fit (including amplitude and phase)
+        read spatial time-series cubes from grace_spatial_maps.py
     Updated 06/2020: using spatial data class for input and output operations
     Updated 01/2020: output seasonal amplitude and phase
     Updated 10/2019: changing Y/N flags to True/False
@@ -82,7 +88,7 @@ import traceback
 import numpy as np
 import multiprocessing
 
-from gravity_toolkit.tsregress import tsregress
+from gravity_toolkit.tsregress_batch import tsregress_batch
 from gravity_toolkit.tsamplitude import tsamplitude
 from gravity_toolkit.spatial import spatial
 
@@ -140,6 +146,10 @@ def regress_grace_maps(parameters,ORDER,CYCLES,VERBOSE,MODE):
     FILENAME = parameters['FILENAME']
     #-- output filename suffix
     suffix = ['txt', 'nc', 'H5'][DATAFORM-1]
+    #-- input spatial time-series cube from grace_spatial_maps.py
+    CUBE = ('CUBE' in parameters.keys()) and (parameters['CUBE'] in ('Y','y'))
+    if CUBE and (DATAFORM == 1):
+        raise ValueError('Spatial cubes must be input from netCDF4 or HDF5')
 
     #-- flag for spherical harmonic order
     order_str = 'M{0:d}'.format(MMAX) if (MMAX != LMAX) else ''
@@ -157,6 +167,7 @@ def regress_grace_maps(parameters,ORDER,CYCLES,VERBOSE,MODE):
 
     #-- input file format
     input_format = '{0}{1}_L{2:d}{3}{4}{5}_{6:03d}.{7}'
+    cube_format = '{0}{1}_L{2:d}{3}{4}{5}_CUBE.{6}'
     #-- output file format
     output_format = '{0}{1}_L{2:d}{3}{4}{5}_{6}{7}_{8:03d}-{9:03d}.{10}'
 
@@ -204,30 +215,63 @@ def regress_grace_maps(parameters,ORDER,CYCLES,VERBOSE,MODE):
         unit_suffix.extend(['',''])
         amp_str.append(flag)
 
-    #-- input data spatial object
-    spatial_list = []
-    for t,grace_month in enumerate(months):
-        #-- input GRACE/GRACE-FO spatial file
-        fi = input_format.format(FILENAME,unit_list[UNITS-1],LMAX,
-            order_str,gw_str,ds_str,grace_month,suffix)
-        #-- read GRACE/GRACE-FO spatial file
-        if (DATAFORM == 1):
-            dinput = spatial(spacing=[dlon,dlat],nlon=nlon,
-                nlat=nlat).from_ascii(os.path.join(DIRECTORY,fi))
-        elif (DATAFORM == 2):
-            #-- netcdf (.nc)
-            dinput = spatial().from_netCDF4(os.path.join(DIRECTORY,fi))
-        elif (DATAFORM == 3):
-            #-- HDF5 (.H5)
-            dinput = spatial().from_HDF5(os.path.join(DIRECTORY,fi))
-        #-- append to spatial list
-        dinput.month[:] = grace_month
+    #-- read months from the spatial time-series cube
+    if CUBE:
+        fi = cube_format.format(FILENAME,unit_list[UNITS-1],LMAX,
+            order_str,gw_str,ds_str,suffix)
+        reader = spatial().from_netCDF4 if (DATAFORM == 2) else \
+            spatial().from_HDF5
+        #-- read the GRACE/GRACE-FO months with a small window of points
+        dinput = reader(os.path.join(DIRECTORY,fi),
+            indices=(slice(0,2),slice(0,2)))
+        valid, = np.nonzero(np.in1d(dinput.month, months))
+        #-- check that all months are available
+        months_check = sorted(set(months) - set(dinput.month))
+        if months_check:
+            m = ','.join(['{0:03d}'.format(m) for m in months_check])
+            raise IOError('GRACE/GRACE-FO months {0} not Found'.format(m))
+        #-- only read the window of months to be fit
+        window = slice(valid[0],valid[-1]+1)
+        grid = reader(os.path.join(DIRECTORY,fi),
+            indices=(slice(None),slice(None),window))
+        #-- reduce to the months to be fit
+        isvalid = np.in1d(grid.month, months)
+        grid.data = grid.data[:,:,isvalid]
+        grid.time = grid.time[isvalid]
+        grid.month = grid.month[isvalid]
+        grid.mask = np.zeros_like(grid.data, dtype=np.bool)
+        grid.update_dimensions()
+        grid.update_mask()
+        #-- spatial template for the output fields
+        dinput = grid.index(0)
+        dinput.filename = None
         nlat,nlon = dinput.shape
-        spatial_list.append(dinput)
-
-    #-- concatenate list to single spatial object
-    grid = spatial().from_list(spatial_list)
-    spatial_list = None
+    else:
+        #-- input data spatial object
+        spatial_list = []
+        #-- read monthly spatial files
+        for t,grace_month in enumerate(months):
+            #-- input GRACE/GRACE-FO spatial file
+            fi = input_format.format(FILENAME,unit_list[UNITS-1],LMAX,
+                order_str,gw_str,ds_str,grace_month,suffix)
+            #-- read GRACE/GRACE-FO spatial file
+            if (DATAFORM == 1):
+                dinput = spatial(spacing=[dlon,dlat],nlon=nlon,
+                    nlat=nlat).from_ascii(os.path.join(DIRECTORY,fi))
+            elif (DATAFORM == 2):
+                #-- netcdf (.nc)
+                dinput = spatial().from_netCDF4(os.path.join(DIRECTORY,fi))
+            elif (DATAFORM == 3):
+                #-- HDF5 (.H5)
+                dinput = spatial().from_HDF5(os.path.join(DIRECTORY,fi))
+            #-- append to spatial list
+            dinput.month[:] = grace_month
+            nlat,nlon = dinput.shape
+            spatial_list.append(dinput)
+        #-- concatenate list to single spatial object
+        grid = spatial().from_list(spatial_list)
+        grid.update_mask()
+        spatial_list = None
 
     #-- Fitting seasonal components
     ncomp = len(coef_str)
@@ -238,6 +282,8 @@ def regress_grace_maps(parameters,ORDER,CYCLES,VERBOSE,MODE):
     out.data = np.zeros((nlat,nlon,ncomp))
     out.error = np.zeros((nlat,nlon,ncomp))
     out.mask = np.ones((nlat,nlon,ncomp),dtype=np.bool)
+    #-- invalid grid points are set to fill value
+    out.fill_value = np.nan if (grid.fill_value is None) else grid.fill_value
     #-- Fit Significance
     FS = {}
     #-- SSE: Sum of Squares Error
@@ -246,27 +292,35 @@ def regress_grace_maps(parameters,ORDER,CYCLES,VERBOSE,MODE):
     #-- R2Adj: Adjusted Coefficient of Determination
     for key in ['SSE','AIC','BIC','R2Adj']:
         FS[key] = dinput.zeros_like()
+        FS[key].fill_value = out.fill_value
 
-    #-- valid values for ocean function
     #-- calculate the regression coefficients and fit significance
-    for i in range(nlat):
-        for j in range(nlon):
-            #-- Calculating the regression coefficients
-            tsbeta = tsregress(grid.time, grid.data[i,j,:],
-                ORDER=ORDER, CYCLES=CYCLES, CONF=0.95)
-            #-- save regression components
-            for k in range(0, ncomp):
-                out.data[i,j,k] = tsbeta['beta'][k]
-                out.error[i,j,k] = tsbeta['error'][k]
-                out.mask[i,j,k] = False
-            #-- Fit significance terms
-            #-- Degrees of Freedom
-            nu = tsbeta['DOF']
-            #-- Converting Mean Square Error to Sum of Squares Error
-            FS['SSE'].data[i,j] = tsbeta['MSE']*nu
-            FS['AIC'].data[i,j] = tsbeta['AIC']
-            FS['BIC'].data[i,j] = tsbeta['BIC']
-            FS['R2Adj'].data[i,j] = tsbeta['R2Adj']
+    #-- for all grid points simultaneously with a shared design matrix
+    #-- grid points with missing data are fit in groups of matching dates
+    nt = len(grid.time)
+    tsbeta = tsregress_batch(grid.time, grid.data.reshape(nlat*nlon,nt),
+        ORDER=ORDER, CYCLES=CYCLES, CONF=0.95,
+        MASK=grid.mask.reshape(nlat*nlon,nt))
+    #-- grid points without a valid fit
+    invalid = tsbeta['mask'].reshape(nlat,nlon)
+    #-- save regression components
+    out.data[:,:,:] = tsbeta['beta'].reshape(nlat,nlon,ncomp)
+    out.error[:,:,:] = tsbeta['error'].reshape(nlat,nlon,ncomp)
+    out.mask[:,:,:] = invalid[:,:,None]
+    out.error[out.mask] = out.fill_value
+    out.update_mask()
+    #-- Fit significance terms
+    #-- Degrees of Freedom (for each grid point)
+    DOF = np.broadcast_to(tsbeta['DOF'], (nlat*nlon)).reshape(nlat,nlon)
+    nu = np.max(DOF)
+    #-- Converting Mean Square Error to Sum of Squares Error
+    FS['SSE'].data[:,:] = tsbeta['MSE'].reshape(nlat,nlon)*DOF
+    FS['AIC'].data[:,:] = tsbeta['AIC'].reshape(nlat,nlon)
+    FS['BIC'].data[:,:] = tsbeta['BIC'].reshape(nlat,nlon)
+    FS['R2Adj'].data[:,:] = tsbeta['R2Adj'].reshape(nlat,nlon)
+    for key in ['SSE','AIC','BIC','R2Adj']:
+        FS[key].mask = np.copy(invalid)
+        FS[key].update_mask()
 
     #-- list of output files
     output_files = []
@@ -321,6 +375,12 @@ def regress_grace_maps(parameters,ORDER,CYCLES,VERBOSE,MODE):
             comp1 = out.error[:,:,j]*out.data[:,:,j+1]/(amp.data**2)
             comp2 = out.error[:,:,j+1]*out.data[:,:,j]/(amp.data**2)
             ph.error = (180.0/np.pi)*np.sqrt(comp1**2 + comp2**2)
+            #-- invalid grid points are set to fill value
+            for temp in (amp,ph):
+                temp.fill_value = out.fill_value
+                temp.mask = np.copy(invalid)
+                temp.error[temp.mask] = temp.fill_value
+                temp.update_mask()
 
             #-- output file names for amplitude, phase and errors
             f3 = output_format.format(FILENAME,unit_list[UNITS-1],LMAX,order_str,